@@ -115,7 +115,7 @@ def create_app():
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "jwt-secret-key")
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
 
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///traffic.db"
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///traffic.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
     # API_URL for UI to communicate with API layer
@@ -123,6 +123,15 @@ def create_app():
     # Can be overridden with API_URL env var for separate API servers
     app.config["API_URL"] = os.environ.get("API_URL", "")
 
+    # Absolute origin used in emailed links (e.g. https://traffic.example.tn)
+    app.config["PUBLIC_BASE_URL"] = os.environ.get("PUBLIC_BASE_URL", "")
+
+    # The saved-report scheduler thread runs in the server process only:
+    # set REPORT_SCHEDULER=1 in the one process that should run it (the
+    # development server below always does), so scripts, tests and extra
+    # workers that import the app do not start their own
+    app.config["REPORT_SCHEDULER"] = os.environ.get("REPORT_SCHEDULER", "0") == "1"
+
     app.config["API_TITLE"] = "Traffic Accident Information System API"
     app.config["API_VERSION"] = "v1"
     app.config["OPENAPI_VERSION"] = "3.0.3"
@@ -141,6 +150,10 @@ def create_app():
         from models.user import User
         from models.accident import Accident
         from models.import_batch import ImportBatch
+        from models.import_job import ImportJob
+        from models.delete_job import DeleteJob
+        from models.export_job import ExportJob
+        from models.saved_report import SavedReport
         from models.accident_report import AccidentReport
 
         db.create_all()
@@ -168,6 +181,151 @@ def create_app():
                         conn.execute(sa.text("ALTER TABLE accidents ADD COLUMN delegation VARCHAR"))
                 except Exception:
                     pass
+
+            # Coordinates + geohash cell used by bbox/radius queries
+            for col, ddl in (("lat", "FLOAT"), ("lng", "FLOAT"), ("geohash", "VARCHAR(12)")):
+                if col not in cols:
+                    try:
+                        with db.engine.connect() as conn:
+                            conn.execute(sa.text(f"ALTER TABLE accidents ADD COLUMN {col} {ddl}"))
+                            conn.commit()
+                    except Exception:
+                        pass
+            with db.engine.connect() as conn:
+                conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_accidents_geohash ON accidents (geohash)"))
+                conn.commit()
+
+            # Content hash of imported rows (dedup on re-import)
+            if "content_hash" not in cols:
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(sa.text("ALTER TABLE accidents ADD COLUMN content_hash VARCHAR(32)"))
+                        conn.commit()
+                except Exception:
+                    pass
+            with db.engine.connect() as conn:
+                conn.execute(sa.text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_accidents_content_hash ON accidents (content_hash)"
+                ))
+                conn.commit()
+        except Exception:
+            pass
+
+        # Duplicate counters on import batches/jobs
+        for table in ("import_batches", "import_jobs"):
+            try:
+                with db.engine.connect() as conn:
+                    insp = conn.execute(sa.text(f"PRAGMA table_info('{table}')")).fetchall()
+                if "duplicate_count" not in [row[1] for row in insp]:
+                    with db.engine.connect() as conn:
+                        conn.execute(sa.text(f"ALTER TABLE {table} ADD COLUMN duplicate_count INTEGER DEFAULT 0"))
+                        conn.commit()
+            except Exception:
+                pass
+
+        # Soft-delete flag on import batches (background purges)
+        try:
+            with db.engine.connect() as conn:
+                insp = conn.execute(sa.text("PRAGMA table_info('import_batches')")).fetchall()
+            if "deleted_at" not in [row[1] for row in insp]:
+                with db.engine.connect() as conn:
+                    conn.execute(sa.text("ALTER TABLE import_batches ADD COLUMN deleted_at DATETIME"))
+                    conn.execute(sa.text(
+                        "CREATE INDEX IF NOT EXISTS ix_import_batches_deleted_at ON import_batches (deleted_at)"
+                    ))
+                    conn.commit()
+        except Exception:
+            pass
+
+        # Delta sync identity on accidents and high-water marks on batches
+        try:
+            with db.engine.connect() as conn:
+                acc_cols = [row[1] for row in conn.execute(sa.text("PRAGMA table_info('accidents')")).fetchall()]
+                batch_cols = [row[1] for row in conn.execute(sa.text("PRAGMA table_info('import_batches')")).fetchall()]
+            with db.engine.connect() as conn:
+                for col, ddl in (("external_source", "VARCHAR(64)"), ("external_id", "VARCHAR(128)"),
+                                 ("sync_hash", "VARCHAR(32)")):
+                    if col not in acc_cols:
+                        conn.execute(sa.text(f"ALTER TABLE accidents ADD COLUMN {col} {ddl}"))
+                for col, ddl in (("sync_source", "VARCHAR(64)"), ("high_water", "DATETIME")):
+                    if col not in batch_cols:
+                        conn.execute(sa.text(f"ALTER TABLE import_batches ADD COLUMN {col} {ddl}"))
+                conn.execute(sa.text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_accidents_external ON accidents (external_source, external_id)"
+                ))
+                conn.execute(sa.text(
+                    "CREATE INDEX IF NOT EXISTS ix_import_batches_sync_source ON import_batches (sync_source)"
+                ))
+                conn.commit()
+        except Exception:
+            pass
+
+        # Last in-place edit of an accident (part of the export data version)
+        try:
+            with db.engine.connect() as conn:
+                acc_cols = [row[1] for row in conn.execute(sa.text("PRAGMA table_info('accidents')")).fetchall()]
+                if "updated_at" not in acc_cols:
+                    conn.execute(sa.text("ALTER TABLE accidents ADD COLUMN updated_at DATETIME"))
+                    conn.commit()
+        except Exception:
+            pass
+
+        # Peak memory of background import jobs
+        try:
+            with db.engine.connect() as conn:
+                insp = conn.execute(sa.text("PRAGMA table_info('import_jobs')")).fetchall()
+            if "peak_memory_kb" not in [row[1] for row in insp]:
+                with db.engine.connect() as conn:
+                    conn.execute(sa.text("ALTER TABLE import_jobs ADD COLUMN peak_memory_kb INTEGER"))
+                    conn.commit()
+        except Exception:
+            pass
+
+        # Optional coordinates on citizen reports (copied to the accident on confirm)
+        try:
+            with db.engine.connect() as conn:
+                insp = conn.execute(sa.text("PRAGMA table_info('accident_reports')")).fetchall()
+            report_cols = [row[1] for row in insp]
+
+            for col in ("lat", "lng"):
+                if col not in report_cols:
+                    with db.engine.connect() as conn:
+                        conn.execute(sa.text(f"ALTER TABLE accident_reports ADD COLUMN {col} FLOAT"))
+                        conn.commit()
+        except Exception:
+            pass
+
+        # Keyset pagination of the reports queue
+        try:
+            with db.engine.connect() as conn:
+                for name, cols in (("ix_accident_reports_status_created", "status, created_at, id"),
+                                   ("ix_accident_reports_user_created", "user_id, created_at, id"),
+                                   ("ix_accident_reports_created", "created_at, id")):
+                    conn.execute(sa.text(f"CREATE INDEX IF NOT EXISTS {name} ON accident_reports ({cols})"))
+                conn.commit()
+        except Exception:
+            pass
+
+        # Duplicate-report clusters and their candidate lookups
+        try:
+            with db.engine.connect() as conn:
+                insp = conn.execute(sa.text("PRAGMA table_info('accident_reports')")).fetchall()
+            report_cols = [row[1] for row in insp]
+            with db.engine.connect() as conn:
+                for col in ("duplicate_cluster_id", "duplicate_accident_id"):
+                    if col not in report_cols:
+                        conn.execute(sa.text(f"ALTER TABLE accident_reports ADD COLUMN {col} INTEGER"))
+                conn.execute(sa.text(
+                    "CREATE INDEX IF NOT EXISTS ix_accident_reports_duplicate_cluster_id "
+                    "ON accident_reports (duplicate_cluster_id)"
+                ))
+                conn.execute(sa.text(
+                    "CREATE INDEX IF NOT EXISTS ix_accident_reports_delegation_date ON accident_reports (delegation, date)"
+                ))
+                conn.execute(sa.text(
+                    "CREATE INDEX IF NOT EXISTS ix_accidents_delegation_occurred ON accidents (delegation, occurred_at)"
+                ))
+                conn.commit()
         except Exception:
             pass
 
@@ -248,6 +406,15 @@ def create_app():
         except Exception:
             pass
 
+        # Full-text search index (FTS5 on SQLite, GIN tsvector on PostgreSQL)
+        try:
+            from utils.fulltext import ensure_fulltext
+            with db.engine.connect() as conn:
+                ensure_fulltext(conn)
+                conn.commit()
+        except Exception as e:
+            print(f"Full-text index unavailable: {e}")
+
         # Ensure government user exists
         from utils.create_gov_user import create_government_user
         create_government_user()
@@ -256,6 +423,24 @@ def create_app():
     from resources.import_data import import_api
     app.register_blueprint(import_api)
 
+    # Background import worker pool (resumes jobs left by a crashed worker)
+    from utils.import_jobs import import_jobs
+    import_jobs.init_app(app)
+
+    # Background purge of deleted import batches (resumes interrupted purges)
+    from utils.purge import purge_jobs
+    purge_jobs.init_app(app)
+
+    # Background accident exports, cached under instance/exports
+    from utils.export_jobs import export_jobs
+    export_jobs.init_app(app)
+
+    # Saved reports rendered on schedule / after data changes, then emailed
+    from utils.email_service import email_service
+    email_service.init_app(app)
+    from utils.report_scheduler import report_scheduler
+    report_scheduler.init_app(app)
+
     # ---------------- SMOREST API ----------------
     from flask_smorest import Api
     api = Api(app)
@@ -348,26 +533,18 @@ def create_app():
     # Minimal public export route (convenience for direct downloads)
     @app.route('/export/csv')
     def public_export_csv():
-        """Public CSV export at /export/csv — uses in-memory generator and send_file.
+        """Public CSV export at /export/csv — streamed from a server-side cursor.
 
         This is a convenience route so requesting /export/csv downloads a CSV
         without going through the API blueprint. It returns recent accidents.
         """
         try:
-            from utils.export import export_to_csv, format_accident_for_export
+            from utils.export import ACCIDENT_EXPORT_HEADERS, iter_accident_rows, stream_csv
             from models.accident import Accident
 
-            accidents = Accident.query.order_by(Accident.occurred_at.desc()).limit(1000).all()
-            data = [format_accident_for_export(a) for a in accidents]
-
-            if not data:
-                # Return an empty CSV with headers to keep clients happy
-                data = [{
-                    'ID': '', 'Date': '', 'Location': '', 'Governorate': '',
-                    'Delegation': '', 'Severity': '', 'Cause': '', 'Source': '', 'Created At': ''
-                }]
-
-            return export_to_csv(data, 'accidents.csv')
+            query = Accident.query.filter(Accident.visible()).order_by(Accident.occurred_at.desc()).limit(1000)
+            # The header row is written even when nothing matches
+            return stream_csv(iter_accident_rows(query), 'accidents.csv', ACCIDENT_EXPORT_HEADERS)
         except Exception as e:
             app.logger.exception('Public export failed')
             from flask import Response
@@ -392,6 +569,10 @@ application = app
 # Local development only
 # --------------------------------------------------
 if __name__ == "__main__":
+    # With the reloader, only the child process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN"):
+        from utils.report_scheduler import report_scheduler
+        report_scheduler.start()
     socketio.run(
         app,
         debug=True,
@@ -16,11 +16,45 @@ class Accident(db.Model):
     governorate = db.Column(db.String(200), nullable=True, index=True)
     delegation = db.Column(db.String(200), nullable=True, index=True)
 
+    # Coordinates (optional) with a geohash cell for bbox/radius pruning
+    lat = db.Column(db.Float, nullable=True)
+    lng = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True, index=True)
+
     # Metadata
     source = db.Column(db.String(50), nullable=False, default="import")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set by in-place edits (PATCH); exports cached before it are stale
+    updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.utcnow)
     # Link to import batch when created via CSV import
     batch_id = db.Column(db.Integer, db.ForeignKey('import_batches.id'), nullable=True, index=True)
+    # Hash of the identifying fields of imported rows (see utils/dedup.py);
+    # unique so re-importing an overlapping file skips rows already stored
+    content_hash = db.Column(db.String(32), nullable=True, unique=True, index=True)
+    # Partner feed identity for delta syncs (see utils/sync.py): rows are
+    # upserted on (external_source, external_id); sync_hash detects changes
+    external_source = db.Column(db.String(64), nullable=True)
+    external_id = db.Column(db.String(128), nullable=True)
+    sync_hash = db.Column(db.String(32), nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('external_source', 'external_id', name='uq_accidents_external'),
+        # Duplicate candidates of citizen reports (utils/duplicates.py)
+        db.Index('ix_accidents_delegation_occurred', 'delegation', 'occurred_at'),
+    )
+
+    @classmethod
+    def visible(cls):
+        """Filter hiding rows of soft-deleted import batches (see utils/purge.py)"""
+        from models.import_batch import ImportBatch
+        return db.or_(cls.batch_id.is_(None), cls.batch_id.notin_(ImportBatch.deleted_ids()))
+
+    def set_coordinates(self, lat, lng):
+        """Store lat/lng and keep the geohash cell in sync"""
+        from utils.geo import geohash_for
+        self.lat = lat
+        self.lng = lng
+        self.geohash = geohash_for(lat, lng)
 
     def __repr__(self):
         return f"<Accident {self.id} | {self.severity} | {self.location}>"
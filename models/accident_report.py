@@ -9,12 +9,29 @@ class AccidentReport(db.Model):
     date = db.Column(db.DateTime, nullable=False)
     location = db.Column(db.String(256), nullable=False)
     delegation = db.Column(db.String(128), nullable=False)
+    lat = db.Column(db.Float, nullable=True)
+    lng = db.Column(db.Float, nullable=True)
     severity = db.Column(db.String(32), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
     status = db.Column(db.String(16), nullable=False, default="PENDING")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     accident_id = db.Column(db.Integer, db.ForeignKey("accidents.id"), nullable=True)
     rejection_reason = db.Column(db.String(256), nullable=True)
+    # Likely duplicates (see utils/duplicates.py): pending reports of the
+    # same crash share a cluster id, the id of the cluster's first report;
+    # duplicate_accident_id is an existing accident the report may repeat
+    duplicate_cluster_id = db.Column(db.Integer, nullable=True, index=True)
+    duplicate_accident_id = db.Column(db.Integer, db.ForeignKey("accidents.id"), nullable=True)
 
     user = db.relationship("User", backref="accident_reports")
-    accident = db.relationship("Accident", backref="report", uselist=False)
+    accident = db.relationship("Accident", backref="report", uselist=False, foreign_keys=[accident_id])
+
+    # The reports queue pages newest first by (created_at, id), filtered
+    # by status (government) or owner (citizens)
+    __table_args__ = (
+        db.Index("ix_accident_reports_status_created", "status", "created_at", "id"),
+        db.Index("ix_accident_reports_user_created", "user_id", "created_at", "id"),
+        db.Index("ix_accident_reports_created", "created_at", "id"),
+        # Duplicate candidates: same delegation within a time window
+        db.Index("ix_accident_reports_delegation_date", "delegation", "date"),
+    )
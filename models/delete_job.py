@@ -0,0 +1,62 @@
+from extensions import db
+from datetime import datetime
+
+
+class DeleteJob(db.Model):
+    """Background purge of imported accidents, run by utils/purge.py.
+
+    The batch is soft-deleted (ImportBatch.deleted_at) when the job is
+    created, so its rows disappear from stats at once; the rows are then
+    deleted in id-range chunks, each in its own short transaction together
+    with ``next_id``, the lowest id that may still be left.
+    """
+    __tablename__ = "delete_jobs"
+
+    STATUSES = ('queued', 'running', 'completed', 'failed')
+
+    id = db.Column(db.Integer, primary_key=True)
+    # None purges government_import rows that belong to no batch
+    batch_id = db.Column(db.Integer, nullable=True, index=True)
+    requested_by = db.Column(db.String(64), nullable=True)
+    requester_role = db.Column(db.String(64), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    worker = db.Column(db.String(120), nullable=True)
+    message = db.Column(db.Text, nullable=True)
+
+    total = db.Column(db.Integer, default=0)
+    deleted_count = db.Column(db.Integer, default=0)
+    next_id = db.Column(db.Integer, nullable=False, default=0)
+    # Highest accident id present when the job was created
+    max_id = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def progress(self):
+        """Fraction of the rows deleted, 0.0 - 1.0"""
+        if self.status == 'completed':
+            return 1.0
+        if not self.total:
+            return 0.0
+        return round(min((self.deleted_count or 0) / self.total, 1.0), 4)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'batch_id': self.batch_id,
+            'status': self.status,
+            'message': self.message,
+            'total': self.total or 0,
+            'deleted': self.deleted_count or 0,
+            'progress': self.progress(),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f"<DeleteJob {self.id} {self.status} batch={self.batch_id}>"
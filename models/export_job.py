@@ -0,0 +1,60 @@
+from extensions import db
+from datetime import datetime
+import json
+
+
+class ExportJob(db.Model):
+    """An export rendered in the background by utils/export_jobs.py.
+
+    The finished file under instance/exports doubles as a cache entry:
+    ``cache_key`` hashes the format, the canonical filters and the data
+    version, so an identical request is answered with this file until new
+    data arrives or the file is evicted.
+    """
+    __tablename__ = "export_jobs"
+
+    STATUSES = ('queued', 'running', 'completed', 'failed', 'evicted')
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), nullable=False, index=True)
+    format = db.Column(db.String(10), nullable=False)
+    filters = db.Column(db.Text, nullable=True)  # JSON, canonical
+    requested_by = db.Column(db.String(64), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    # "host:pid" of the process running the job, used to detect crashed workers
+    worker = db.Column(db.String(120), nullable=True)
+    message = db.Column(db.Text, nullable=True)
+
+    filename = db.Column(db.String(255), nullable=True)
+    path = db.Column(db.String(500), nullable=True)
+    size_bytes = db.Column(db.Integer, default=0)
+    row_count = db.Column(db.Integer, default=0)
+    # Cache hits: served artifacts are evicted least recently used first
+    hits = db.Column(db.Integer, default=0)
+    last_accessed_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'filters': json.loads(self.filters or '{}'),
+            'status': self.status,
+            'message': self.message,
+            'filename': self.filename,
+            'size_bytes': self.size_bytes or 0,
+            'rows': self.row_count or 0,
+            'hits': self.hits or 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_accessed_at': self.last_accessed_at.isoformat() if self.last_accessed_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ExportJob {self.id} {self.format} {self.status}>"
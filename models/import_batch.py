@@ -12,6 +12,19 @@ class ImportBatch(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     imported_count = db.Column(db.Integer, default=0)
     skipped_count = db.Column(db.Integer, default=0)
+    duplicate_count = db.Column(db.Integer, default=0)
+    # Soft-delete flag: set when a DeleteJob is queued, the row itself is
+    # removed once the purge completes
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Delta syncs: partner feed name and the newest modification time
+    # applied, the high-water mark for the source's next sync
+    sync_source = db.Column(db.String(64), nullable=True, index=True)
+    high_water = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def deleted_ids(cls):
+        """SELECT of soft-deleted batch ids (rows possibly still being purged)"""
+        return db.select(cls.id).where(cls.deleted_at.isnot(None))
 
     def __repr__(self):
         return f"<ImportBatch {self.id} file={self.filename} imported={self.imported_count}>"
\ No newline at end of file
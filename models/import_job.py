@@ -0,0 +1,85 @@
+from extensions import db
+from datetime import datetime
+import json
+
+
+class ImportJob(db.Model):
+    """A CSV import processed in the background by utils/import_jobs.py.
+
+    Progress is checkpointed per chunk in the same transaction as the
+    chunk's rows, so ``next_line`` is always the first CSV line that has
+    not been committed and a job can resume from it after a crash.
+    """
+    __tablename__ = "import_jobs"
+
+    STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('import_batches.id'), nullable=True, index=True)
+    filename = db.Column(db.String(255), nullable=True)
+    # Spooled upload under instance/imports, removed once the job completes
+    path = db.Column(db.String(500), nullable=False)
+    uploader_id = db.Column(db.String(64), nullable=True)
+    uploader_role = db.Column(db.String(64), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    # "host:pid" of the process running the job, used to detect crashed workers
+    worker = db.Column(db.String(120), nullable=True)
+    message = db.Column(db.Text, nullable=True)
+
+    column_map = db.Column(db.Text, nullable=True)  # JSON
+    total_bytes = db.Column(db.Integer, default=0)
+    bytes_done = db.Column(db.Integer, default=0)  # approximate, from the file offset
+    next_line = db.Column(db.Integer, nullable=False, default=2)
+    imported_count = db.Column(db.Integer, default=0)
+    skipped_count = db.Column(db.Integer, default=0)
+    duplicate_count = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text, nullable=True)  # JSON, first MAX_REPORTED_ERRORS only
+    id_ranges = db.Column(db.Text, nullable=True)  # JSON [[start, end], ...]
+    # Peak resident memory of the worker process while the job ran
+    peak_memory_kb = db.Column(db.Integer, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Heartbeat: bumped with every committed chunk
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def progress(self):
+        """Fraction of the file processed, 0.0 - 1.0"""
+        if self.status == 'completed':
+            return 1.0
+        if not self.total_bytes:
+            return 0.0
+        return round(min((self.bytes_done or 0) / self.total_bytes, 1.0), 4)
+
+    def to_dict(self, include_errors=False):
+        out = {
+            'id': self.id,
+            'batch_id': self.batch_id,
+            'filename': self.filename,
+            'status': self.status,
+            'cancel_requested': bool(self.cancel_requested),
+            'message': self.message,
+            'rows_processed': max((self.next_line or 2) - 2, 0),
+            'progress': self.progress(),
+            'imported': self.imported_count or 0,
+            'skipped': self.skipped_count or 0,
+            'duplicates': self.duplicate_count or 0,
+            'error_count': self.error_count or 0,
+            'peak_memory_mb': round(self.peak_memory_kb / 1024, 1) if self.peak_memory_kb else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+        if include_errors:
+            out['errors'] = json.loads(self.errors or '[]')
+            out['created_id_ranges'] = json.loads(self.id_ranges or '[]')
+            out['column_map'] = json.loads(self.column_map or '{}')
+        return out
+
+    def __repr__(self):
+        return f"<ImportJob {self.id} {self.status} file={self.filename}>"
@@ -0,0 +1,69 @@
+from extensions import db
+from datetime import datetime
+import json
+
+
+class SavedReport(db.Model):
+    """A saved accident report pre-rendered by utils/report_scheduler.py.
+
+    Renders go through the export job queue, so the latest artifact is an
+    ExportJob (``job_id``) under instance/exports and downloads of a
+    scheduled report are static file downloads.
+    """
+    __tablename__ = "saved_reports"
+
+    SECTIONS = ('summary', 'details')
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    owner_id = db.Column(db.String(64), nullable=True)
+    format = db.Column(db.String(10), nullable=False)
+    filters = db.Column(db.Text, nullable=True)  # JSON, canonical
+    sections = db.Column(db.Text, nullable=True)  # JSON list of SECTIONS
+
+    # Cron expression (minute hour day month weekday, UTC) or a preset
+    # such as @weekly; None renders on demand and on data changes only
+    schedule = db.Column(db.String(100), nullable=True)
+    # Re-render once imported data changed and settled
+    refresh_on_change = db.Column(db.Boolean, default=False, nullable=False)
+    recipients = db.Column(db.Text, nullable=True)  # comma-separated emails
+    attach = db.Column(db.Boolean, default=True, nullable=False)
+
+    next_run_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    # utils.export_jobs.data_version() of the last render
+    data_version = db.Column(db.String(64), nullable=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('export_jobs.id'), nullable=True)
+    # Last job emailed to the recipients
+    delivered_job_id = db.Column(db.Integer, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    job = db.relationship('ExportJob', lazy='joined')
+
+    def section_list(self):
+        return json.loads(self.sections or '[]')
+
+    def recipient_list(self):
+        return [r.strip() for r in (self.recipients or '').split(',') if r.strip()]
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'format': self.format,
+            'filters': json.loads(self.filters or '{}'),
+            'sections': self.section_list(),
+            'schedule': self.schedule,
+            'refresh_on_change': self.refresh_on_change,
+            'recipients': self.recipient_list(),
+            'attach': self.attach,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'job': self.job.to_dict() if self.job else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f"<SavedReport {self.id} {self.name!r} {self.format}>"
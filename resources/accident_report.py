@@ -1,13 +1,33 @@
+import base64
+from urllib.parse import urlencode
+
 from flask import Blueprint, request, jsonify, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload
 from extensions import db
 from models.accident_report import AccidentReport
 from models.user import User
 from models.accident import Accident
-from datetime import datetime
+from datetime import datetime, timedelta
+from resources.websocket_handler import broadcast_new_accidents
+from utils.audit import log_action
+from utils.clustering import cluster_index
+from utils.duplicates import assign_cluster, cluster_members
+from utils.email_service import email_service
+from utils.geo import geohash_for, parse_coordinates
+from utils.suggest import suggest_index
 
 reports_bp = Blueprint('reports', __name__)
 
+# Reports per page of GET /reports, by default and at most
+REPORTS_PAGE_SIZE = 50
+REPORTS_MAX_PAGE_SIZE = 200
+
+# Reports per POST /reports/bulk, and ids per IN (...) query within it
+BULK_MAX_REPORTS = 5000
+BULK_CHUNK = 500
+
 # Helper: Only non-government users can submit
 
 def non_gov_required():
@@ -39,6 +59,8 @@ def submit_report():
         date = datetime.fromisoformat(data["date"])
     except Exception:
         abort(400, description="Invalid date format.")
+    # Optional device coordinates; ignored when missing or out of range
+    lat, lng = parse_coordinates(data.get("lat"), data.get("lng"))
     user_id = get_jwt_identity()
     print(f"[DEBUG] Submitting report: user_id={user_id}, data={data}")
     report = AccidentReport(
@@ -48,40 +70,111 @@ def submit_report():
         delegation=data["delegation"],
         severity=data["severity"],
         phone=data["phone"],
+        lat=lat,
+        lng=lng,
         status="PENDING"
     )
     db.session.add(report)
+    db.session.flush()  # Get report.id
+    # Group with likely duplicates for the moderators
+    assign_cluster(report)
     db.session.commit()
     print(f"[DEBUG] Report submitted: id={report.id}")
     return jsonify({"message": "Report submitted successfully.", "report_id": report.id}), 201
 
-# Get reports (user: own, gov: all)
+def _report_to_dict(r):
+    return {
+        "id": r.id,
+        "date": r.date.isoformat(),
+        "location": r.location,
+        "delegation": r.delegation,
+        "lat": r.lat,
+        "lng": r.lng,
+        "severity": r.severity,
+        "phone": r.phone,
+        "status": r.status,
+        "created_at": r.created_at.isoformat(),
+        "user": {"id": r.user.id, "full_name": r.user.full_name, "email": r.user.email},
+        "accident_id": r.accident_id,
+        "rejection_reason": r.rejection_reason,
+        "duplicate_cluster_id": r.duplicate_cluster_id,
+        "duplicate_accident_id": r.duplicate_accident_id
+    }
+
+
+def encode_cursor(report):
+    """Opaque keyset cursor: position after ``report`` in the queue order"""
+    raw = f"{report.created_at.isoformat()}|{report.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, report_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(report_id)
+    except Exception:
+        abort(400, description="Invalid cursor.")
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f"Invalid {name} date.")
+
+
+# Get reports (user: own, gov: all), newest first, one page at a time
 @reports_bp.route('/reports', methods=['GET'])
 @jwt_required()
 def get_reports():
+    """Query params: status, start/end (submission date, ISO), cluster
+    (duplicate cluster id), limit (default 50, max 200) and cursor. The body is the page; the cursor of
+    the next one is in the X-Next-Cursor header (and Link rel="next")."""
     claims = get_jwt()
     user_id = get_jwt_identity()
-    print(f"[DEBUG] Fetching reports: user_id={user_id}, role={claims.get('role')}")
-    if claims.get("role") == "government":
-        reports = AccidentReport.query.order_by(AccidentReport.created_at.desc()).all()
-    else:
-        reports = AccidentReport.query.filter_by(user_id=user_id).order_by(AccidentReport.created_at.desc()).all()
-    print(f"[DEBUG] Reports fetched: count={len(reports)}")
-    return jsonify([
-        {
-            "id": r.id,
-            "date": r.date.isoformat(),
-            "location": r.location,
-            "delegation": r.delegation,
-            "severity": r.severity,
-            "phone": r.phone,
-            "status": r.status,
-            "created_at": r.created_at.isoformat(),
-            "user": {"id": r.user.id, "full_name": r.user.full_name, "email": r.user.email},
-            "accident_id": r.accident_id,
-            "rejection_reason": r.rejection_reason
-        } for r in reports
-    ])
+    try:
+        limit = max(1, min(int(request.args.get("limit", REPORTS_PAGE_SIZE)), REPORTS_MAX_PAGE_SIZE))
+    except ValueError:
+        abort(400, description="limit must be an integer.")
+
+    query = AccidentReport.query.options(selectinload(AccidentReport.user))
+    if claims.get("role") != "government":
+        query = query.filter(AccidentReport.user_id == int(user_id))
+    status = (request.args.get("status") or "").strip().upper()
+    if status:
+        query = query.filter(AccidentReport.status == status)
+    if request.args.get("cluster"):
+        try:
+            query = query.filter(AccidentReport.duplicate_cluster_id == int(request.args["cluster"]))
+        except ValueError:
+            abort(400, description="cluster must be an integer.")
+    if request.args.get("start"):
+        query = query.filter(AccidentReport.created_at >= _parse_date(request.args["start"], "start"))
+    if request.args.get("end"):
+        end = _parse_date(request.args["end"], "end")
+        if len(request.args["end"]) <= 10:
+            # A bare date includes that whole day
+            end += timedelta(days=1)
+            query = query.filter(AccidentReport.created_at < end)
+        else:
+            query = query.filter(AccidentReport.created_at <= end)
+    if request.args.get("cursor"):
+        created_at, report_id = decode_cursor(request.args["cursor"])
+        query = query.filter(db.or_(
+            AccidentReport.created_at < created_at,
+            db.and_(AccidentReport.created_at == created_at, AccidentReport.id < report_id),
+        ))
+
+    # One row past the page tells whether another page follows
+    reports = query.order_by(AccidentReport.created_at.desc(), AccidentReport.id.desc()).limit(limit + 1).all()
+    response = jsonify([_report_to_dict(r) for r in reports[:limit]])
+    if len(reports) > limit:
+        cursor = encode_cursor(reports[limit - 1])
+        args = {**request.args.to_dict(), "cursor": cursor}
+        response.headers["X-Next-Cursor"] = cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
 
 # Get single report (user: own, gov: any)
 @reports_bp.route('/reports/<int:report_id>', methods=['GET'])
@@ -92,19 +185,7 @@ def get_report(report_id):
     report = AccidentReport.query.get_or_404(report_id)
     if claims.get("role") != "government" and report.user_id != int(user_id):
         abort(403, description="Not authorized.")
-    return jsonify({
-        "id": report.id,
-        "date": report.date.isoformat(),
-        "location": report.location,
-        "delegation": report.delegation,
-        "severity": report.severity,
-        "phone": report.phone,
-        "status": report.status,
-        "created_at": report.created_at.isoformat(),
-        "user": {"id": report.user.id, "full_name": report.user.full_name, "email": report.user.email},
-        "accident_id": report.accident_id,
-        "rejection_reason": report.rejection_reason
-    })
+    return jsonify(_report_to_dict(report))
 
 # Confirm a report (gov only)
 @reports_bp.route('/reports/<int:report_id>/confirm', methods=['POST'])
@@ -122,13 +203,30 @@ def confirm_report(report_id):
         severity=report.severity,
         source="user_report"
     )
+    # Prefer the reporter's coordinates; moderators may supply corrected ones
+    data = request.get_json(silent=True) or {}
+    lat, lng = parse_coordinates(data.get("lat", report.lat), data.get("lng", report.lng))
+    accident.set_coordinates(lat, lng)
     db.session.add(accident)
     db.session.flush()  # Get accident.id
     report.status = "CONFIRMED"
     report.accident_id = accident.id
     db.session.commit()
+    suggest_index.record(delegation=accident.delegation, cause=accident.cause)
     return jsonify({"message": "Report confirmed and accident created.", "accident_id": accident.id})
 
+
+def _rejection_reason(data):
+    """Optional rejection reason of a request body; aborts 400 when invalid"""
+    reason = data.get("reason")
+    if reason is None:
+        return None
+    max_length = AccidentReport.rejection_reason.type.length
+    if not isinstance(reason, str) or len(reason) > max_length:
+        abort(400, description=f"reason must be a string of at most {max_length} characters.")
+    return reason or None
+
+
 # Reject a report (gov only)
 @reports_bp.route('/reports/<int:report_id>/reject', methods=['POST'])
 @jwt_required()
@@ -138,8 +236,243 @@ def reject_report(report_id):
     if report.status != "PENDING":
         abort(400, description="Report already processed.")
     data = request.get_json() or {}
-    reason = data.get("reason")
+    reason = _rejection_reason(data)
     report.status = "REJECTED"
     report.rejection_reason = reason
     db.session.commit()
     return jsonify({"message": "Report rejected."})
+
+
+def _chunks(ids, size=BULK_CHUNK):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _recipients(reports):
+    return [(r.id, r.user.email, r.user.full_name) for r in reports if r.user and r.user.email]
+
+
+def _announce_moderation(new_accidents, recipients, status, message=None):
+    """After the commit: refresh indexes, broadcast new accidents and email
+    the reporters in one batch"""
+    if new_accidents:
+        tally = {}
+        for a in new_accidents:
+            key = (None, a["delegation"], None)
+            tally[key] = tally.get(key, 0) + 1
+        suggest_index.record_counts(tally)
+        cluster_index.mark_stale()
+        broadcast_new_accidents(new_accidents)
+
+    messages = []
+    for report_id, email, name in recipients:
+        subject, body = email_service.render_template(
+            "report_status_changed", name=name, report_id=report_id,
+            status=status.lower(), message=message, report_url="#",
+        )
+        messages.append((email, subject, body))
+    email_service.send_bulk(messages)
+
+
+# Confirm or reject many reports at once (gov only)
+@reports_bp.route('/reports/bulk', methods=['POST'])
+@jwt_required()
+def bulk_moderate_reports():
+    """Body: {"action": "confirm"|"reject", "ids": [...], "reason": "..."}.
+
+    Pending reports among ``ids`` are processed in one transaction:
+    accidents are created with one bulk insert and the reports updated in
+    bulk. Unknown or already processed ids are listed in the response and
+    left alone. Reporter emails and realtime events go out as one batch
+    after the commit.
+    """
+    gov_required()
+    data = request.get_json(silent=True) or {}
+    action = data.get("action")
+    if action not in ("confirm", "reject"):
+        abort(400, description="action must be 'confirm' or 'reject'.")
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids:
+        abort(400, description="ids must be a non-empty list.")
+    try:
+        ids = list(dict.fromkeys(int(i) for i in ids))
+    except (TypeError, ValueError):
+        abort(400, description="ids must be integers.")
+    if len(ids) > BULK_MAX_REPORTS:
+        abort(400, description=f"At most {BULK_MAX_REPORTS} reports per request.")
+    reason = _rejection_reason(data)
+
+    reports = []
+    for chunk in _chunks(ids):
+        reports.extend(
+            AccidentReport.query.options(selectinload(AccidentReport.user))
+            .filter(AccidentReport.id.in_(chunk)).all()
+        )
+    found = {r.id for r in reports}
+    pending = sorted((r for r in reports if r.status == "PENDING"), key=lambda r: r.id)
+    pending_ids = [r.id for r in pending]
+    status = "CONFIRMED" if action == "confirm" else "REJECTED"
+
+    # Claim the reports: a concurrent moderator makes the counts differ
+    claimed = 0
+    for chunk in _chunks(pending_ids):
+        values = {"status": status}
+        if action == "reject":
+            values["rejection_reason"] = reason
+        claimed += AccidentReport.query.filter(
+            AccidentReport.id.in_(chunk), AccidentReport.status == "PENDING"
+        ).update(values, synchronize_session=False)
+    if claimed != len(pending_ids):
+        db.session.rollback()
+        abort(409, description="Some reports were processed concurrently; reload and retry.")
+
+    new_accidents = []
+    if action == "confirm" and pending:
+        now = datetime.utcnow()
+        records = []
+        for r in pending:
+            lat, lng = parse_coordinates(r.lat, r.lng)
+            records.append({
+                "occurred_at": r.date, "location": r.location, "delegation": r.delegation,
+                "severity": r.severity, "source": "user_report", "lat": lat, "lng": lng,
+                "geohash": geohash_for(lat, lng), "created_at": now,
+            })
+        # Ordered RETURNING would make SQLite insert row by row; match the
+        # new ids to reports by value instead (identical reports make
+        # identical accidents, so which one gets which does not matter)
+        key_columns = ("occurred_at", "location", "delegation", "severity", "lat", "lng")
+        # Core insert: the ORM one splits the batch wherever lat/lng are None
+        table = Accident.__table__
+        inserted = {}
+        for row in db.session.execute(
+            insert(table).returning(table.c.id, *[table.c[c] for c in key_columns]), records
+        ):
+            inserted.setdefault(tuple(row[1:]), []).append(row[0])
+        accident_ids = [inserted[tuple(rec[c] for c in key_columns)].pop() for rec in records]
+        db.session.execute(update(AccidentReport), [
+            {"id": r.id, "accident_id": accident_id} for r, accident_id in zip(pending, accident_ids)
+        ])
+        new_accidents = [
+            {"id": accident_id, "occurred_at": rec["occurred_at"].isoformat(), "location": rec["location"],
+             "delegation": rec["delegation"], "severity": rec["severity"], "lat": rec["lat"], "lng": rec["lng"]}
+            for rec, accident_id in zip(records, accident_ids)
+        ]
+    # Read before the commit expires the loaded reports and users
+    recipients = _recipients(pending)
+    db.session.commit()
+
+    _announce_moderation(new_accidents, recipients, status, reason if action == "reject" else None)
+
+    log_action(
+        action=f"bulk_{action}", entity_type="report",
+        description=f"{status.capitalize()} {len(pending_ids)} reports in bulk",
+        new_values={"ids": pending_ids},
+    )
+    return jsonify({
+        "message": f"{len(pending_ids)} reports {status.lower()}.",
+        "processed": pending_ids,
+        "accident_ids": [a["id"] for a in new_accidents],
+        "already_processed": sorted(found - set(pending_ids)),
+        "not_found": [i for i in ids if i not in found],
+    })
+
+
+# Confirm a cluster of duplicate reports as one accident (gov only)
+@reports_bp.route('/reports/clusters/<int:cluster_id>/merge', methods=['POST'])
+@jwt_required()
+def merge_report_cluster(cluster_id):
+    """Body (all optional): {"ids": [id, ...], "accident_id": id, "new": bool,
+    "primary_id": id, "lat": ..., "lng": ...}.
+
+    Every pending report of the cluster (or of ``ids``, a subset of it) is
+    confirmed against one accident:
+    ``accident_id`` if given, else the existing accident the cluster was
+    matched with (unless ``new``), else a new accident built from the
+    ``primary_id`` report (by default the earliest one with coordinates).
+    Accidents of deleted imports are never targets: an explicit one is a
+    409, a matched one is passed over.
+    """
+    gov_required()
+    data = request.get_json(silent=True) or {}
+    members = cluster_members(cluster_id).options(selectinload(AccidentReport.user)).all()
+    if not members:
+        abort(404, description="No pending reports in this cluster.")
+    if data.get("ids") is not None:
+        if not isinstance(data["ids"], list) or not data["ids"]:
+            abort(400, description="ids must be a non-empty list of report ids.")
+        wanted = {str(i) for i in data["ids"]}
+        members = [r for r in members if str(r.id) in wanted]
+        if len(members) != len(wanted):
+            abort(400, description="ids must all be pending reports of this cluster.")
+
+    accident = None
+    if data.get("accident_id") is not None:
+        try:
+            accident = db.session.get(Accident, int(data["accident_id"]))
+        except (TypeError, ValueError):
+            abort(400, description="accident_id must be an integer.")
+        if accident is None:
+            abort(404, description="Accident not found.")
+        if not Accident.query.filter(Accident.id == accident.id, Accident.visible()).count():
+            abort(409, description="The accident belongs to a deleted import.")
+    elif not data.get("new"):
+        # The most matched candidate still visible; a new accident otherwise
+        candidates = [r.duplicate_accident_id for r in members if r.duplicate_accident_id]
+        if candidates:
+            visible = Accident.query.filter(Accident.id.in_(set(candidates)), Accident.visible()).all()
+            if visible:
+                accident = max(visible, key=lambda a: (candidates.count(a.id), -a.id))
+
+    primary = None
+    if accident is None:
+        if data.get("primary_id") is not None:
+            primary = next((r for r in members if str(r.id) == str(data["primary_id"])), None)
+            if primary is None:
+                abort(400, description="primary_id is not a pending report of this cluster.")
+        else:
+            primary = next((r for r in members if r.lat is not None), members[0])
+
+    ids = [r.id for r in members]
+    claimed = AccidentReport.query.filter(
+        AccidentReport.id.in_(ids), AccidentReport.status == "PENDING"
+    ).update({"status": "CONFIRMED"}, synchronize_session=False)
+    if claimed != len(ids):
+        db.session.rollback()
+        abort(409, description="Some reports were processed concurrently; reload and retry.")
+
+    new_accidents = []
+    if primary is not None:
+        accident = Accident(
+            occurred_at=primary.date,
+            location=primary.location,
+            delegation=primary.delegation,
+            severity=primary.severity,
+            source="user_report"
+        )
+        lat, lng = parse_coordinates(data.get("lat", primary.lat), data.get("lng", primary.lng))
+        accident.set_coordinates(lat, lng)
+        db.session.add(accident)
+        db.session.flush()  # Get accident.id
+        new_accidents.append({
+            "id": accident.id, "occurred_at": accident.occurred_at.isoformat(), "location": accident.location,
+            "delegation": accident.delegation, "severity": accident.severity, "lat": lat, "lng": lng,
+        })
+    accident_id = accident.id
+    AccidentReport.query.filter(AccidentReport.id.in_(ids)).update(
+        {"accident_id": accident_id}, synchronize_session=False
+    )
+    recipients = _recipients(members)
+    db.session.commit()
+
+    _announce_moderation(new_accidents, recipients, "CONFIRMED")
+    log_action(
+        action="merge_cluster", entity_type="report", entity_id=cluster_id,
+        description=f"Merged {len(ids)} duplicate reports into accident {accident_id}",
+        new_values={"ids": ids, "accident_id": accident_id, "created": bool(new_accidents)},
+    )
+    return jsonify({
+        "message": f"{len(ids)} reports confirmed as accident {accident_id}.",
+        "processed": ids,
+        "accident_id": accident_id,
+        "created": bool(new_accidents),
+    })
@@ -2,15 +2,20 @@
 # Imports and Blueprint definition must come first
 from flask_smorest import Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import request, jsonify, Response
+from flask import request, jsonify
 from extensions import db
 from models.accident import Accident
 from models.user import User
+from sqlalchemy import or_
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
-from utils.errors import ForbiddenError, NotFoundError, DatabaseError, ValidationError, success_response, paginated_response
+import logging
+import math
+from utils.errors import ForbiddenError, NotFoundError, DatabaseError, ValidationError, RateLimitError, success_response, paginated_response
 from utils.validators import PaginationValidator, DateRangeValidator, FilterValidator
+from utils.geo import cover_bbox, prefix_range, radius_bbox, haversine_km, parse_bbox, parse_point
 from extensions import limiter
+from utils.export import STREAM_CHUNK, gzip_mode, stream_csv
 
 blp = Blueprint("accidents", "accidents", url_prefix="/api/v1/accidents")
 
@@ -75,7 +80,7 @@ def list_accidents():
     except ValidationError as e:
         raise e
     
-    q = Accident.query
+    q = Accident.query.filter(Accident.visible())
 
     # Filtering params
     location = FilterValidator.validate_string('location', max_length=255)
@@ -119,6 +124,8 @@ def list_accidents():
             "delegation": getattr(a, 'delegation', None),
             "severity": a.severity,
             "cause": a.cause,
+            "lat": a.lat,
+            "lng": a.lng,
         }
 
     return paginated_response(
@@ -149,6 +156,98 @@ def accidents_filters():
     return success_response(data=payload, message="Filter options retrieved")
 
 
+@blp.route("/within")
+@jwt_required()
+@limiter.limit("120 per minute")
+def accidents_within():
+    """Accidents inside a bounding box or within a radius of a point.
+
+    Query params (one of):
+      - bbox: min_lng,min_lat,max_lng,max_lat
+      - near: lat,lng together with radius_km (default 5, max 500)
+    Optional:
+      - severity: exact match on severity
+      - limit: max items (default 1000, max 5000)
+
+    Candidates are pruned with the indexed geohash column before the exact
+    bbox/haversine check, so only accidents with coordinates are returned.
+    """
+    bbox = request.args.get('bbox')
+    near = request.args.get('near')
+    if not bbox and not near:
+        raise ValidationError("Provide either bbox or near")
+
+    try:
+        limit = int(request.args.get('limit', 1000))
+    except (TypeError, ValueError):
+        raise ValidationError("limit must be an integer")
+    limit = max(1, min(limit, 5000))
+
+    center = None
+    radius_km = None
+    try:
+        if bbox:
+            min_lat, min_lng, max_lat, max_lng = parse_bbox(bbox)
+        else:
+            center = parse_point(near)
+            radius_km = float(request.args.get('radius_km', 5))
+            # NaN passes the range comparisons below
+            if not math.isfinite(radius_km) or radius_km <= 0 or radius_km > 500:
+                raise ValueError("radius_km must be between 0 and 500")
+            min_lat, min_lng, max_lat, max_lng = radius_bbox(center[0], center[1], radius_km)
+    except ValueError as e:
+        raise ValidationError(str(e))
+
+    cells = cover_bbox(min_lat, min_lng, max_lat, max_lng)
+    q = db.session.query(
+        Accident.id, Accident.occurred_at, Accident.severity, Accident.cause,
+        Accident.governorate, Accident.delegation, Accident.lat, Accident.lng,
+    ).filter(
+        or_(*[Accident.geohash.between(*prefix_range(c)) for c in cells]),
+        Accident.lat.between(min_lat, max_lat),
+        Accident.lng.between(min_lng, max_lng),
+    )
+    severity = FilterValidator.validate_string('severity', max_length=32)
+    if severity:
+        q = q.filter(Accident.severity == severity)
+
+    if center is None:
+        rows = q.order_by(Accident.occurred_at.desc()).limit(limit).all()
+        items = [(r, None) for r in rows]
+    else:
+        items = []
+        for r in q.all():
+            dist = haversine_km(center[0], center[1], r.lat, r.lng)
+            if dist <= radius_km:
+                items.append((r, dist))
+        items.sort(key=lambda it: it[1])
+        items = items[:limit]
+
+    def fmt(r, dist):
+        out = {
+            "id": r.id,
+            "date": r.occurred_at.isoformat() if r.occurred_at is not None else None,
+            "severity": r.severity,
+            "cause": r.cause,
+            "governorate": r.governorate,
+            "delegation": r.delegation,
+            "lat": r.lat,
+            "lng": r.lng,
+        }
+        if dist is not None:
+            out["distance_km"] = round(dist, 3)
+        return out
+
+    return success_response(
+        data={
+            "items": [fmt(r, d) for r, d in items],
+            "count": len(items),
+            "bbox": [min_lng, min_lat, max_lng, max_lat],
+        },
+        message="Accidents retrieved successfully"
+    )
+
+
 @blp.route('/export')
 @jwt_required()
 @limiter.limit("5 per minute")
@@ -157,7 +256,7 @@ def export_csv():
 
     Accepts same query params as list_accidents.
     """
-    q = Accident.query
+    q = Accident.query.filter(Accident.visible())
     location = FilterValidator.validate_string('location', max_length=255)
     delegation = FilterValidator.validate_string('delegation', max_length=255)
     cause = FilterValidator.validate_string('cause', max_length=255)
@@ -185,26 +284,26 @@ def export_csv():
         except Exception:
             pass
 
-    items = q.order_by(Accident.occurred_at.desc()).all()
+    q = q.order_by(Accident.occurred_at.desc())
 
-    # Build CSV
-    import io, csv
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["id", "occurred_at", "severity", "governorate", "delegation", "cause"])
-    for a in items:
-        writer.writerow([
-            a.id,
-            a.occurred_at.isoformat() if a.occurred_at else '',
-            a.severity,
-            getattr(a, 'governorate', None) or a.location or '',
-            getattr(a, 'delegation', None) or '',
-            a.cause or ''
-        ])
+    # Streamed from a server-side cursor; only these columns are loaded
+    def rows():
+        selected = q.with_entities(
+            Accident.id, Accident.occurred_at, Accident.severity, Accident.governorate,
+            Accident.location, Accident.delegation, Accident.cause,
+        ).execution_options(yield_per=STREAM_CHUNK)
+        for a in selected:
+            yield [
+                a.id,
+                a.occurred_at.isoformat() if a.occurred_at else '',
+                a.severity,
+                a.governorate or a.location or '',
+                a.delegation or '',
+                a.cause or ''
+            ]
 
-    resp = Response(output.getvalue(), mimetype='text/csv')
-    resp.headers['Content-Disposition'] = 'attachment; filename=accidents_export.csv'
-    return resp
+    headers = ["id", "occurred_at", "severity", "governorate", "delegation", "cause"]
+    return stream_csv(rows(), 'accidents_export.csv', headers, gzip_mode())
 
 
 @blp.route('/batch', methods=['POST'])
@@ -227,7 +326,9 @@ def batch_create_accidents():
       ]
     }
     
-    Government users only. Max 100 items per request.
+    Government users only. Max 50,000 items per request; invalid items
+    are reported per index in ``failures`` instead of failing the batch.
+    For large volumes prefer the streamed POST /bulk.
     """
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
@@ -246,3 +347,89 @@ def batch_create_accidents():
         status_code=201
     )
 
+
+@blp.route('/bulk', methods=['POST'])
+@jwt_required()
+@limiter.exempt
+def bulk_ingest_accidents():
+    """Ingest up to 50,000 accidents in one streamed request.
+
+    Body: a JSON array of records, or one record per line with
+    Content-Type application/x-ndjson. Records use the CSV import fields
+    and aliases (occurred_at, severity, location, delegation, cause, lat,
+    lng). Valid records are inserted in chunks; failures are reported per
+    index and records already stored are listed in ``duplicates``.
+
+    Limited by record volume (BULK_INGEST_RATE_LIMIT per user) rather than
+    request count: when the budget runs out, processing stops and
+    ``next_index`` tells the client where to resume.
+
+    Government users only.
+    """
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    if not user or user.role != 'government':
+        raise ForbiddenError("Only government users can create accidents")
+
+    from models.import_batch import ImportBatch
+    from utils.clustering import cluster_index
+    from utils.ingest import NDJSON_TYPES, ingest, iter_records, volume_budget
+
+    ndjson = (request.mimetype or '').lower() in NDJSON_TYPES
+    try:
+        # Tracked as an import batch so it can be listed and undone like CSV imports
+        batch = ImportBatch(
+            filename='bulk-api.ndjson' if ndjson else 'bulk-api.json',
+            uploader_id=str(user_id),
+            uploader_role=user.role,
+        )
+        db.session.add(batch)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise DatabaseError(f"Failed to create import batch: {str(e)}")
+
+    result = ingest(
+        iter_records(request.stream, request.mimetype),
+        batch_id=batch.id,
+        source='government_import',
+        budget=volume_budget(user_id),
+    )
+
+    # A batch without rows would only clutter the import history
+    batch_id = batch.id if result.created else None
+    try:
+        if not result.created:
+            db.session.delete(batch)
+        else:
+            batch.imported_count = result.created
+            batch.skipped_count = len(result.failures)
+            batch.duplicate_count = len(result.duplicates)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise DatabaseError(f"Failed to update import batch: {str(e)}")
+
+    if result.stopped == 'rate_limited' and not result.received:
+        raise RateLimitError("Record volume limit reached; retry later")
+    if result.stopped == 'malformed' and not result.received:
+        raise ValidationError(result.message)
+    if result.created:
+        cluster_index.mark_stale()
+
+    try:
+        logging.getLogger("import_audit").info(
+            f"{user_id} | {user.role} | bulk_ingest | batch_id={batch_id},received={result.received},"
+            f"created={result.created},failed={len(result.failures)},duplicates={len(result.duplicates)},"
+            f"stopped={result.stopped},created_id_ranges={result.id_ranges}"
+        )
+    except Exception:
+        pass
+
+    data = result.to_dict()
+    data['batch_id'] = batch_id
+    return success_response(
+        data=data,
+        message=f"Created {result.created} of {result.received} accidents",
+        status_code=201 if result.created else 200
+    )
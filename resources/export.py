@@ -4,67 +4,155 @@ Export Routes
 API endpoints for data export
 """
 
-from flask import Blueprint, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import json
+import os
+from datetime import datetime
+
+from flask import Blueprint, request, send_file
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from extensions import db
 from models.accident import Accident
+from models.export_job import ExportJob
+from models.saved_report import SavedReport
 from models.user import User
 from utils.export import (
-    export_to_csv, export_to_excel, export_to_pdf,
-    format_accident_for_export, format_user_for_export
+    ACCIDENT_EXPORT_HEADERS, COLUMNAR_FORMATS, PDF_SUMMARY_ROWS, accident_export_query,
+    accident_summary, columnar_available, export_to_csv, export_to_excel, export_to_pdf,
+    format_user_for_export, gzip_mode, iter_accident_rows, iter_record_batches, pivot_table,
+    stream_columnar, stream_csv, stream_xlsx_sheets
 )
+from utils.export_jobs import FORMATS, canonical_filters, export_jobs
+from utils.report_scheduler import CronSchedule, report_scheduler
 from utils.audit import log_export
 
 export_bp = Blueprint('export', __name__, url_prefix='/api/export')
 
+# Distinct dimensions grouped on in one statistics export scan
+MAX_STAT_DIMENSIONS = 6
+
 
 @export_bp.route('/accidents/<format_type>')
 @jwt_required()
 def export_accidents(format_type):
-    """Export accidents in specified format"""
-    
-    # Get filters from query params
-    governorate = request.args.get('governorate')
-    severity = request.args.get('severity')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # Build query
-    query = Accident.query
-    
-    if governorate:
-        query = query.filter(Accident.governorate == governorate)
-    if severity:
-        query = query.filter(Accident.severity == severity)
-    if start_date:
-        from datetime import datetime
-        try:
-            query = query.filter(Accident.occurred_at >= datetime.fromisoformat(start_date))
-        except:
-            pass
-    if end_date:
-        from datetime import datetime
-        try:
-            query = query.filter(Accident.occurred_at <= datetime.fromisoformat(end_date))
-        except:
-            pass
-    
-    accidents = query.order_by(Accident.occurred_at.desc()).all()
-    data = [format_accident_for_export(a) for a in accidents]
-    
-    # Log export
-    log_export('accident', len(data), format_type)
-    
-    # Export based on format
+    """Export accidents in specified format
+
+    ``?async=1`` queues a background export and returns its job (see
+    /jobs); otherwise a cached artifact of the same export is sent when
+    there is one, and the export is streamed when there is not.
+    """
+    error = _format_error(format_type)
+    if error:
+        return error
+
+    filters = canonical_filters(format_type, request.args)
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return _queue_export(format_type, filters)
+
+    cached = export_jobs.cached(format_type, filters)
+    if cached is not None:
+        log_export('accident', cached.row_count, format_type)
+        return _send_artifact(cached)
+
+    query = accident_export_query(filters)
     timestamp = __import__('datetime').datetime.now().strftime('%Y%m%d_%H%M%S')
-    
+
+    # Read from a server-side cursor; logged once the last row is written
+    def rows():
+        count = 0
+        for row in iter_accident_rows(query):
+            count += 1
+            yield row
+        log_export('accident', count, format_type)
+
     if format_type == 'csv':
-        return export_to_csv(data, f'accidents_{timestamp}.csv')
-    elif format_type == 'excel':
-        return export_to_excel(data, f'accidents_{timestamp}.xlsx', sheet_name='Accidents')
-    elif format_type == 'pdf':
-        return export_to_pdf(data, f'accidents_{timestamp}.pdf', title='Accident Report')
+        return stream_csv(rows(), f'accidents_{timestamp}.csv', ACCIDENT_EXPORT_HEADERS, gzip_mode())
+    if format_type == 'excel':
+        return export_to_excel(rows(), f'accidents_{timestamp}.xlsx', ACCIDENT_EXPORT_HEADERS, sheet_name='Accidents')
+    if format_type in COLUMNAR_FORMATS:
+        def batches():
+            count = 0
+            for batch in iter_record_batches(query):
+                count += batch.num_rows
+                yield batch
+            log_export('accident', count, format_type)
+
+        suffix = COLUMNAR_FORMATS[format_type][0]
+        return stream_columnar(format_type, batches(), f'accidents_{timestamp}{suffix}')
+
+    # Log export
+    log_export('accident', query.order_by(None).count(), format_type)
+
+    # ?summary=1: charts and aggregates first, then a capped detail section
+    # (none with ?summary_only=1)
+    if filters.get('summary'):
+        return export_to_pdf(iter_accident_rows(query), f'accidents_{timestamp}.pdf', title='Accident Report',
+                             headers=ACCIDENT_EXPORT_HEADERS, summary=accident_summary(query),
+                             max_rows=0 if filters.get('summary_only') else PDF_SUMMARY_ROWS)
+    return export_to_pdf(iter_accident_rows(query), f'accidents_{timestamp}.pdf', title='Accident Report',
+                         headers=ACCIDENT_EXPORT_HEADERS)
+
+
+def _format_error(format_type):
+    """Error response for an accident export format that cannot be served"""
+    if format_type not in FORMATS:
+        return {'error': f"Invalid format. Use: {', '.join(FORMATS)}"}, 400
+    if format_type in COLUMNAR_FORMATS and not columnar_available():
+        return {'error': 'Parquet and Arrow exports require pyarrow'}, 501
+    return None
+
+
+def _queue_export(format_type, filters):
+    job, cached = export_jobs.request(format_type, filters, requested_by=get_jwt_identity())
+    return {'job': job.to_dict(), 'cached': cached}, 200 if cached else 202
+
+
+def _send_artifact(job):
+    export_jobs.touch(job)
+    if job.format in COLUMNAR_FORMATS:
+        mimetype = COLUMNAR_FORMATS[job.format][1]
     else:
-        return {'error': 'Invalid format. Use: csv, excel, pdf'}, 400
+        mimetype = 'application/gzip' if job.filename.endswith('.gz') else None
+    # conditional=True answers Range and If-Modified-Since requests
+    return send_file(job.path, as_attachment=True, download_name=job.filename,
+                     mimetype=mimetype, conditional=True)
+
+
+@export_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def create_export_job():
+    """Queue an accident export; body or query: format plus the filters"""
+    params = request.get_json(silent=True) or request.args
+    format_type = str(params.get('format') or '').lower()
+    error = _format_error(format_type)
+    if error:
+        return error
+    return _queue_export(format_type, canonical_filters(format_type, params))
+
+
+@export_bp.route('/jobs/<int:job_id>')
+@jwt_required()
+def get_export_job(job_id):
+    """Status of an export job"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None:
+        return {'error': 'Export job not found'}, 404
+    return {'job': job.to_dict()}
+
+
+@export_bp.route('/jobs/<int:job_id>/download')
+@jwt_required()
+def download_export_job(job_id):
+    """The artifact of a completed export job; supports Range requests"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None:
+        return {'error': 'Export job not found'}, 404
+    if job.status == 'evicted' or (job.status == 'completed' and not os.path.exists(job.path or '')):
+        return {'error': 'Export expired, request it again'}, 410
+    if job.status != 'completed':
+        return {'error': f'Export is {job.status}', 'job': job.to_dict()}, 409
+    if request.headers.get('Range') is None:
+        log_export('accident', job.row_count, job.format)
+    return _send_artifact(job)
 
 
 @export_bp.route('/users/<format_type>')
@@ -102,52 +190,79 @@ def export_users(format_type):
 @export_bp.route('/statistics/<format_type>')
 @jwt_required()
 def export_statistics(format_type):
-    """Export statistics summary"""
-    from sqlalchemy import func
-    from extensions import db
-    
-    # Get aggregated stats
+    """Export statistics summary
+
+    Takes the stats filters (start, end, governorate, delegation,
+    severity, cause, source), ``dimensions`` to break down by (default
+    governorate,severity,cause) and ``pairs`` to cross-tabulate, e.g.
+    ``pairs=governorate:month,cause:severity``. Every breakdown is rolled
+    up from one grouped scan; the Excel export adds a pivoted sheet per
+    pair.
+    """
+    from resources.stats import (
+        STATS_DIMENSIONS, dimension_label, dimension_order, grouped_counts, rollup
+    )
+
+    if format_type not in ('csv', 'excel', 'pdf'):
+        return {'error': 'Invalid format. Use: csv, excel, pdf'}, 400
+
+    dims = [d.strip() for d in request.args.get('dimensions', 'governorate,severity,cause').split(',') if d.strip()]
+    dims = list(dict.fromkeys(dims))
+    pairs = []
+    for spec in request.args.get('pairs', '').split(','):
+        if spec.strip():
+            pairs.append(tuple(part.strip() for part in spec.split(':')))
+    pairs = list(dict.fromkeys(pairs))
+    unknown = [d for d in dims + [d for pair in pairs for d in pair] if d not in STATS_DIMENSIONS]
+    if unknown:
+        return {'error': f"Unknown dimension: {unknown[0]}. Use: {', '.join(STATS_DIMENSIONS)}"}, 400
+    if any(len(pair) != 2 or pair[0] == pair[1] for pair in pairs):
+        return {'error': 'Pairs are two different dimensions, e.g. governorate:month'}, 400
+
+    scanned = list(dict.fromkeys(dims + [d for pair in pairs for d in pair]))
+    if len(scanned) > MAX_STAT_DIMENSIONS:
+        return {'error': f'At most {MAX_STAT_DIMENSIONS} distinct dimensions per export'}, 400
+    counts = grouped_counts(scanned)
+
     stats = []
-    
-    # By governorate
-    gov_stats = db.session.query(
-        Accident.governorate,
-        func.count(Accident.id).label('count')
-    ).group_by(Accident.governorate).all()
-    
-    for gov, count in gov_stats:
-        stats.append({
-            'Category': 'By Governorate',
-            'Item': gov or 'Unknown',
-            'Count': count
-        })
-    
-    # By severity
-    sev_stats = db.session.query(
-        Accident.severity,
-        func.count(Accident.id).label('count')
-    ).group_by(Accident.severity).all()
-    
-    for sev, count in sev_stats:
-        stats.append({
-            'Category': 'By Severity',
-            'Item': sev or 'Unknown',
-            'Count': count
-        })
-    
-    # By cause
-    cause_stats = db.session.query(
-        Accident.cause,
-        func.count(Accident.id).label('count')
-    ).group_by(Accident.cause).all()
-    
-    for cause, count in cause_stats:
-        stats.append({
-            'Category': 'By Cause',
-            'Item': cause or 'Unknown',
-            'Count': count
-        })
-    
+    for dim in dims:
+        totals = {key[0]: count for key, count in rollup(counts, scanned, [dim]).items()}
+        for value in dimension_order(dim, totals):
+            stats.append({
+                'Category': f'By {dim.title()}',
+                'Item': dimension_label(dim, value),
+                'Count': totals[value]
+            })
+
+    pivots = []
+    for row_dim, col_dim in pairs:
+        cells = rollup(counts, scanned, [row_dim, col_dim])
+        row_totals, col_totals = {}, {}
+        for (row_value, col_value), count in cells.items():
+            row_totals[row_value] = row_totals.get(row_value, 0) + count
+            col_totals[col_value] = col_totals.get(col_value, 0) + count
+        row_values = dimension_order(row_dim, row_totals)
+        col_values = dimension_order(col_dim, col_totals)
+        category = f'{row_dim.title()} x {col_dim.title()}'
+        for row_value in row_values:
+            for col_value in col_values:
+                if (row_value, col_value) in cells:
+                    stats.append({
+                        'Category': category,
+                        'Item': f'{dimension_label(row_dim, row_value)} / {dimension_label(col_dim, col_value)}',
+                        'Count': cells[(row_value, col_value)]
+                    })
+        labelled = {
+            (dimension_label(row_dim, r), dimension_label(col_dim, c)): count for (r, c), count in cells.items()
+        }
+        headers, rows = pivot_table(
+            labelled,
+            [dimension_label(row_dim, v) for v in row_values],
+            [dimension_label(col_dim, v) for v in col_values],
+            corner=f'{row_dim.title()} \\ {col_dim.title()}',
+        )
+        pivots.append((category, headers, rows))
+
     # Log export
     log_export('statistics', len(stats), format_type)
     
@@ -156,8 +271,188 @@ def export_statistics(format_type):
     if format_type == 'csv':
         return export_to_csv(stats, f'statistics_{timestamp}.csv')
     elif format_type == 'excel':
-        return export_to_excel(stats, f'statistics_{timestamp}.xlsx', sheet_name='Statistics')
-    elif format_type == 'pdf':
-        return export_to_pdf(stats, f'statistics_{timestamp}.pdf', title='Statistics Report')
+        headers = ['Category', 'Item', 'Count']
+        summary = ([row[h] for h in headers] for row in stats)
+        return stream_xlsx_sheets([('Statistics', headers, summary)] + pivots, f'statistics_{timestamp}.xlsx')
     else:
-        return {'error': 'Invalid format. Use: csv, excel, pdf'}, 400
+        return export_to_pdf(stats, f'statistics_{timestamp}.pdf', title='Statistics Report')
+
+
+# ---------------- SAVED REPORTS ----------------
+
+def _staff_only():
+    if get_jwt().get('role') not in ('government', 'admin'):
+        return {'error': 'Unauthorized'}, 403
+    return None
+
+
+def _apply_report_fields(report, data):
+    """Validate a saved report body onto ``report``; returns an error response or None"""
+    name = str(data.get('name', report.name or '')).strip()
+    if not name:
+        return {'error': 'Name is required'}, 400
+    format_type = str(data.get('format', report.format or '')).lower()
+    error = _format_error(format_type)
+    if error:
+        return error
+
+    sections = data.get('sections', report.section_list() if report.sections else ['details'])
+    if not isinstance(sections, list) or not sections or any(s not in SavedReport.SECTIONS for s in sections):
+        return {'error': f"Sections are a non-empty list of: {', '.join(SavedReport.SECTIONS)}"}, 400
+    if 'summary' in sections and format_type != 'pdf':
+        return {'error': 'The summary section is available in PDF reports only'}, 400
+
+    filters = data.get('filters', json.loads(report.filters or '{}'))
+    if not isinstance(filters, dict):
+        return {'error': 'Filters must be an object'}, 400
+    options = {'summary': 'summary' in sections, 'summary_only': 'details' not in sections}
+    filters = canonical_filters(format_type, {**filters, **options})
+
+    schedule = data.get('schedule', report.schedule) or None
+    next_run_at = None
+    if schedule:
+        try:
+            next_run_at = CronSchedule(schedule).next_after(datetime.utcnow())
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+    recipients = data.get('recipients', report.recipient_list())
+    if isinstance(recipients, str):
+        recipients = recipients.split(',')
+    recipients = [str(r).strip() for r in recipients or [] if str(r).strip()]
+    if any('@' not in r for r in recipients):
+        return {'error': 'Recipients must be email addresses'}, 400
+
+    report.name = name[:120]
+    report.format = format_type
+    report.sections = json.dumps(sections)
+    report.filters = json.dumps(filters, sort_keys=True)
+    report.schedule = schedule
+    report.next_run_at = next_run_at
+    report.refresh_on_change = bool(data.get('refresh_on_change', report.refresh_on_change))
+    report.recipients = ','.join(recipients) or None
+    report.attach = bool(data.get('attach', True if report.attach is None else report.attach))
+    return None
+
+
+@export_bp.route('/reports', methods=['GET'])
+@jwt_required()
+def list_saved_reports():
+    """Saved report definitions and their latest artifacts"""
+    error = _staff_only()
+    if error:
+        return error
+    reports = SavedReport.query.order_by(SavedReport.name).all()
+    return {'reports': [r.to_dict() for r in reports]}
+
+
+@export_bp.route('/reports', methods=['POST'])
+@jwt_required()
+def create_saved_report():
+    """Save a report definition and render it right away
+
+    Body: name, format, filters, sections (summary/details), schedule
+    (cron or @daily/@weekly/@monthly, UTC), refresh_on_change, recipients,
+    attach.
+    """
+    error = _staff_only()
+    if error:
+        return error
+    report = SavedReport(owner_id=get_jwt_identity())
+    error = _apply_report_fields(report, request.get_json(silent=True) or {})
+    if error:
+        return error
+    db.session.add(report)
+    db.session.commit()
+    report_scheduler.render(report)
+    return {'report': report.to_dict()}, 201
+
+
+@export_bp.route('/reports/<int:report_id>', methods=['GET', 'PUT', 'DELETE'])
+@jwt_required()
+def saved_report(report_id):
+    """Read, update or delete a saved report"""
+    error = _staff_only()
+    if error:
+        return error
+    report = db.session.get(SavedReport, report_id)
+    if report is None:
+        return {'error': 'Saved report not found'}, 404
+    if request.method == 'DELETE':
+        db.session.delete(report)
+        db.session.commit()
+        return {'message': 'Saved report deleted'}
+    if request.method == 'PUT':
+        before = (report.format, report.filters)
+        error = _apply_report_fields(report, request.get_json(silent=True) or {})
+        if error:
+            db.session.rollback()
+            return error
+        db.session.commit()
+        if (report.format, report.filters) != before:
+            report_scheduler.render(report)
+    return {'report': report.to_dict()}
+
+
+@export_bp.route('/reports/<int:report_id>/run', methods=['POST'])
+@jwt_required()
+def run_saved_report(report_id):
+    """Render a saved report now (a cached artifact is reused)"""
+    error = _staff_only()
+    if error:
+        return error
+    report = db.session.get(SavedReport, report_id)
+    if report is None:
+        return {'error': 'Saved report not found'}, 404
+    job = report_scheduler.render(report)
+    return {'report': report.to_dict()}, 200 if job.status == 'completed' else 202
+
+
+@export_bp.route('/reports/<int:report_id>/download')
+@jwt_required()
+def download_saved_report(report_id):
+    """The latest artifact of a saved report, as a static file
+
+    When it was evicted or never rendered, a render is queued and 202
+    returned with the job to poll.
+    """
+    error = _staff_only()
+    if error:
+        return error
+    report = db.session.get(SavedReport, report_id)
+    if report is None:
+        return {'error': 'Saved report not found'}, 404
+    job = report.job
+    if job is None or job.status in ('failed', 'evicted') or (
+        job.status == 'completed' and not os.path.exists(job.path or '')
+    ):
+        job = report_scheduler.render(report)
+    if job.status != 'completed':
+        return {'report': report.to_dict(), 'job': job.to_dict()}, 202
+    if request.headers.get('Range') is None:
+        log_export('accident', job.row_count, job.format, description=f"Downloaded saved report {report.name}")
+    return _send_artifact(job)
+
+
+@export_bp.route('/reports/shared/<token>')
+def download_shared_report(token):
+    """The render of a saved report linked from its email, without login
+
+    The signed token names the report and render; it expires after
+    REPORT_LINK_MAX_AGE. A render evicted since is replaced by the
+    report's latest one when that is still on disk.
+    """
+    try:
+        report_id, job_id = report_scheduler.read_download_token(token)
+    except ValueError as e:
+        return {'error': str(e)}, 403
+    report = db.session.get(SavedReport, report_id)
+    if report is None:
+        return {'error': 'Saved report not found'}, 404
+    for job in (db.session.get(ExportJob, job_id), report.job):
+        if job is not None and job.status == 'completed' and os.path.exists(job.path or ''):
+            if request.headers.get('Range') is None:
+                log_export('accident', job.row_count, job.format,
+                           description=f"Downloaded saved report {report.name} from an emailed link")
+            return _send_artifact(job)
+    return {'error': 'The report file is no longer available'}, 410
@@ -1,13 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, url_for
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from extensions import db
 from models.accident import Accident
 from models.import_batch import ImportBatch
-from datetime import datetime
-import csv
-import io
+from models.import_job import ImportJob
+from models.delete_job import DeleteJob
+from utils.clustering import cluster_index
+from utils.suggest import suggest_index
+from utils.importer import map_columns, run_import
+from utils.import_files import FORMATS, UploadError, open_upload, upload_format
+from utils.import_jobs import import_jobs
+from utils.purge import purge_jobs
+from utils.sync import SOURCE_PATTERN, map_sync_columns, run_sync
+import json
 import logging
 import os
+import uuid
 
 import_api = Blueprint("import_api", __name__, url_prefix="/upload/import")
 
@@ -39,40 +47,14 @@ def import_csv():
     if not file:
         return jsonify({"message": "No file provided"}), 400
 
-    # Read CSV text
-    stream = io.StringIO(file.stream.read().decode("utf-8"))
-    reader = csv.DictReader(stream)
-
-    # Flexible column matching: accept common aliases so users can upload varied CSVs
-    aliases = {
-        'occurred_at': ['occurred_at', 'occurred', 'date', 'datetime', 'timestamp', 'occurred at'],
-        'severity': ['severity', 'sev', 'level'],
-        'location': ['location', 'governorate', 'state', 'region', 'place'],
-        'delegation': ['delegation', 'deleg', 'municipality', 'commune', 'district'],
-        'cause': ['cause', 'reason', 'accident_cause'],
-    }
-
-    # Build a mapping from canonical name -> actual CSV column name
-    csv_fields = [f.strip().lower() for f in (reader.fieldnames or [])]
-    column_map = {}
-    missing = []
-    for key, keys in aliases.items():
-        found = None
-        for alias in keys:
-            if alias.lower() in csv_fields:
-                # find actual original header with that lowercase
-                for original in reader.fieldnames:
-                    if original.strip().lower() == alias.lower():
-                        found = original
-                        break
-                if found:
-                    break
-        if found:
-            column_map[key] = found
-        else:
-            # only require the three core fields
-            if key in ('occurred_at', 'severity', 'location'):
-                missing.append(key)
+    # Read incrementally; the upload is never held in memory as one string
+    try:
+        reader = open_upload(file.stream, file.filename)
+        column_map, missing = map_columns(reader.fieldnames)
+    except UnicodeDecodeError as e:
+        return jsonify({'message': 'File is not valid UTF-8 text', 'error': str(e)}), 400
+    except UploadError as e:
+        return jsonify({'message': str(e), 'accepted_formats': list(FORMATS)}), 400
 
     if missing:
         return jsonify({
@@ -81,6 +63,18 @@ def import_csv():
             'available_columns': reader.fieldnames,
         }), 400
 
+    # ?dry_run=1 validates the whole file in the process pool; nothing is
+    # written to the database or the audit log
+    if request.args.get('dry_run', 'false').lower() in ('1', 'true', 'yes'):
+        summary, token = import_jobs.dry_run(reader, column_map)
+        return jsonify({
+            "message": "Dry run completed",
+            "dry_run": True,
+            **summary,
+            "column_map": column_map,
+            "error_report_url": url_for('import_api.download_error_report', token=token) if token else None,
+        }), 200
+
     # Create an import batch record to track this upload
     try:
         batch = ImportBatch(
@@ -89,131 +83,20 @@ def import_csv():
             uploader_role=claims.get('role')
         )
         db.session.add(batch)
-        db.session.flush()  # get batch.id
+        db.session.commit()  # get batch.id; chunks below commit independently
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': 'Failed to create import batch', 'error': str(e)}), 500
 
-    imported = 0
-    skipped = 0
-    errors = []
-    created_ids = []
-
-    for idx, row in enumerate(reader, start=2):
-        # Basic presence checks using detected column names
-        try:
-            val_occurred = row.get(column_map.get('occurred_at'))
-            val_severity = row.get(column_map.get('severity'))
-            val_location = row.get(column_map.get('location'))
-        except Exception:
-            val_occurred = val_severity = val_location = None
-
-        if not val_occurred or not val_severity or not val_location:
-            skipped += 1
-            errors.append({"row": idx, "reason": "Missing required field(s)"})
-            continue
-
-        # Parse datetime: accept ISO first, then common CSV formats, then fall
-        # back to python-dateutil if available. This lets imports accept values
-        # like '2015-10-22 at 06:07PM' which appear in provided CSVs.
-        def _parse_occurred(s):
-            if not s:
-                raise ValueError('Empty occurred_at')
-            # try ISO
-            try:
-                return datetime.fromisoformat(s)
-            except Exception:
-                pass
-            # try common formats
-            fmts = [
-                "%Y-%m-%d at %I:%M%p",
-                "%Y-%m-%d %I:%M%p",
-                "%Y-%m-%d %H:%M:%S",
-                "%Y-%m-%d %H:%M",
-                "%d/%m/%Y %H:%M",
-                "%d/%m/%Y %I:%M%p",
-            ]
-            for f in fmts:
-                try:
-                    return datetime.strptime(s, f)
-                except Exception:
-                    continue
-            # try dateutil if installed
-            try:
-                from dateutil import parser as _dp
-                return _dp.parse(s)
-            except Exception:
-                raise ValueError(f"Invalid occurred_at: Invalid isoformat string: '{s}'")
-
-        try:
-            occurred_at = _parse_occurred(val_occurred)
-        except Exception as e:
-            skipped += 1
-            errors.append({"row": idx, "reason": f"Invalid occurred_at: {str(e)}"})
-            continue
+    # Rows are validated and bulk-inserted CHUNK_SIZE at a time, one
+    # commit per chunk, so a bad chunk never loses earlier ones
+    result = run_import(reader, column_map, batch.id)
 
-        # Normalize and validate severity
-        try:
-            severity = val_severity.strip().lower()
-        except Exception:
-            severity = ''
-
-        if severity not in ("low", "medium", "high"):
-            skipped += 1
-            errors.append({"row": idx, "reason": f"Invalid severity: {val_severity}"})
-            continue
-
-        # Everything OK -> create record
-        try:
-            # Normalize location: try to map to a Tunisian governorate if possible
-            raw_loc = (val_location or '').strip()
-            # simple mapping by substring match (case-insensitive)
-            governorates = [
-                'Ariana','Béja','Ben Arous','Bizerte','Gabès','Gafsa','Jendouba','Kairouan',
-                'Kasserine','Kébili','Le Kef','Mahdia','Manouba','Medenine','Monastir','Nabeul',
-                'Sfax','Sidi Bouzid','Siliana','Sousse','Tataouine','Tozeur','Tunis','Zaghouan'
-            ]
-            mapped = None
-            low = raw_loc.lower()
-            for g in governorates:
-                if g.lower() in low:
-                    mapped = g
-                    break
-
-            location_value = mapped if mapped else raw_loc
-
-            # capture delegation if present in CSV
-            delegation_val = None
-            if column_map.get('delegation'):
-                delegation_val = (row.get(column_map.get('delegation')) or '').strip() or None
-
-            cause_val = None
-            if column_map.get('cause'):
-                cause_val = row.get(column_map.get('cause')) or None
-
-            accident = Accident(
-                occurred_at=occurred_at,
-                severity=severity,
-                location=location_value,
-                governorate=(mapped if mapped else None),
-                delegation=delegation_val,
-                cause=(cause_val or None),
-                source="government_import",
-                batch_id=batch.id,
-            )
-            db.session.add(accident)
-            db.session.flush()  # get id
-            created_ids.append(accident.id)
-            imported += 1
-        except Exception as e:
-            # Catch model/db errors for specific row
-            skipped += 1
-            errors.append({"row": idx, "reason": f"DB error: {str(e)}"})
-
-    # Commit only once
     # Update batch counters and commit
     try:
-        batch.imported_count = imported
-        batch.skipped_count = skipped
+        batch.imported_count = result.imported
+        batch.skipped_count = result.skipped
+        batch.duplicate_count = result.duplicates
         db.session.add(batch)
         db.session.commit()
     except Exception as e:
@@ -223,11 +106,18 @@ def import_csv():
             "message": "Database commit failed",
             "error": str(e),
         }), 500
+
+    # New rows are merged into the map cluster hierarchy on next query
+    cluster_index.mark_stale()
+    suggest_index.record_counts(result.tally)
+
     # Audit log the import action
     try:
         actor = get_jwt_identity() or get_jwt().get('sub') or 'unknown'
         role = get_jwt().get('role')
-        details = f"imported={imported},skipped={skipped},created_ids={created_ids}"
+        details = (f"batch_id={batch.id},imported={result.imported},skipped={result.skipped},"
+                   f"duplicates={result.duplicates},"
+                   f"created_id_ranges={result.id_ranges}")
         logger.info(f"{actor} | {role} | import | {details}")
     except Exception:
         # Don't fail the request if logging fails
@@ -235,22 +125,262 @@ def import_csv():
 
     return jsonify({
         "message": "Import completed",
-        "imported": imported,
-        "skipped": skipped,
-        "errors": errors,
-        "created_ids": created_ids,
+        **result.to_dict(),
         "batch_id": batch.id,
         "column_map": column_map,
     }), 200
 
 
+@import_api.route("/sync", methods=["POST"])
+@jwt_required()
+def sync_feed():
+    """Delta-sync a partner feed: upsert rows by the partner's external id.
+
+    ``?source=`` names the feed. Only new or changed rows are written and
+    the response is a diff summary; see utils/sync.py.
+    """
+    claims = get_jwt()
+    if claims.get("role") != "government":
+        return jsonify({"message": "Forbidden"}), 403
+
+    source = (request.args.get('source') or request.form.get('source') or '').strip()
+    if not SOURCE_PATTERN.match(source):
+        return jsonify({'message': 'source is required (letters, digits, . _ -; at most 64 characters)'}), 400
+
+    file = request.files.get("file")
+    if not file:
+        return jsonify({"message": "No file provided"}), 400
+
+    try:
+        reader = open_upload(file.stream, file.filename)
+        column_map, missing = map_columns(reader.fieldnames)
+        sync_map, missing_sync = map_sync_columns(reader.fieldnames)
+    except UnicodeDecodeError as e:
+        return jsonify({'message': 'File is not valid UTF-8 text', 'error': str(e)}), 400
+    except UploadError as e:
+        return jsonify({'message': str(e), 'accepted_formats': list(FORMATS)}), 400
+
+    if missing or missing_sync:
+        return jsonify({
+            'message': 'Missing required columns',
+            'missing_columns': missing + missing_sync,
+            'available_columns': reader.fieldnames,
+        }), 400
+
+    try:
+        batch = ImportBatch(
+            filename=(getattr(file, 'filename', None) or None),
+            uploader_id=str(get_jwt_identity() or claims.get('sub') or 'unknown'),
+            uploader_role=claims.get('role'),
+            sync_source=source,
+        )
+        db.session.add(batch)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to create import batch', 'error': str(e)}), 500
+
+    result = run_sync(reader, column_map, sync_map, source, batch.id)
+
+    try:
+        batch.imported_count = result.imported
+        batch.skipped_count = result.skipped
+        batch.duplicate_count = result.duplicates
+        # An incomplete sync keeps the previous mark so its rows are retried
+        batch.high_water = result.high_water if result.complete else None
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": "Database commit failed", "error": str(e)}), 500
+
+    if result.imported or result.updated:
+        # Updated rows may have moved: rebuild the clusters
+        cluster_index.mark_stale(moved=bool(result.updated))
+        suggest_index.record_counts(result.tally)
+        from resources.stats import clear_stats_cache
+        clear_stats_cache()
+
+    try:
+        actor = get_jwt_identity() or claims.get('sub') or 'unknown'
+        logger.info(
+            f"{actor} | {claims.get('role')} | sync | source={source},batch_id={batch.id},"
+            f"inserted={result.imported},updated={result.updated},unchanged={result.unchanged},"
+            f"below_watermark={result.below_watermark},skipped={result.skipped},"
+            f"created_id_ranges={result.id_ranges},updated_id_ranges={result.updated_ranges}"
+        )
+    except Exception:
+        pass
+
+    return jsonify({
+        "message": "Sync completed",
+        "source": source,
+        "batch_id": batch.id,
+        **result.to_dict(),
+    }), 200
+
+
+@import_api.route("/reports/<token>", methods=["GET"])
+@jwt_required()
+def download_error_report(token):
+    """Stream the CSV error report (row, column, reason) of a dry run."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    path = import_jobs.report_path(token)
+    if path is None or not os.path.exists(path):
+        return jsonify({'message': 'Report not found or expired'}), 404
+    # send_file streams the file in blocks; reports can be as long as the upload
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=f"import_errors_{token[:8]}.csv",
+        mimetype='text/csv',
+    )
+
+
+@import_api.route("/jobs", methods=["POST"])
+@jwt_required()
+def submit_import_job():
+    """Queue an import (.csv, .csv.gz, .zip or .xlsx) to run in the background.
+
+    The upload is spooled to disk and the header checked before returning
+    202 with the job; progress is available from GET /upload/import/jobs/<id>
+    and pushed as 'import_progress' SocketIO events.
+    """
+    claims = get_jwt()
+    if claims.get("role") != "government":
+        return jsonify({"message": "Forbidden"}), 403
+
+    file = request.files.get("file")
+    if not file:
+        return jsonify({"message": "No file provided"}), 400
+
+    fmt = upload_format(file.filename)
+    if fmt is None:
+        return jsonify({
+            'message': 'Unsupported file type',
+            'accepted_formats': list(FORMATS),
+        }), 400
+
+    # The spooled copy keeps the suffix: the runner picks the reader from it
+    path = os.path.join(import_jobs.upload_dir, f"{uuid.uuid4().hex}{fmt}")
+    file.save(path)
+    try:
+        with open(path, 'rb') as raw:
+            reader = open_upload(raw, path)
+            column_map, missing = map_columns(reader.fieldnames)
+            fieldnames = reader.fieldnames
+    except UnicodeDecodeError as e:
+        os.remove(path)
+        return jsonify({'message': 'File is not valid UTF-8 text', 'error': str(e)}), 400
+    except UploadError as e:
+        os.remove(path)
+        return jsonify({'message': str(e)}), 400
+
+    if missing:
+        os.remove(path)
+        return jsonify({
+            'message': 'Missing required columns',
+            'missing_columns': missing,
+            'available_columns': fieldnames,
+        }), 400
+
+    uploader_id = str(get_jwt_identity() or claims.get('sub') or 'unknown')
+    try:
+        batch = ImportBatch(
+            filename=(getattr(file, 'filename', None) or None),
+            uploader_id=uploader_id,
+            uploader_role=claims.get('role')
+        )
+        db.session.add(batch)
+        db.session.flush()
+        job = ImportJob(
+            batch_id=batch.id,
+            filename=batch.filename,
+            path=path,
+            uploader_id=uploader_id,
+            uploader_role=claims.get('role'),
+            column_map=json.dumps(column_map),
+            total_bytes=os.path.getsize(path),
+        )
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        os.remove(path)
+        return jsonify({'message': 'Failed to create import job', 'error': str(e)}), 500
+
+    import_jobs.submit(job.id)
+    return jsonify({"message": "Import queued", "job": job.to_dict()}), 202
+
+
+@import_api.route("/jobs", methods=["GET"])
+@jwt_required()
+def list_import_jobs():
+    """Return the 50 most recent import jobs."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    jobs = ImportJob.query.order_by(ImportJob.id.desc()).limit(50).all()
+    return jsonify({'jobs': [j.to_dict() for j in jobs]}), 200
+
+
+@import_api.route("/jobs/<int:job_id>", methods=["GET"])
+@jwt_required()
+def get_import_job(job_id):
+    """Progress, counts and the first row errors of one import job."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify({'job': job.to_dict(include_errors=True)}), 200
+
+
+@import_api.route("/jobs/<int:job_id>/cancel", methods=["POST"])
+@jwt_required()
+def cancel_import_job(job_id):
+    """Stop a job before its next chunk; chunks already committed are kept."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    if not import_jobs.cancel(job):
+        return jsonify({'message': f'Job is already {job.status}'}), 409
+    return jsonify({'message': 'Cancellation requested', 'job': job.to_dict()}), 200
+
+
+@import_api.route("/jobs/<int:job_id>/resume", methods=["POST"])
+@jwt_required()
+def resume_import_job(job_id):
+    """Restart a failed job (or one whose worker died) from its last checkpoint."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    if not import_jobs.resume(job):
+        return jsonify({'message': f'Job cannot be resumed (status {job.status})'}), 409
+    return jsonify({'message': 'Import resumed', 'job': job.to_dict()}), 202
+
+
 @import_api.route("", methods=["DELETE"])
 @jwt_required()
 def delete_imports():
     """Delete previously imported records from government_import source.
 
-    Only users with role 'government' may call this.
-    Returns the number of deleted records.
+    Only users with role 'government' may call this. The batches are
+    hidden from stats at once and their rows purged in the background;
+    returns the deletion jobs (202).
     """
     claims = get_jwt()
     if claims.get("role") != "government":
@@ -258,33 +388,74 @@ def delete_imports():
 
     # Optional batch_id to delete only one import batch
     batch_id = request.args.get('batch_id') or request.form.get('batch_id')
-    try:
-        if batch_id:
-            try:
-                bid = int(batch_id)
-            except Exception:
-                return jsonify({'message': 'Invalid batch_id'}), 400
-            # delete accidents for that batch
-            res = Accident.query.filter_by(batch_id=bid).delete(synchronize_session=False)
-            # also delete the batch record itself
-            ImportBatch.query.filter_by(id=bid).delete(synchronize_session=False)
-        else:
-            # Delete rows imported via government_import source
-            res = Accident.query.filter_by(source="government_import").delete(synchronize_session=False)
-
-        db.session.commit()
-        # Audit log the deletion with actor info and count
+    live = ImportBatch.query.filter(ImportBatch.deleted_at.is_(None))
+    if batch_id:
         try:
-            actor = get_jwt_identity() or claims.get('sub') or 'unknown'
-            role = claims.get('role')
-            logger.info(f"{actor} | {role} | delete_imports | batch_id={batch_id} deleted={res}")
+            bid = int(batch_id)
         except Exception:
-            pass
-        return jsonify({"message": "Deleted imported records", "deleted": res, "batch_id": batch_id}), 200
+            return jsonify({'message': 'Invalid batch_id'}), 400
+        live = live.filter(ImportBatch.id == bid)
+        if live.first() is None:
+            return jsonify({'message': 'Batch not found'}), 404
+
+    # Rows still being inserted would outlive the purge
+    busy = {
+        j.batch_id for j in ImportJob.query.filter(ImportJob.status.in_(('queued', 'running'))).all()
+    }
+    candidates = [b.id for b in live.all()]
+    batch_ids = [bid for bid in candidates if bid not in busy]
+    if batch_id and not batch_ids:
+        return jsonify({'message': 'Batch is still being imported; cancel the job first'}), 409
+
+    try:
+        actor = get_jwt_identity() or claims.get('sub') or 'unknown'
+        jobs = purge_jobs.start(batch_ids, unbatched=not batch_id, requested_by=actor, role=claims.get('role'))
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Deletion failed", "error": str(e)}), 500
 
+    # Imported here: resources/stats imports the app module
+    from resources.stats import clear_stats_cache
+    clear_stats_cache()
+    try:
+        logger.info(
+            f"{actor} | {claims.get('role')} | delete_imports_queued | batch_id={batch_id} "
+            f"jobs={[j.id for j in jobs]} skipped_active={sorted(busy.intersection(candidates))}"
+        )
+    except Exception:
+        pass
+    return jsonify({
+        "message": "Deletion started" if jobs else "Nothing to delete",
+        "batch_id": batch_id,
+        "jobs": [j.to_dict() for j in jobs],
+    }), 202
+
+
+@import_api.route("/deletions", methods=["GET"])
+@jwt_required()
+def list_deletions():
+    """Return the 50 most recent deletion jobs."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    jobs = DeleteJob.query.order_by(DeleteJob.id.desc()).limit(50).all()
+    return jsonify({'jobs': [j.to_dict() for j in jobs]}), 200
+
+
+@import_api.route("/deletions/<int:job_id>", methods=["GET"])
+@jwt_required()
+def get_deletion(job_id):
+    """Progress of one deletion job."""
+    claims = get_jwt()
+    if claims.get('role') != 'government':
+        return jsonify({'message': 'Forbidden'}), 403
+
+    job = db.session.get(DeleteJob, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify({'job': job.to_dict()}), 200
+
 
 @import_api.route("/batches", methods=["GET"])
 @jwt_required()
@@ -307,6 +478,8 @@ def list_batches():
                 'created_at': b.created_at.isoformat(),
                 'imported_count': b.imported_count,
                 'skipped_count': b.skipped_count,
+                'duplicate_count': b.duplicate_count or 0,
+                'deleting': b.deleted_at is not None,
             })
         return jsonify({'batches': out}), 200
     except Exception as e:
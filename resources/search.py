@@ -9,16 +9,31 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import or_
 from models.accident import Accident
 from models.user import User
+from extensions import db, limiter
+from utils.fulltext import search_ids
+from utils.suggest import suggest_index, KINDS
+from utils.places import place_resolver
 
 search_bp = Blueprint('search', __name__, url_prefix='/api')
 
 
+def _load_ranked(model, ids, *criteria):
+    """Fetch rows by primary key, preserving the ranking order of ids.
+
+    ``criteria`` further filter the rows (the index may hold hidden ones).
+    """
+    if not ids:
+        return []
+    rows = {r.id: r for r in model.query.filter(model.id.in_(ids), *criteria).all()}
+    return [rows[i] for i in ids if i in rows]
+
+
 @search_bp.route('/search', methods=['GET'])
 @jwt_required()
 def global_search():
     """
     Global search endpoint
-    Searches accidents, users, and more
+    Searches accidents, users, and more (prefix match, ranked by relevance)
     
     Query params:
     - q: search query (required)
@@ -40,18 +55,32 @@ def global_search():
         'query': query
     }
     
-    # Search accidents
+    # Search accidents: ranked full-text index, LIKE scan as a fallback
     search_term = f"%{query}%"
-    accidents = Accident.query.filter(
-        or_(
+    # "قابس" and "Gabes" should find rows stored as "Gabès"; only exact
+    # names and aliases are respelled, within the query's own words
+    canonical = place_resolver.canonical_query(query)
+    alternatives = [canonical] if canonical else None
+    with db.engine.connect() as conn:
+        accident_ids = search_ids(conn, 'accidents', query, limit, alternatives=alternatives)
+    if accident_ids is None:
+        conditions = [
+            Accident.location.ilike(search_term),
             Accident.governorate.ilike(search_term),
             Accident.delegation.ilike(search_term),
-            Accident.cause.ilike(search_term),
-            Accident.vehicle_type.ilike(search_term),
-            Accident.description.ilike(search_term),
-            Accident.severity.ilike(search_term)
-        )
-    ).order_by(Accident.occurred_at.desc()).limit(limit).all()
+            Accident.cause.ilike(search_term)
+        ]
+        # The LIKE terms cover partial queries; a whole place name also
+        # matches rows spelled differently
+        place = place_resolver.lookup(query)
+        if place:
+            conditions.append(Accident.governorate == place.governorate)
+            if place.kind == 'delegation':
+                conditions.append(Accident.delegation == place.name)
+        accidents = Accident.query.filter(or_(*conditions), Accident.visible()).order_by(Accident.occurred_at.desc()).limit(limit).all()
+    else:
+        # Rows of soft-deleted import batches stay indexed until purged
+        accidents = _load_ranked(Accident, accident_ids, Accident.visible())
     
     results['accidents'] = [
         {
@@ -71,13 +100,17 @@ def global_search():
     current_user = User.query.get(int(user_id))
     
     if current_user and current_user.role in ['admin', 'government']:
-        users = User.query.filter(
-            or_(
-                User.email.ilike(search_term),
-                User.full_name.ilike(search_term),
-                User.role.ilike(search_term)
-            )
-        ).limit(limit).all()
+        with db.engine.connect() as conn:
+            user_ids = search_ids(conn, 'users', query, limit)
+        if user_ids is None:
+            users = User.query.filter(
+                or_(
+                    User.email.ilike(search_term),
+                    User.full_name.ilike(search_term)
+                )
+            ).limit(limit).all()
+        else:
+            users = _load_ranked(User, user_ids)
         
         results['users'] = [
             {
@@ -90,3 +123,30 @@ def global_search():
         ]
     
     return jsonify(results)
+
+
+@search_bp.route('/search/suggest', methods=['GET'])
+@limiter.limit("300 per minute")
+def suggest():
+    """
+    As-you-type suggestions for governorates, delegations and causes
+    Served from the in-memory prefix index, ranked by accident count
+    
+    Query params:
+    - q: prefix (accents and case are ignored)
+    - type: optional filter (governorate, delegation, cause)
+    - limit: max suggestions (default 10, max 25)
+    """
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type')
+    if kind and kind not in KINDS:
+        return jsonify({'error': f"type must be one of: {', '.join(KINDS)}"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 25))
+    except ValueError:
+        limit = 10
+    
+    return jsonify({
+        'query': query,
+        'suggestions': suggest_index.suggest(query, limit=limit, kind=kind)
+    })
@@ -34,6 +34,11 @@ def _cache_set(key, val, ttl=30):
     _CACHE[key] = (val, time() + ttl if ttl else None)
 
 
+def clear_stats_cache():
+    """Drop cached results, e.g. after import batches are deleted"""
+    _CACHE.clear()
+
+
 def _parse_date(s):
     if not s:
         return None
@@ -57,8 +62,9 @@ blp = Blueprint('stats', 'stats', url_prefix='/api/v1/stats', description='Accid
 def confirmed_accident_query():
     # Official accidents: any row in the Accident table is considered an
     # official record (imports and confirmed reports create Accident rows).
-    # This excludes pending/rejected reports which do not create Accident rows.
-    return Accident.query
+    # This excludes pending/rejected reports which do not create Accident rows,
+    # and rows of deleted import batches still waiting to be purged.
+    return Accident.query.filter(Accident.visible())
 
 
 def apply_filters(q):
@@ -97,6 +103,76 @@ def apply_filters(q):
     return q
 
 
+# Request args read by apply_filters()
+FILTER_ARGS = ('start', 'end', 'governorate', 'delegation', 'severity', 'cause', 'source')
+
+# Dimensions of grouped_counts(): name -> SQL expression
+STATS_DIMENSIONS = {
+    'governorate': Accident.governorate,
+    'delegation': Accident.delegation,
+    'severity': Accident.severity,
+    'cause': Accident.cause,
+    'source': Accident.source,
+    'year': func.strftime('%Y', Accident.occurred_at),
+    'month': func.strftime('%Y-%m', Accident.occurred_at),
+    'weekday': func.strftime('%w', Accident.occurred_at),
+    'hour': func.strftime('%H', Accident.occurred_at),
+}
+
+# Dimensions listed in their natural order rather than by count
+ORDERED_DIMENSIONS = ('year', 'month', 'weekday', 'hour')
+
+_WEEKDAY_NAMES = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+
+
+def grouped_counts(dims):
+    """Accident counts per combination of ``dims``, in one grouped scan.
+
+    Honors the apply_filters() args. Returns {(value, ...): count}; any
+    coarser breakdown is a rollup() of it.
+    """
+    cache_key = 'grouped:' + ','.join(dims) + ':' + '&'.join(
+        f"{k}={request.args[k]}" for k in FILTER_ARGS if request.args.get(k)
+    )
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+    exprs = [STATS_DIMENSIONS[d] for d in dims]
+    q = apply_filters(confirmed_accident_query()).with_entities(*exprs, func.count()).group_by(*exprs)
+    counts = {tuple(row[:-1]): row[-1] for row in q}
+    try: _cache_set(cache_key, counts, ttl=30)
+    except Exception: pass
+    return counts
+
+
+def rollup(counts, dims, keep):
+    """Sum grouped_counts(dims) output down to the dimensions in ``keep``"""
+    idx = [dims.index(d) for d in keep]
+    out = {}
+    for key, count in counts.items():
+        sub = tuple(key[i] for i in idx)
+        out[sub] = out.get(sub, 0) + count
+    return out
+
+
+def dimension_label(dim, value):
+    if value is None or value == '':
+        return 'Unknown'
+    if dim == 'weekday':
+        return _WEEKDAY_NAMES[int(value)]
+    return str(value)
+
+
+def dimension_order(dim, totals):
+    """Values of ``dim`` in display order, given {value: count}"""
+    if dim == 'weekday':
+        # Monday first, as in the hour/weekday heatmap
+        return sorted(totals, key=lambda v: (int(v) - 1) % 7 if v is not None else 7)
+    if dim in ORDERED_DIMENSIONS:
+        return sorted(totals, key=lambda v: (v is None, v or ''))
+    return sorted(totals, key=lambda v: (-totals[v], v is None, v or ''))
+
+
 # GET /api/stats/kpis
 @blp.route('/kpis', methods=['GET'])
 def kpis():
@@ -1627,21 +1703,21 @@ def dashboard_stats():
     today = datetime.utcnow().date()
     
     # Total accidents
-    total_accidents = Accident.query.count()
+    total_accidents = confirmed_accident_query().count()
     
     # Reports count
     reports_count = AccidentReport.query.count()
     
     # Imports today
     start_of_day = datetime(today.year, today.month, today.day)
-    imports_today = Accident.query.filter(
+    imports_today = confirmed_accident_query().filter(
         Accident.created_at >= start_of_day,
         Accident.source == 'import'
     ).count()
     
     # Recent accidents (last 7 days)
     week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_count = Accident.query.filter(Accident.occurred_at >= week_ago).count()
+    recent_count = confirmed_accident_query().filter(Accident.occurred_at >= week_ago).count()
     
     out = {
         'total_accidents': total_accidents,
@@ -1656,58 +1732,68 @@ def dashboard_stats():
     return jsonify(out)
 
 
+# GET /api/stats/map/clusters
+@blp.route('/map/clusters', methods=['GET'])
+def map_clusters():
+    """Pre-clustered accident points for the map at a given zoom level.
+
+    Query params:
+        bbox: min_lng,min_lat,max_lng,max_lat (default: whole world)
+        zoom: map zoom level (default 6)
+
+    Response:
+    {
+        zoom, clusters: [{ id, lat, lng, count, severity: {sev: n}, accident_id? }]
+    }
+    """
+    from utils.clustering import cluster_index, MAX_ZOOM
+    from utils.geo import parse_bbox
+
+    try:
+        zoom = int(request.args.get('zoom', 6))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'zoom must be an integer'}), 400
+    zoom = max(0, min(zoom, MAX_ZOOM))
+
+    bbox = request.args.get('bbox')
+    if bbox:
+        try:
+            min_lat, min_lng, max_lat, max_lng = parse_bbox(bbox)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        min_lat, min_lng, max_lat, max_lng = -90.0, -180.0, 90.0, 180.0
+
+    clusters = cluster_index.get_clusters(min_lat, min_lng, max_lat, max_lng, zoom)
+    return jsonify({
+        'zoom': zoom,
+        'clusters': clusters,
+        'total': sum(c['count'] for c in clusters),
+    })
+
+
 # GET /api/stats/timeline
 @blp.route('/timeline', methods=['GET'])
 def accident_timeline():
     """Get accidents grouped by month for timeline animation.
-    Generates coordinates based on governorate centers since Accident model
-    doesn't have lat/lng columns.
+    Uses stored lat/lng when available; accidents without coordinates are
+    placed around their governorate center.
     """
     cache_key = 'timeline_data'
     cached = _cache_get(cache_key)
     if cached:
         return jsonify(cached)
     
-    # Governorate center coordinates for Tunisia
-    gov_coords = {
-        'Tunis': (36.8065, 10.1815),
-        'Ariana': (36.8667, 10.1647),
-        'Ben Arous': (36.7533, 10.2283),
-        'Manouba': (36.8081, 9.8569),
-        'Sfax': (34.7406, 10.7603),
-        'Sousse': (35.8288, 10.6405),
-        'Kairouan': (35.6781, 10.0963),
-        'Bizerte': (37.2744, 9.8739),
-        'Gabes': (33.8886, 10.0975),
-        'Gabès': (33.8886, 10.0975),
-        'Nabeul': (36.4561, 10.7376),
-        'Monastir': (35.7643, 10.8113),
-        'Mahdia': (35.5047, 11.0622),
-        'Beja': (36.7256, 9.1817),
-        'Béja': (36.7256, 9.1817),
-        'Jendouba': (36.5011, 8.7803),
-        'Le Kef': (36.1742, 8.7047),
-        'Siliana': (36.0850, 9.3708),
-        'Kasserine': (35.1722, 8.8306),
-        'Sidi Bouzid': (35.0383, 9.4858),
-        'Medenine': (33.3547, 10.5053),
-        'Médenine': (33.3547, 10.5053),
-        'Tataouine': (32.9297, 10.4517),
-        'Gafsa': (34.4250, 8.7842),
-        'Tozeur': (33.9197, 8.1339),
-        'Kebili': (33.7044, 8.9714),
-        'Kébili': (33.7044, 8.9714),
-        'Zaghouan': (36.4029, 10.1428),
-    }
-    
     # Get accidents from last 12 months grouped by month and governorate
     twelve_months_ago = datetime.utcnow() - timedelta(days=365)
     
     from collections import defaultdict
     import random
+    from utils.gazetteer import GOVERNORATES
+    from utils.places import place_resolver
     
     # Query accidents grouped by month and governorate
-    accidents = Accident.query.filter(
+    accidents = confirmed_accident_query().filter(
         Accident.occurred_at >= twelve_months_ago
     ).order_by(Accident.occurred_at.asc()).all()
     
@@ -1715,18 +1801,23 @@ def accident_timeline():
     monthly = defaultdict(list)
     
     for a in accidents:
-        if a.occurred_at and a.governorate:
+        if a.occurred_at and a.lat is not None and a.lng is not None:
+            monthly[a.occurred_at.strftime('%Y-%m')].append({
+                'lat': a.lat,
+                'lng': a.lng,
+                'severity': a.severity,
+                'governorate': a.governorate
+            })
+        elif a.occurred_at and a.governorate:
             month_key = a.occurred_at.strftime('%Y-%m')
             gov = a.governorate
             
-            # Get base coordinates for governorate
-            base_coords = gov_coords.get(gov)
-            if not base_coords:
-                # Try partial match
-                for key in gov_coords:
-                    if key.lower() in gov.lower() or gov.lower() in key.lower():
-                        base_coords = gov_coords[key]
-                        break
+            # Get base coordinates for governorate (memoized name resolution)
+            place = place_resolver.resolve(gov)
+            base_coords = None
+            if place:
+                center = GOVERNORATES[place.governorate]
+                base_coords = (center['lat'], center['lng'])
             
             if base_coords:
                 # Add some randomization to spread markers
@@ -2234,7 +2325,7 @@ def get_quick_stats():
             start_date = now - timedelta(days=30)
         
         # Base query
-        query = Accident.query.filter(Accident.occurred_at >= start_date)
+        query = confirmed_accident_query().filter(Accident.occurred_at >= start_date)
         if governorate:
             query = query.filter(Accident.governorate == governorate)
         
@@ -2245,19 +2336,19 @@ def get_quick_stats():
         top_cause = db.session.query(
             Accident.cause, func.count(Accident.id).label('cnt')
         ).filter(
-            Accident.occurred_at >= start_date
+            Accident.occurred_at >= start_date, Accident.visible()
         ).group_by(Accident.cause).order_by(func.count(Accident.id).desc()).first()
         
         # Most affected area
         top_area = db.session.query(
             Accident.governorate, func.count(Accident.id).label('cnt')
         ).filter(
-            Accident.occurred_at >= start_date
+            Accident.occurred_at >= start_date, Accident.visible()
         ).group_by(Accident.governorate).order_by(func.count(Accident.id).desc()).first()
         
         # Trend calculation (compare to previous period)
         prev_start = start_date - (now - start_date)
-        prev_total = Accident.query.filter(
+        prev_total = confirmed_accident_query().filter(
             Accident.occurred_at >= prev_start,
             Accident.occurred_at < start_date
         ).count()
@@ -5,13 +5,16 @@ Real-time accident notifications and live dashboard updates
 Uses Flask-SocketIO for WebSocket communication
 """
 
-from flask import request
+from flask import request, current_app
 from flask_socketio import emit, join_room, leave_room
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import get_jwt_identity, decode_token
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Room receiving background import job progress (government users only)
+IMPORTS_ROOM = 'import_jobs'
+
 # Active connections tracking
 connected_users = {}
 accident_subscribers = {}
@@ -90,6 +93,8 @@ def init_websocket(app, socketio):
         """Unsubscribe from updates"""
         user_id = request.sid
         sub_type = data.get('type')
+        if sub_type == 'imports':
+            leave_room(IMPORTS_ROOM)
         
         if user_id in connected_users:
             connected_users[user_id]['subscribed_to'] = [
@@ -103,6 +108,25 @@ def init_websocket(app, socketio):
             })
             logger.info(f"User {user_id} unsubscribed from {sub_type}")
     
+    @socketio.on('subscribe_imports')
+    def subscribe_imports(data=None):
+        """Subscribe to import job progress (requires a government token)"""
+        token = (data or {}).get('token') or request.args.get('token')
+        try:
+            role = decode_token(token).get('role') if token else None
+        except Exception:
+            role = None
+        if role != 'government':
+            emit('subscription_error', {'type': 'imports', 'error': 'Forbidden'})
+            return
+
+        join_room(IMPORTS_ROOM)
+        emit('subscription_confirmed', {
+            'type': 'imports',
+            'status': 'subscribed'
+        })
+        logger.info(f"User {request.sid} subscribed to import jobs")
+
     @socketio.on('ping')
     def handle_ping():
         """Heartbeat ping"""
@@ -128,6 +152,31 @@ def broadcast_new_accident(accident_data):
         logger.error(f"Error broadcasting accident: {str(e)}")
 
 
+def broadcast_new_accidents(accidents_data):
+    """Push a batch of new accidents: one 'new_accidents' event per
+    subscriber, carrying the accidents matching its filters"""
+    if not accidents_data:
+        return
+    try:
+        socketio = current_app.extensions.get('socketio')
+        if socketio is None:
+            return
+        notified = 0
+        for user_info in list(connected_users.values()):
+            matching = []
+            for subscription in user_info.get('subscribed_to', []):
+                if subscription.get('type') == 'accidents':
+                    filters = subscription.get('filters', {})
+                    matching = [a for a in accidents_data if _matches_filters(a, filters)]
+                    break
+            if matching:
+                socketio.emit('new_accidents', matching, to=user_info['sid'])
+                notified += 1
+        logger.info(f"Broadcasted {len(accidents_data)} new accidents to {notified} users")
+    except Exception as e:
+        logger.error(f"Error broadcasting accidents: {str(e)}")
+
+
 def broadcast_kpi_update(kpi_data):
     """Broadcast KPI update to all subscribers"""
     from flask_socketio import socketio as io
@@ -155,6 +204,26 @@ def broadcast_live_stats(stats_data):
         logger.error(f"Error broadcasting stats: {str(e)}")
 
 
+def broadcast_import_progress(job_data):
+    """Push an import job's progress to the import jobs room"""
+    try:
+        socketio = current_app.extensions.get('socketio')
+        if socketio is not None:
+            socketio.emit('import_progress', job_data, to=IMPORTS_ROOM)
+    except Exception as e:
+        logger.error(f"Error broadcasting import progress: {str(e)}")
+
+
+def broadcast_delete_progress(job_data):
+    """Push an import deletion's progress to the import jobs room"""
+    try:
+        socketio = current_app.extensions.get('socketio')
+        if socketio is not None:
+            socketio.emit('delete_progress', job_data, to=IMPORTS_ROOM)
+    except Exception as e:
+        logger.error(f"Error broadcasting delete progress: {str(e)}")
+
+
 def _matches_filters(accident_data, filters):
     """Check if accident matches subscription filters"""
     if not filters:
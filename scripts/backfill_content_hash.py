@@ -0,0 +1,28 @@
+"""
+Backfill Import Content Hashes
+==============================
+Compute ``content_hash`` for accidents imported before deduplication was
+added, so re-uploading those files skips the rows already stored.
+Existing duplicates keep a NULL hash and are only counted.
+
+Usage:
+    python scripts/backfill_content_hash.py
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from utils.dedup import backfill_content_hashes
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        hashed, duplicates = backfill_content_hashes()
+    print(f"Hashed {hashed} imported accidents; {duplicates} duplicates left unhashed")
+
+
+if __name__ == '__main__':
+    main()
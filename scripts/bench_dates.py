@@ -0,0 +1,107 @@
+"""
+Timestamp Parsing Benchmark
+===========================
+Parse synthetic occurred_at columns (1% outliers in ISO format) with the
+old per-row fallback chain, a single strptime format, and the sniffed,
+compiled and memoized parser from utils/dates. pandas.to_datetime is
+timed as a reference when installed.
+
+Columns: minute timestamps in the 2nd and in the last known format
+(the chain raises 1 and 6 exceptions per row), and hourly timestamps
+where most strings repeat.
+
+Usage:
+    python scripts/bench_dates.py [rows]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.dates import compile_parser, parse_occurred, sniff_format, TimestampParser
+
+COLUMNS = [
+    # (label, strftime format, resolution in minutes)
+    ('at-style minutes', "%Y-%m-%d at %I:%M%p", 1),
+    ('d/m/Y minutes', "%d/%m/%Y %I:%M%p", 1),
+    ('at-style hourly', "%Y-%m-%d at %I:%M%p", 60),
+]
+
+
+def _column(rows, fmt, step):
+    start = datetime(2015, 1, 1)
+    slots = 6 * 365 * 24 * 60 // step
+    out = []
+    for _ in range(rows):
+        ts = start + timedelta(minutes=random.randrange(slots) * step)
+        if random.random() < 0.01:
+            out.append(ts.isoformat(sep=' '))
+        else:
+            out.append(ts.strftime(fmt))
+    return out
+
+
+def _legacy(values, fmt):
+    # The pre-sniffing importer: full fallback chain for every row
+    return [parse_occurred(v) for v in values]
+
+
+def _strptime(values, fmt):
+    out = []
+    for v in values:
+        try:
+            out.append(datetime.strptime(v, fmt))
+        except ValueError:
+            out.append(parse_occurred(v))
+    return out
+
+
+def _compiled(values, fmt):
+    parse = compile_parser(sniff_format(values))
+    return [parse(v) or parse_occurred(v) for v in values]
+
+
+def _memoized(values, fmt):
+    parse = TimestampParser(sniff_format(values))
+    return [parse(v) for v in values]
+
+
+def _pandas(values, fmt):
+    import pandas as pd
+    parsed = pd.to_datetime(pd.Series(values), format=fmt, errors='coerce')
+    return [ts.to_pydatetime() if ts is not pd.NaT else parse_occurred(v) for ts, v in zip(parsed, values)]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    candidates = [('fallback chain', _legacy), ('strptime', _strptime),
+                  ('compiled', _compiled), ('compiled+memo', _memoized)]
+    try:
+        import pandas  # noqa: F401
+        candidates.append(('pandas', _pandas))
+    except ImportError:
+        pass
+
+    for label, fmt, step in COLUMNS:
+        values = _column(rows, fmt, step)
+        print(f"\n{label}: {rows:,} values, {len(set(values)):,} distinct, "
+              f"sniffed {sniff_format(values)!r}")
+        print(f"{'parser':<16}{'seconds':>10}{'rows/sec':>14}")
+        expected = None
+        for name, fn in candidates:
+            start = time.perf_counter()
+            parsed = fn(values, fmt)
+            elapsed = time.perf_counter() - start
+            if expected is None:
+                expected = parsed
+            elif parsed != expected:
+                print(f"{name}: results differ from the fallback chain")
+            print(f"{name:<16}{elapsed:>10.2f}{rows / elapsed:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Export Benchmark
+================
+Peak Python memory (tracemalloc, on a second run) and time of the accident
+exports on a temporary SQLite database of synthetic accidents:
+
+- csv: the previous build-in-memory path (ORM ``.all()``, StringIO, then
+  BytesIO) against the streamed path of utils/export, plain and gzipped
+- xlsx: the previous styled-per-cell Workbook with a full auto-size pass
+  against the write-only writer spooled to a temporary file
+- columnar: the streamed CSV against the Parquet and Arrow IPC exports
+  (needs pyarrow)
+
+Usage:
+    python scripts/bench_export.py [rows] [csv|xlsx|columnar]
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from extensions import db
+from models.accident import Accident
+from models.import_batch import ImportBatch  # noqa: F401  (accidents.batch_id FK)
+from utils.export import (
+    ACCIDENT_EXPORT_HEADERS, format_accident_for_export, iter_accident_rows, iter_record_batches,
+    stream_columnar, stream_csv, stream_xlsx,
+)
+
+PLACES = [
+    ('Tunis', 'Bardo'), ('Ariana', 'Soukra'), ('Sfax', 'Sakiet Ezzit'), ('Sousse', 'Hammam Sousse'),
+    ('Gabes', 'El Hamma'), ('Medenine', 'Zarzis'), ('Bizerte', 'Menzel Bourguiba'), ('Nabeul', 'Hammamet'),
+]
+CAUSES = ['phone_usage', 'speeding', 'distraction', 'pedestrian', 'mechanical', 'weather']
+SEVERITIES = ['low', 'medium', 'high']
+
+
+def _app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _populate(rows, chunk=50000):
+    start = datetime(2020, 1, 1)
+    rnd = random.Random(1)
+    for offset in range(0, rows, chunk):
+        batch = []
+        for i in range(offset, min(rows, offset + chunk)):
+            gov, deleg = rnd.choice(PLACES)
+            batch.append({
+                'occurred_at': start + timedelta(minutes=7 * i), 'severity': rnd.choice(SEVERITIES),
+                'location': gov, 'governorate': gov, 'delegation': deleg, 'cause': rnd.choice(CAUSES),
+                'source': 'import', 'created_at': start,
+            })
+        db.session.execute(Accident.__table__.insert(), batch)
+        db.session.commit()
+
+
+def _in_memory():
+    # The pre-streaming export_to_csv: ORM rows, dicts, StringIO, BytesIO
+    data = [format_accident_for_export(a) for a in Accident.query.order_by(Accident.occurred_at.desc()).all()]
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(data[0].keys()))
+    writer.writeheader()
+    writer.writerows(data)
+    output_bytes = io.BytesIO()
+    output_bytes.write(output.getvalue().encode('utf-8'))
+    return output_bytes.getbuffer().nbytes
+
+
+def _streamed(compress):
+    def run():
+        query = Accident.query.order_by(Accident.occurred_at.desc())
+        response = stream_csv(iter_accident_rows(query), 'bench.csv', ACCIDENT_EXPORT_HEADERS, compress)
+        return sum(len(chunk) for chunk in response.response)
+    return run
+
+
+def _xlsx_in_memory():
+    # The pre-write-only export_to_excel: bordered cells, then auto-size
+    import openpyxl
+    from openpyxl.styles import Border, Side
+
+    data = [format_accident_for_export(a) for a in Accident.query.order_by(Accident.occurred_at.desc()).all()]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    headers = list(data[0].keys())
+    for col, header in enumerate(headers, 1):
+        ws.cell(row=1, column=col, value=header).border = border
+    for row_idx, row in enumerate(data, 2):
+        for col_idx, header in enumerate(headers, 1):
+            ws.cell(row=row_idx, column=col_idx, value=row[header]).border = border
+    for col in ws.columns:
+        width = max(len(str(cell.value)) for cell in col)
+        ws.column_dimensions[col[0].column_letter].width = min(width + 2, 50)
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getbuffer().nbytes
+
+
+def _xlsx_write_only():
+    query = Accident.query.order_by(Accident.occurred_at.desc())
+    response = stream_xlsx(iter_accident_rows(query), 'bench.xlsx', ACCIDENT_EXPORT_HEADERS)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def _columnar(fmt):
+    def run():
+        query = Accident.query.order_by(Accident.occurred_at.desc())
+        response = stream_columnar(fmt, iter_record_batches(query), f'bench.{fmt}')
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        return size
+    return run
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    fmt = sys.argv[2] if len(sys.argv) > 2 else 'csv'
+    runs = {
+        'csv': (('in-memory', _in_memory), ('streamed', _streamed(None)), ('gzip', _streamed('file'))),
+        'xlsx': (('in-memory', _xlsx_in_memory), ('write-only', _xlsx_write_only)),
+        'columnar': (('csv', _streamed(None)), ('parquet', _columnar('parquet')), ('arrow', _columnar('arrow'))),
+    }[fmt]
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            _populate(rows)
+        print(f"{rows:,} accidents")
+        print(f"{'export':<12}{'seconds':>10}{'peak MB':>10}{'output MB':>11}")
+        for name, fn in runs:
+            with app.test_request_context('/'):
+                # Timed untraced: tracemalloc slows allocation-heavy code down
+                start = time.perf_counter()
+                size = fn()
+                elapsed = time.perf_counter() - start
+                db.session.remove()
+                tracemalloc.start()
+                fn()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                db.session.remove()
+                print(f"{name:<12}{elapsed:>10.2f}{peak / 1e6:>10.1f}{size / 1e6:>11.1f}")
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
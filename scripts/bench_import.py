@@ -0,0 +1,117 @@
+"""
+CSV Import Benchmark
+====================
+Measure import throughput (rows/sec) of the chunked bulk-insert pipeline
+in utils/importer against the previous per-row ORM add + flush loop, on a
+synthetic CSV and a temporary SQLite database with the FTS triggers on.
+"re-import" uploads the same file again: every row is a duplicate.
+
+Usage:
+    python scripts/bench_import.py [rows]
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from extensions import db
+from models.accident import Accident
+from models.import_batch import ImportBatch
+from utils.dedup import content_index
+from utils.fulltext import ensure_fulltext
+from utils.importer import open_csv, map_columns, run_import, validate_row
+
+PLACES = [
+    ('Tunis', 'Bardo'), ('Ariana', 'Soukra'), ('Sfax', 'Sakiet Ezzit'), ('Sousse', 'Hammam Sousse'),
+    ('Gabes', 'El Hamma'), ('Medenine', 'Zarzis'), ('Bizerte', 'Menzel Bourguiba'), ('Nabeul', 'Hammamet'),
+]
+CAUSES = ['phone_usage', 'speeding', 'distraction', 'pedestrian', 'mechanical', 'weather']
+SEVERITIES = ['low', 'medium', 'high']
+
+
+def _csv_bytes(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['date', 'severity', 'governorate', 'delegation', 'cause', 'lat', 'lng'])
+    for i in range(rows):
+        gov, deleg = random.choice(PLACES)
+        writer.writerow([
+            f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}",
+            random.choice(SEVERITIES), gov, deleg, random.choice(CAUSES),
+            round(random.uniform(33.0, 37.0), 5), round(random.uniform(8.0, 11.0), 5),
+        ])
+    return out.getvalue().encode('utf-8')
+
+
+def _app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            ensure_fulltext(conn)
+    return app
+
+
+def _new_batch():
+    batch = ImportBatch(filename='bench.csv', uploader_id='bench', uploader_role='government')
+    db.session.add(batch)
+    db.session.commit()
+    return batch.id
+
+
+def _chunked(data):
+    reader = open_csv(io.BytesIO(data))
+    column_map, _ = map_columns(reader.fieldnames)
+    return run_import(reader, column_map, _new_batch()).imported
+
+
+def _per_row(data):
+    # The pre-chunking pipeline: ORM object + flush per row, one final commit
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8')))
+    column_map, _ = map_columns(reader.fieldnames)
+    batch_id = _new_batch()
+    imported = 0
+    for row in reader:
+        record, error = validate_row(row, column_map, batch_id)
+        if error:
+            continue
+        record.pop('content_hash')  # the old pipeline did not deduplicate
+        db.session.add(Accident(**record))
+        db.session.flush()
+        imported += 1
+    db.session.commit()
+    return imported
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    data = _csv_bytes(rows)
+    print(f"{rows:,} rows, {len(data) / 1e6:.1f} MB CSV")
+    print(f"{'pipeline':<12}{'seconds':>10}{'rows/sec':>12}")
+    for name, passes in (('per-row', [_per_row]), ('chunked', [_chunked, _chunked])):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _app(os.path.join(tmp, 'bench.db'))
+            with app.app_context():
+                content_index.mark_stale()
+                for i, fn in enumerate(passes):
+                    start = time.perf_counter()
+                    fn(data)
+                    elapsed = time.perf_counter() - start
+                    label = 're-import' if i else name
+                    print(f"{label:<12}{elapsed:>10.2f}{rows / elapsed:>12,.0f}")
+                db.session.remove()
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Global Search Benchmark
+=======================
+Compare the LIKE '%q%' scan used before the full-text index with the
+FTS5 bm25 path in utils/fulltext, on a synthetic in-memory SQLite table.
+
+LIKE only stays fast when enough matches sit at the head of the
+occurred_at index; rare terms, multi-word queries and accent variants
+("gabes" vs "Gabès") scan the whole table. The FTS path is bounded by
+RANK_WINDOW regardless of the term.
+
+Usage:
+    python scripts/bench_search.py [rows]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlalchemy as sa
+
+from utils.fulltext import ensure_fulltext, search_ids
+
+PLACES = [
+    ('Tunis', 'Bardo'), ('Tunis', 'La Marsa'), ('Ariana', 'Soukra'), ('Sfax', 'Sfax Ville'),
+    ('Sousse', 'Hammam Sousse'), ('Gabès', 'El Hamma'), ('Médenine', 'Zarzis'),
+    ('Bizerte', 'Menzel Bourguiba'), ('Nabeul', 'Hammamet'), ('Kairouan', 'Haffouz'),
+]
+CAUSES = ['phone_usage', 'speeding', 'distraction', 'pedestrian', 'mechanical', 'weather', 'drunk_driving']
+QUERIES = ['ham', 'sfax', 'zarzis speed', 'gabes', 'phone', 'la marsa']
+
+
+def _setup(rows):
+    engine = sa.create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "CREATE TABLE accidents (id INTEGER PRIMARY KEY, occurred_at DATETIME, location VARCHAR, "
+            "governorate VARCHAR, delegation VARCHAR, cause VARCHAR)"
+        ))
+        conn.execute(sa.text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, full_name VARCHAR, email VARCHAR)"
+        ))
+        conn.execute(sa.text("CREATE INDEX ix_accidents_occurred_at ON accidents (occurred_at)"))
+        ensure_fulltext(conn)
+        data = []
+        for i in range(rows):
+            gov, deleg = random.choice(PLACES)
+            data.append({
+                'occurred_at': f"2024-01-{1 + i % 28:02d} 10:00:00",
+                'location': f"{deleg}, {gov}",
+                'governorate': gov,
+                'delegation': deleg,
+                'cause': random.choice(CAUSES),
+            })
+        conn.execute(sa.text(
+            "INSERT INTO accidents (occurred_at, location, governorate, delegation, cause) "
+            "VALUES (:occurred_at, :location, :governorate, :delegation, :cause)"
+        ), data)
+    return engine
+
+
+def _like(conn, q, limit=10):
+    term = f"%{q}%"
+    return [r[0] for r in conn.execute(sa.text(
+        "SELECT id FROM accidents WHERE location LIKE :t OR governorate LIKE :t "
+        "OR delegation LIKE :t OR cause LIKE :t ORDER BY occurred_at DESC LIMIT :limit"
+    ), {'t': term, 'limit': limit})]
+
+
+def _time(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"Building {rows:,} synthetic accidents...")
+    engine = _setup(rows)
+    print(f"{'query':<15}{'LIKE ms':>10}{'FTS5 ms':>10}{'speedup':>10}")
+    with engine.connect() as conn:
+        for q in QUERIES:
+            like_ms = _time(lambda: _like(conn, q))
+            fts_ms = _time(lambda: search_ids(conn, 'accidents', q))
+            print(f"{q:<15}{like_ms:>10.2f}{fts_ms:>10.2f}{like_ms / max(fts_ms, 1e-6):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Delta Sync Benchmark
+====================
+Time utils/sync on a synthetic partner feed: the initial load, then the
+next day's extract with ``changed`` rows edited or added, once matched by
+hash only and once with a modification time column that lets the
+high-water mark skip the unchanged rows.
+
+Usage:
+    python scripts/bench_sync.py [rows] [changed]
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from extensions import db
+from models.import_batch import ImportBatch
+from utils.fulltext import ensure_fulltext
+from utils.importer import map_columns
+from utils.import_files import CsvReader
+from utils.sync import map_sync_columns, run_sync
+
+PLACES = [
+    ('Tunis', 'Bardo'), ('Ariana', 'Soukra'), ('Sfax', 'Sakiet Ezzit'), ('Sousse', 'Hammam Sousse'),
+    ('Gabes', 'El Hamma'), ('Medenine', 'Zarzis'), ('Bizerte', 'Menzel Bourguiba'), ('Nabeul', 'Hammamet'),
+]
+CAUSES = ['phone_usage', 'speeding', 'distraction', 'pedestrian', 'mechanical', 'weather']
+SEVERITIES = ['low', 'medium', 'high']
+DAY_ONE = datetime(2024, 6, 1)
+
+
+def _feed(rows, edits=(), day=DAY_ONE, extra=0):
+    """CSV bytes: rows 0..rows-1 (+ ``extra`` new ones), ``edits`` re-dated"""
+    rnd = random.Random(42)
+    edits = set(edits)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['external_id', 'modified_at', 'date', 'severity', 'governorate', 'delegation', 'cause', 'lat', 'lng'])
+    for i in range(rows + extra):
+        gov, deleg = rnd.choice(PLACES)
+        severity = rnd.choice(SEVERITIES)
+        modified = DAY_ONE
+        if i in edits or i >= rows:
+            severity = 'high' if severity != 'high' else 'low'
+            modified = day
+        writer.writerow([
+            f"P-{i}", modified.isoformat(sep=' '),
+            f"2024-{1 + i % 5:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}",
+            severity, gov, deleg, rnd.choice(CAUSES),
+            round(rnd.uniform(33.0, 37.0), 5), round(rnd.uniform(8.0, 11.0), 5),
+        ])
+    return out.getvalue().encode('utf-8')
+
+
+def _drop_modified(data):
+    rows = csv.reader(io.StringIO(data.decode('utf-8')))
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for row in rows:
+        writer.writerow(row[:1] + row[2:])
+    return out.getvalue().encode('utf-8')
+
+
+def _app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            ensure_fulltext(conn)
+    return app
+
+
+def _sync(data, source):
+    batch = ImportBatch(filename='feed.csv', uploader_id='bench', uploader_role='government', sync_source=source)
+    db.session.add(batch)
+    db.session.commit()
+    reader = CsvReader(io.BytesIO(data))
+    column_map, _ = map_columns(reader.fieldnames)
+    sync_map, _ = map_sync_columns(reader.fieldnames)
+    start = time.perf_counter()
+    result = run_sync(reader, column_map, sync_map, source, batch.id)
+    elapsed = time.perf_counter() - start
+    batch.high_water = result.high_water if result.complete else None
+    db.session.commit()
+    return result, elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    edits = random.Random(7).sample(range(rows), changed // 2)
+    first = _feed(rows)
+    second = _feed(rows, edits, DAY_ONE + timedelta(days=1), extra=changed - len(edits))
+    print(f"{rows:,} rows, {changed:,} new or changed on day two")
+    print(f"{'run':<28}{'seconds':>10}{'inserted':>10}{'updated':>10}{'unchanged':>11}{'skipped':>10}")
+    for label, transform in (('hash diff', _drop_modified), ('hash diff + high-water', lambda d: d)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = _app(os.path.join(tmp, 'bench.db'))
+            with app.app_context():
+                for day, data in (('initial load', first), (label, second)):
+                    result, elapsed = _sync(transform(data), 'bench')
+                    print(f"{day:<28}{elapsed:>10.2f}{result.imported:>10,}{result.updated:>10,}"
+                          f"{result.unchanged:>11,}{result.below_watermark:>10,}")
+                db.session.remove()
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
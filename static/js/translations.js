@@ -392,7 +392,7 @@ window.AppTranslations = {
 
         // Import CSV
         'import.title': 'Import Accident Data',
-        'import.subtitle': 'Upload a CSV file to bulk import traffic accident records',
+        'import.subtitle': 'Upload a CSV, Excel (.xlsx), .csv.gz or .zip file to bulk import traffic accident records',
         'import.dropZone': 'Drop your CSV file here',
         'import.dropZoneDesc': 'or click to browse from your computer',
         'import.dropHere': 'Drop your CSV file here',
@@ -400,6 +400,21 @@ window.AppTranslations = {
         'import.chooseFile': 'Choose File',
         'import.uploadBtn': 'Upload & Import',
         'import.uploadImport': 'Upload & Import',
+        'import.validateOnly': 'Validate only',
+        'import.jobs': 'Recent imports',
+        'import.file': 'File',
+        'import.status': 'Status',
+        'import.progress': 'Progress',
+        'import.imported': 'Imported',
+        'import.skipped': 'Skipped',
+        'import.duplicates': 'Duplicates',
+        'import.cancel': 'Cancel',
+        'import.dryRun': 'Validation result',
+        'import.row': 'Row',
+        'import.column': 'Column',
+        'import.reason': 'Reason',
+        'import.downloadReport': 'Download full error report (CSV)',
+        'import.noErrors': 'No errors found — the file is ready to import.',
         'import.csvPreview': 'CSV Preview',
         'import.previewNote': 'Preview shows the first few rows only. The import will still map required fields (Date, Location, Severity) using flexible aliases.',
         'import.dangerZone': '⚠️ Danger Zone',
@@ -1009,7 +1024,7 @@ window.AppTranslations = {
 
         // Import CSV
         'import.title': 'Importer des données d\'accidents',
-        'import.subtitle': 'Téléchargez un fichier CSV pour importer en masse des enregistrements d\'accidents',
+        'import.subtitle': 'Téléchargez un fichier CSV, Excel (.xlsx), .csv.gz ou .zip pour importer en masse des enregistrements d\'accidents',
         'import.dropZone': 'Déposez votre fichier CSV ici',
         'import.dropZoneDesc': 'ou cliquez pour parcourir votre ordinateur',
         'import.dropHere': 'Déposez votre fichier CSV ici',
@@ -1017,6 +1032,21 @@ window.AppTranslations = {
         'import.chooseFile': 'Choisir un fichier',
         'import.uploadBtn': 'Télécharger et importer',
         'import.uploadImport': 'Télécharger et importer',
+        'import.validateOnly': 'Valider uniquement',
+        'import.jobs': 'Imports récents',
+        'import.file': 'Fichier',
+        'import.status': 'Statut',
+        'import.progress': 'Progression',
+        'import.imported': 'Importés',
+        'import.skipped': 'Ignorés',
+        'import.duplicates': 'Doublons',
+        'import.cancel': 'Annuler',
+        'import.dryRun': 'Résultat de la validation',
+        'import.row': 'Ligne',
+        'import.column': 'Colonne',
+        'import.reason': 'Motif',
+        'import.downloadReport': 'Télécharger le rapport d\'erreurs complet (CSV)',
+        'import.noErrors': 'Aucune erreur — le fichier est prêt à être importé.',
         'import.csvPreview': 'Aperçu CSV',
         'import.previewNote': 'L\'aperçu montre uniquement les premières lignes. L\'import mappera les champs requis (Date, Lieu, Gravité) avec des alias flexibles.',
         'import.dangerZone': '⚠️ Zone de danger',
@@ -1620,7 +1650,7 @@ window.AppTranslations = {
 
         // Import CSV
         'import.title': 'استيراد بيانات الحوادث',
-        'import.subtitle': 'قم بتحميل ملف CSV لاستيراد سجلات الحوادث بالجملة',
+        'import.subtitle': 'قم بتحميل ملف CSV أو Excel (.xlsx) أو .csv.gz أو .zip لاستيراد سجلات الحوادث بالجملة',
         'import.dropZone': 'أسقط ملف CSV هنا',
         'import.dropZoneDesc': 'أو انقر للتصفح من جهازك',
         'import.dropHere': 'أسقط ملف CSV هنا',
@@ -1628,6 +1658,21 @@ window.AppTranslations = {
         'import.chooseFile': 'اختر ملف',
         'import.uploadBtn': 'تحميل واستيراد',
         'import.uploadImport': 'تحميل واستيراد',
+        'import.validateOnly': 'التحقق فقط',
+        'import.jobs': 'عمليات الاستيراد الأخيرة',
+        'import.file': 'الملف',
+        'import.status': 'الحالة',
+        'import.progress': 'التقدم',
+        'import.imported': 'المستوردة',
+        'import.skipped': 'المتجاهلة',
+        'import.duplicates': 'المكررة',
+        'import.cancel': 'إلغاء',
+        'import.dryRun': 'نتيجة التحقق',
+        'import.row': 'السطر',
+        'import.column': 'العمود',
+        'import.reason': 'السبب',
+        'import.downloadReport': 'تنزيل تقرير الأخطاء الكامل (CSV)',
+        'import.noErrors': 'لا توجد أخطاء — الملف جاهز للاستيراد.',
         'import.csvPreview': 'معاينة CSV',
         'import.previewNote': 'تظهر المعاينة الصفوف الأولى فقط. سيقوم الاستيراد بربط الحقول المطلوبة (التاريخ، الموقع، الشدة) باستخدام أسماء مرنة.',
         'import.dangerZone': '⚠️ منطقة الخطر',
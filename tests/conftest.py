@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds the application at import time: point it at a scratch
+# database first
+_db_dir = tempfile.mkdtemp(prefix='traffic-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'traffic.db')
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _headers(role):
+    from flask_jwt_extended import create_access_token
+    from extensions import db
+    from models.user import User
+
+    user = User.query.filter_by(role=role).first()
+    if user is None:
+        user = User(full_name=f'Test {role}', email=f'{role}@test.tn', password_hash='x',
+                    role=role, national_id=f'{role}-test', user_type=role)
+        db.session.add(user)
+        db.session.commit()
+    token = create_access_token(identity=str(user.id), additional_claims={'role': role})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture(scope='session')
+def gov_headers(app):
+    return _headers('government')
+
+
+@pytest.fixture(scope='session')
+def citizen_headers(app):
+    return _headers('citizen')
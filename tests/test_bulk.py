@@ -0,0 +1,18 @@
+from models.import_batch import ImportBatch
+
+RECORDS = [
+    {'occurred_at': '2024-06-01 09:00', 'severity': 'low', 'location': 'Sousse', 'cause': 'bulk-test'},
+    {'occurred_at': '2024-06-02 09:00', 'severity': 'high', 'location': 'Sousse', 'cause': 'bulk-test'},
+]
+
+
+def test_bulk_keeps_no_batch_when_nothing_was_created(client, gov_headers):
+    first = client.post('/api/v1/accidents/bulk', headers=gov_headers, json=RECORDS)
+    assert first.status_code == 201
+    batches = ImportBatch.query.count()
+
+    # Every record is already stored: no rows, so no batch either
+    again = client.post('/api/v1/accidents/bulk', headers=gov_headers, json=RECORDS)
+    assert again.status_code == 200
+    assert again.get_json()['data']['batch_id'] is None
+    assert ImportBatch.query.count() == batches
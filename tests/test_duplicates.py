@@ -0,0 +1,35 @@
+from extensions import db
+from models.accident_report import AccidentReport
+
+
+def _submit(client, headers, when):
+    response = client.post('/reports', headers=headers, json={
+        'date': f'2026-05-01T{when}:00', 'location': 'Avenue X', 'delegation': 'Test Delegation',
+        'severity': 'severe', 'phone': '+216123456789',
+    })
+    assert response.status_code == 201
+    return response.get_json()['report_id']
+
+
+def _cluster(report_id):
+    db.session.expire_all()
+    return db.session.get(AccidentReport, report_id).duplicate_cluster_id
+
+
+def test_clusters_do_not_chain_past_the_window(client, citizen_headers, gov_headers):
+    first = _submit(client, citizen_headers, '10:00')
+    second = _submit(client, citizen_headers, '10:25')
+    # Within the window of the second report, not of the cluster's first
+    third = _submit(client, citizen_headers, '10:50')
+
+    assert _cluster(first) == _cluster(second) == first
+    assert _cluster(third) != first
+
+    response = client.post(f'/reports/clusters/{first}/merge', headers=gov_headers,
+                           json={'ids': [second], 'new': True})
+    assert response.status_code == 200
+    assert response.get_json()['processed'] == [second]
+    assert db.session.get(AccidentReport, first).status == 'PENDING'
+
+    response = client.post(f'/reports/clusters/{first}/merge', headers=gov_headers, json={'ids': [third]})
+    assert response.status_code == 400
@@ -0,0 +1,64 @@
+import io
+import time
+
+from extensions import db
+from models.export_job import ExportJob
+from models.saved_report import SavedReport
+from utils.email_service import email_service
+from utils.export_jobs import export_jobs
+from utils.report_scheduler import report_scheduler
+
+CSV = "date,severity,location,cause\n2024-04-01 08:00,low,Gabes,export-edit-test\n"
+
+
+def _wait(job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        db.session.expire_all()
+        job = db.session.get(ExportJob, job_id)
+        if job.status in ('completed', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"export job {job_id} did not finish")
+
+
+def test_cached_export_is_not_served_after_an_edit(client, gov_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'export_dir', str(tmp_path))
+    response = client.post('/upload/import', headers=gov_headers,
+                           data={'file': (io.BytesIO(CSV.encode()), 'export.csv')})
+    accident_id = response.get_json()['created_id_ranges'][0][0]
+
+    url = '/api/export/accidents/csv?severity=low'
+    queued = client.get(url + '&async=1', headers=gov_headers).get_json()
+    assert _wait(queued['job']['id']).status == 'completed'
+
+    response = client.patch(f'/api/v1/accidents/{accident_id}', headers=gov_headers,
+                            json={'cause': 'export-edited'})
+    assert response.status_code == 200
+
+    body = client.get(url, headers=gov_headers).get_data(as_text=True)
+    assert 'export-edited' in body
+    assert 'export-edit-test' not in body
+
+
+def test_emailed_report_link_downloads_without_login(client, gov_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'export_dir', str(tmp_path))
+    sent = []
+    monkeypatch.setattr(email_service, 'send_template', lambda to, name, **kw: sent.append(kw))
+    report = SavedReport(name='Weekly', format='csv', filters='{}', recipients='a@test.tn', attach=False)
+    db.session.add(report)
+    db.session.commit()
+    job = _wait(report_scheduler.render(report).id)
+
+    monkeypatch.setitem(client.application.config, 'PUBLIC_BASE_URL', '')
+    report_scheduler._email(report, job)
+    assert sent == []
+
+    monkeypatch.setitem(client.application.config, 'PUBLIC_BASE_URL', 'https://traffic.test/')
+    report_scheduler._email(report, job)
+    link = sent[0]['download_url']
+    assert link.startswith('https://traffic.test/api/export/reports/shared/')
+
+    path = link[len('https://traffic.test'):]
+    assert client.get(path).status_code == 200
+    assert client.get(path[:-2] + 'xx').status_code == 403
@@ -0,0 +1,21 @@
+import pytest
+
+from utils.places import PlaceResolver
+
+resolver = PlaceResolver()
+
+
+@pytest.mark.parametrize('text', ['Sidi', 'Hammam', 'Menzel', 'Oued', 'Ben', 'Jebel'])
+def test_generic_words_resolve_to_nothing(text):
+    assert resolver.resolve_cell(text) == (None, None)
+    assert resolver.resolve_delegation(text) is None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Gabs', ('Gabès', None)),
+    ('Hamamet', ('Nabeul', 'Hammamet')),
+    ('Sidi Bouzd', ('Sidi Bouzid', None)),
+    ('Menzel Bourgiba', ('Bizerte', 'Menzel Bourguiba')),
+])
+def test_typos_still_resolve(text, expected):
+    assert resolver.resolve_cell(text) == expected
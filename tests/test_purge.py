@@ -0,0 +1,39 @@
+import io
+
+from extensions import db
+from models.accident import Accident
+from models.delete_job import DeleteJob
+from utils.purge import purge_jobs
+
+CSV = "date,severity,location\n" + "".join(
+    f"2024-03-{day:02d} 08:00,low,Sfax\n" for day in range(1, 11)
+)
+
+
+def _import(client, headers):
+    response = client.post('/upload/import', headers=headers,
+                           data={'file': (io.BytesIO(CSV.encode()), 'purge.csv')})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_reupload_during_purge_keeps_new_rows(client, gov_headers, monkeypatch):
+    first = _import(client, gov_headers)
+    assert first['imported'] == 10
+
+    # Hold the purge so the re-upload lands while the old rows still exist
+    queued = []
+    monkeypatch.setattr(purge_jobs, 'submit', queued.append)
+    response = client.delete(f"/upload/import?batch_id={first['batch_id']}", headers=gov_headers)
+    assert response.status_code == 202
+
+    second = _import(client, gov_headers)
+    assert second['imported'] == 10
+    assert second['duplicates'] == 0
+
+    for job_id in queued:
+        purge_jobs._run(job_id)
+    assert all(db.session.get(DeleteJob, job_id).status == 'completed' for job_id in queued)
+    db.session.expire_all()
+    assert Accident.query.filter_by(batch_id=second['batch_id']).count() == 10
+    assert Accident.query.filter_by(batch_id=first['batch_id']).count() == 0
@@ -0,0 +1,48 @@
+import io
+
+from extensions import db
+from models.accident import Accident
+from utils.purge import purge_jobs
+
+HEADER = "ref,updated_at,date,severity,location\n"
+
+
+def _feed(rows):
+    body = HEADER + "".join(",".join(row) + "\n" for row in rows)
+    return {'file': (io.BytesIO(body.encode()), 'feed.csv')}
+
+
+def _sync(client, headers, rows):
+    response = client.post('/upload/import/sync?source=test-feed', headers=headers, data=_feed(rows))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_deleting_first_sync_keeps_later_updates_and_resend(client, gov_headers, monkeypatch):
+    rows = [(f"R{i}", "2024-01-01 00:00", "2024-01-02 10:00", "low", "Tunis") for i in range(5)]
+    first = _sync(client, gov_headers, rows)
+    assert first['inserted'] == 5
+
+    rows[0] = ("R0", "2024-01-05 00:00", "2024-01-02 10:00", "high", "Tunis")
+    second = _sync(client, gov_headers, rows)
+    assert second['updated'] == 1
+    assert second['below_watermark'] == 4
+
+    queued = []
+    monkeypatch.setattr(purge_jobs, 'submit', queued.append)
+    response = client.delete(f"/upload/import?batch_id={first['batch_id']}", headers=gov_headers)
+    assert response.status_code == 202
+    for job_id in queued:
+        purge_jobs._run(job_id)
+
+    # The updated row moved to the second batch and survives the purge
+    db.session.expire_all()
+    kept = Accident.query.filter_by(external_source='test-feed').all()
+    assert [(a.external_id, a.batch_id) for a in kept] == [("R0", second['batch_id'])]
+
+    # A full re-send restores the purged rows instead of skipping them
+    resend = _sync(client, gov_headers, rows)
+    assert resend['below_watermark'] == 0
+    assert resend['inserted'] == 4
+    assert resend['unchanged'] == 1
+    assert Accident.query.filter_by(external_source='test-feed').count() == 5
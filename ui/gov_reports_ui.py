@@ -22,12 +22,73 @@ def reports_list():
     jwt_token = session.get('access_token')
     api_url = current_app.config.get('API_URL', 'http://localhost:5001')
     headers = {'Authorization': f'Bearer {jwt_token}'} if jwt_token else {}
+    # One keyset page at a time; filters and the cursor pass through
+    params = {k: request.args[k] for k in ('status', 'start', 'end', 'cluster', 'cursor') if request.args.get(k)}
+    next_cursor = None
     try:
-        resp = requests.get(f'{api_url}/reports', headers=headers)
+        resp = requests.get(f'{api_url}/reports', params=params, headers=headers)
         reports = resp.json() if resp.status_code == 200 else []
+        next_cursor = resp.headers.get('X-Next-Cursor') if resp.status_code == 200 else None
     except Exception:
         reports = []
-    return render_template('gov_reports.html', reports=reports)
+    filters = {k: v for k, v in params.items() if k != 'cursor'}
+    return render_template('gov_reports.html', reports=reports, filters=filters,
+                           next_cursor=next_cursor, paged=bool(params.get('cursor')))
+
+@gov_reports_ui.route('/reports/bulk', methods=['POST'])
+def reports_bulk():
+    """Confirm or reject the selected reports with one API call"""
+    if 'role' not in session or session['role'] != 'government':
+        flash('Access denied. Government only.', 'danger')
+        return redirect(url_for('dashboard_ui.dashboard'))
+    jwt_token = session.get('access_token')
+    api_url = current_app.config.get('API_URL', 'http://localhost:5001')
+    headers = {'Authorization': f'Bearer {jwt_token}'} if jwt_token else {}
+    back = url_for('gov_reports_ui.reports_list', **{
+        k: request.form[k] for k in ('status', 'start', 'end', 'cluster', 'cursor') if request.form.get(k)
+    })
+    ids = request.form.getlist('ids')
+    action = request.form.get('action')
+    if not ids or action not in ('confirm', 'reject'):
+        flash('Select reports and an action first.', 'warning')
+        return redirect(back)
+    payload = {'action': action, 'ids': ids, 'reason': request.form.get('reason') or None}
+    try:
+        resp = requests.post(f'{api_url}/reports/bulk', json=payload, headers=headers)
+        result = resp.json()
+    except Exception:
+        resp, result = None, {}
+    if resp is not None and resp.status_code == 200:
+        flash(result.get('message', 'Reports updated.'), 'success' if action == 'confirm' else 'warning')
+        skipped = len(result.get('already_processed', [])) + len(result.get('not_found', []))
+        if skipped:
+            flash(f'{skipped} selected reports were already processed.', 'info')
+    else:
+        flash(result.get('description', 'Bulk update failed.'), 'danger')
+    return redirect(back)
+
+
+@gov_reports_ui.route('/reports/clusters/<int:cluster_id>/merge', methods=['POST'])
+def reports_merge(cluster_id):
+    """Confirm a cluster of duplicate reports as one accident"""
+    if 'role' not in session or session['role'] != 'government':
+        flash('Access denied. Government only.', 'danger')
+        return redirect(url_for('dashboard_ui.dashboard'))
+    jwt_token = session.get('access_token')
+    api_url = current_app.config.get('API_URL', 'http://localhost:5001')
+    headers = {'Authorization': f'Bearer {jwt_token}'} if jwt_token else {}
+    payload = {'new': request.form.get('target') == 'new'}
+    try:
+        resp = requests.post(f'{api_url}/reports/clusters/{cluster_id}/merge', json=payload, headers=headers)
+        result = resp.json()
+    except Exception:
+        resp, result = None, {}
+    if resp is not None and resp.status_code == 200:
+        flash(result.get('message', 'Cluster merged.'), 'success')
+        return redirect(url_for('gov_reports_ui.reports_list', status='PENDING'))
+    flash(result.get('description', 'Merge failed.'), 'danger')
+    return redirect(url_for('gov_reports_ui.reports_list', cluster=cluster_id, status='PENDING'))
+
 
 @gov_reports_ui.route('/reports/<int:report_id>', methods=['GET', 'POST'])
 def report_detail(report_id):
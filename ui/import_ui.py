@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, current_app, jsonify, Response
 import requests
 from .utils import login_required, role_required
+from .accidents_ui import read_json
 
 import_ui = Blueprint("import_ui", __name__)
 
+# Max newly imported rows highlighted on the accidents page
+HIGHLIGHT_LIMIT = 200
+
 
 def call_api(endpoint, method='GET', headers=None, params=None, json=None, timeout=5):
     """Call API endpoint - either via HTTP or internal WSGI client.
@@ -76,10 +80,10 @@ def import_csv():
                 flash("API not reachable", "danger")
                 return redirect(url_for("import_ui.import_csv"))
 
-            if resp.status_code != 200:
+            if resp.status_code not in (200, 202):
                 # Handle expired token specially
                 try:
-                    data = resp.json()
+                    data = read_json(resp) or {}
                     msg = data.get("message") or data.get("msg") or resp.text
                 except Exception:
                     msg = resp.text
@@ -93,10 +97,27 @@ def import_csv():
                 flash(msg or "Delete failed", "danger")
                 return redirect(url_for("import_ui.import_csv"))
 
-            data = resp.json()
-            flash(f"Deleted: {data.get('deleted', 0)} records", "success")
+            data = read_json(resp) or {}
+            jobs = data.get('jobs') or []
+            if jobs:
+                total = sum(j.get('total', 0) for j in jobs)
+                flash(f"Deletion started: {total} records are hidden and being purged in the background", "success")
+            else:
+                flash(data.get('message') or "Nothing to delete", "info")
             return redirect(url_for("accidents_ui.accidents"))
 
+        # Cancel a running background import
+        if request.form.get("action") == "cancel":
+            headers = {"Authorization": f"Bearer {session['access_token']}"}
+            job_id = request.form.get('job_id', type=int)
+            resp = call_api(f"/upload/import/jobs/{job_id}/cancel", method='POST', headers=headers, timeout=5)
+            try:
+                msg = (read_json(resp) or {}).get('message')
+            except Exception:
+                msg = resp.text
+            flash(msg or "Cancel failed", "success" if resp.status_code == 200 else "warning")
+            return redirect(url_for("import_ui.import_csv"))
+
         # Otherwise handle upload
         file = request.files.get("file")
 
@@ -107,6 +128,9 @@ def import_csv():
         headers = {
             "Authorization": f"Bearer {session['access_token']}"
         }
+        # "Validate only" runs a synchronous dry run instead of queueing a job
+        validate_only = request.form.get("action") == "validate"
+        endpoint = "/upload/import?dry_run=1" if validate_only else "/upload/import/jobs"
 
         try:
             # For file uploads, we need to handle external API differently
@@ -114,17 +138,15 @@ def import_csv():
             if api_base:
                 # External API - use requests which handles multipart/form-data
                 resp = requests.post(
-                    f"{api_base}/upload/import",
+                    f"{api_base}{endpoint}",
                     files={"file": (file.filename, file.stream, file.content_type)},
                     headers=headers,
-                    timeout=10
+                    timeout=300 if validate_only else 10
                 )
             else:
-                # Internal - for Flask test client, we need to read the file content
-                file_content = file.read()
-                file.seek(0)  # Reset for potential re-reads
+                # Internal - hand the upload stream straight to the test client
                 resp = current_app.test_client().post(
-                    "/upload/import",
+                    endpoint,
                     data={'file': (file.stream, file.filename)},
                     headers=headers
                 )
@@ -132,10 +154,10 @@ def import_csv():
             flash("API not reachable", "danger")
             return redirect(url_for("import_ui.import_csv"))
 
-        if resp.status_code != 200:
+        if resp.status_code != (200 if validate_only else 202):
             # show raw response text when possible for easier debugging (e.g., missing/invalid JWT)
             try:
-                data = resp.json()
+                data = read_json(resp) or {}
                 msg = data.get("message") or data.get("msg") or resp.text
             except Exception:
                 msg = resp.text
@@ -148,49 +170,79 @@ def import_csv():
             flash(msg or "Import failed", "danger")
             return redirect(url_for("import_ui.import_csv"))
 
-        data = resp.json()
-        # Surface counts and any row-level errors returned by the import API so
-        # the user can diagnose why rows were skipped (invalid dates, severity, etc.)
-        imported = data.get('imported', 0)
-        skipped = data.get('skipped', 0)
-        flash(f"Imported: {imported}, Skipped: {skipped}", "success")
-        errors = data.get('errors', []) or []
-        if errors:
-            # show up to first 10 errors to avoid flooding the UI
-            msgs = []
-            for e in errors[:10]:
-                # each error is expected like {'row': N, 'reason': '...'}
-                try:
-                    row = e.get('row')
-                    reason = e.get('reason')
-                    msgs.append(f"Row {row}: {reason}")
-                except Exception:
-                    msgs.append(str(e))
-            flash("Import errors (first 10):\n" + "\n".join(msgs), "warning")
-
-        # If import returned created IDs, pass them to the accidents page so
-        # newly created rows can be highlighted.
-        created = data.get('created_ids', [])
-        if created:
-            ids_param = ",".join(str(i) for i in created)
-            # Add a cache-busting timestamp to the redirect so the accidents
-            # page reloads fresh data immediately after an import. Some dev
-            # environments or proxies may cache GETs; including a unique
-            # query param prevents stale results.
-            import time
-            ts = int(time.time())
-            return redirect(url_for("accidents_ui.accidents") + f"?highlight_ids={ids_param}&_ts={ts}")
-
-        return redirect(url_for("accidents_ui.accidents"))
-
-    # GET: fetch available import batches to show history
+        if validate_only:
+            dry_run = read_json(resp) or {}
+            if dry_run.get('error_report_url'):
+                token = dry_run['error_report_url'].rstrip('/').rsplit('/', 1)[-1]
+                dry_run['report_url'] = url_for("import_ui.import_error_report", token=token)
+            dry_run['filename'] = file.filename
+            return _render_import_page(dry_run=dry_run)
+
+        # The import runs in the background; the page polls its progress
+        job = (read_json(resp) or {}).get('job', {})
+        flash(f"Import queued as job #{job.get('id')} — progress is shown below", "success")
+        return redirect(url_for("import_ui.import_csv"))
+
+    return _render_import_page()
+
+
+def _render_import_page(**context):
+    # Fetch available import batches and recent jobs to show history
     headers = {"Authorization": f"Bearer {session.get('access_token')}"}
     batches = []
+    jobs = []
     try:
         resp = call_api("/upload/import/batches", headers=headers, timeout=5)
         if resp.status_code == 200:
-            batches = resp.json().get('batches', [])
+            batches = (read_json(resp) or {}).get('batches', [])
+        resp = call_api("/upload/import/jobs", headers=headers, timeout=5)
+        if resp.status_code == 200:
+            jobs = (read_json(resp) or {}).get('jobs', [])[:10]
     except Exception:
-        batches = []
+        pass
+
+    return render_template("import_csv.html", batches=batches, jobs=jobs, **context)
+
+
+@import_ui.route("/import/reports/<token>")
+@login_required
+@role_required("government")
+def import_error_report(token):
+    """Download the CSV error report of a dry run."""
+    headers = {"Authorization": f"Bearer {session.get('access_token')}"}
+    resp = call_api(f"/upload/import/reports/{token}", headers=headers, timeout=30)
+    if resp.status_code != 200:
+        flash("Error report not available (reports expire after a day)", "warning")
+        return redirect(url_for("import_ui.import_csv"))
+    body = resp.content if hasattr(resp, 'content') else resp.data
+    return Response(body, mimetype='text/csv', headers={
+        'Content-Disposition': resp.headers.get('Content-Disposition', f'attachment; filename=import_errors_{token[:8]}.csv'),
+    })
 
-    return render_template("import_csv.html", batches=batches)
+
+@import_ui.route("/import/jobs/<int:job_id>")
+@login_required
+@role_required("government")
+def import_job_status(job_id):
+    """JSON progress of one import job, polled by the import page."""
+    headers = {"Authorization": f"Bearer {session.get('access_token')}"}
+    resp = call_api(f"/upload/import/jobs/{job_id}", headers=headers, timeout=5)
+    try:
+        job = (read_json(resp) or {}).get('job')
+    except Exception:
+        job = None
+    if resp.status_code != 200 or not job:
+        return jsonify({'error': 'Job not available'}), resp.status_code if resp.status_code != 200 else 502
+
+    # Once done, link to the accidents page with the new rows highlighted.
+    # Only the first HIGHLIGHT_LIMIT ids are expanded to keep the URL short.
+    if job.get('status') in ('completed', 'cancelled') and job.get('imported'):
+        created = []
+        for start, end in job.get('created_id_ranges', []) or []:
+            created.extend(range(start, min(end, start + HIGHLIGHT_LIMIT - len(created) - 1) + 1))
+            if len(created) >= HIGHLIGHT_LIMIT:
+                break
+        job['highlight_url'] = url_for("accidents_ui.accidents") + "?highlight_ids=" + ",".join(str(i) for i in created)
+    # The page shows the first 10 row errors only
+    job['errors'] = (job.get('errors') or [])[:10]
+    return jsonify({'job': job}), 200
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 import requests
-from ui.accidents_ui import get_api_url
+from ui.accidents_ui import get_api_url, read_json
 from datetime import datetime
 
 report_ui = Blueprint('report_ui', __name__)
@@ -91,16 +91,21 @@ def my_reports():
     jwt_token = session.get('access_token')
     headers = {'Authorization': f'Bearer {jwt_token}'} if jwt_token else {}
     api_url = get_api_url('/reports')
+    # One keyset page at a time, newest first
+    params = {'cursor': request.args['cursor']} if request.args.get('cursor') else {}
+    next_cursor = None
     try:
         if api_url:
-            resp = requests.get(api_url, headers=headers)
+            resp = requests.get(api_url, params=params, headers=headers)
         else:
             client = current_app.test_client()
-            resp = client.get('/reports', headers=headers)
+            resp = client.get('/reports', query_string=params, headers=headers)
         try:
-            reports = resp.json() if resp.status_code == 200 else []
+            reports = (read_json(resp) or []) if resp.status_code == 200 else []
+            next_cursor = resp.headers.get('X-Next-Cursor') if resp.status_code == 200 else None
         except Exception:
             reports = []
     except Exception:
         reports = []
-    return render_template('my_reports.html', reports=reports)
+    return render_template('my_reports.html', reports=reports,
+                           next_cursor=next_cursor, paged=bool(params))
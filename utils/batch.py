@@ -7,153 +7,155 @@ Utilities for bulk create/update operations
 from extensions import db
 from models.accident import Accident
 from models.accident_report import AccidentReport
+from sqlalchemy import insert
 from utils.errors import ValidationError, DatabaseError
+from utils.geo import parse_coordinates
+from utils.importer import expand_ranges, map_columns
+from utils.ingest import MAX_BULK_RECORDS, ingest
 from datetime import datetime
 
+# Reports per BatchReportCreator request
+MAX_REPORT_ITEMS = 100
+
 
 class BatchAccidentCreator:
-    """Bulk create accidents from list of dicts"""
-    
+    """Bulk create accidents from list of dicts (built on utils/ingest)"""
+
     @staticmethod
-    def validate_item(item: dict, index: int) -> dict:
-        """Validate a single accident item"""
-        required = ['location', 'severity']
-        errors = []
-        
-        for field in required:
-            if field not in item or not item[field]:
-                errors.append(f"Item {index}: {field} is required")
-        
-        if item.get('severity') and item['severity'] not in ['low', 'medium', 'high']:
-            errors.append(f"Item {index}: severity must be low/medium/high")
-        
-        if errors:
-            raise ValidationError("Validation failed", {"errors": errors})
-        
+    def _with_default_date(item: dict, now: str):
+        # Items without a date were historically stamped with the current time
+        if isinstance(item, dict) and 'occurred_at' not in map_columns(item.keys())[0]:
+            return {**item, 'occurred_at': now}
         return item
-    
+
     @staticmethod
     def create_batch(items: list) -> dict:
         """
         Create multiple accidents
-        
+
         Args:
             items: list of accident dicts
-            
+
         Returns:
-            dict with created_count and created_ids
-            
+            dict with created_count, created_ids, duplicates (indexes of
+            items already stored) and failures (per index)
+
         Raises:
-            ValidationError if validation fails
-            DatabaseError if database operation fails
+            ValidationError if no item is valid
         """
         if not items:
             raise ValidationError("items list cannot be empty")
-        
-        if len(items) > 100:
-            raise ValidationError("Maximum 100 items per batch")
-        
-        # Validate all items first
-        for i, item in enumerate(items):
-            BatchAccidentCreator.validate_item(item, i)
-        
-        # Create accidents
-        created = []
-        try:
-            for item in items:
-                accident = Accident(
-                    location=item.get('location'),
-                    governorate=item.get('governorate') or item.get('location'),
-                    delegation=item.get('delegation'),
-                    severity=item.get('severity'),
-                    cause=item.get('cause'),
-                    occurred_at=item.get('occurred_at') or datetime.utcnow()
-                )
-                db.session.add(accident)
-                created.append(accident)
-            
-            db.session.commit()
-            
-            return {
-                "created_count": len(created),
-                "created_ids": [a.id for a in created]
-            }
-        except Exception as e:
-            db.session.rollback()
-            raise DatabaseError(f"Batch create failed: {str(e)}")
+
+        if len(items) > MAX_BULK_RECORDS:
+            raise ValidationError(f"Maximum {MAX_BULK_RECORDS} items per batch")
+
+        now = datetime.utcnow().isoformat()
+        result = ingest(
+            (i, BatchAccidentCreator._with_default_date(item, now)) for i, item in enumerate(items)
+        )
+        if result.failures and not result.created and not result.duplicates:
+            raise ValidationError("Validation failed", {"errors": result.failures})
+
+        return {
+            "created_count": result.created,
+            "created_ids": expand_ranges(result.id_ranges),
+            "duplicates": result.duplicates,
+            "failures": result.failures,
+        }
 
 
 class BatchReportCreator:
     """Bulk create accident reports from list of dicts"""
-    
+
+    REQUIRED = ['date', 'location', 'delegation', 'severity', 'phone']
+
     @staticmethod
-    def validate_item(item: dict, index: int) -> dict:
-        """Validate a single report item"""
-        required = ['accident_id', 'description']
+    def validate_item(item: dict, index: int) -> list:
+        """Validate a single report item; returns a list of error strings"""
+        if not isinstance(item, dict):
+            return [f"Item {index}: must be an object"]
         errors = []
-        
-        for field in required:
-            if field not in item or not item[field]:
+
+        for field in BatchReportCreator.REQUIRED:
+            if not item.get(field):
                 errors.append(f"Item {index}: {field} is required")
-        
-        if errors:
-            raise ValidationError("Validation failed", {"errors": errors})
-        
-        return item
-    
+
+        phone = item.get('phone')
+        if phone and (not str(phone).startswith('+216') or len(str(phone)) != 13):
+            errors.append(f"Item {index}: phone must start with +216 and be Tunisia format")
+
+        if item.get('date'):
+            try:
+                datetime.fromisoformat(item['date'])
+            except (TypeError, ValueError):
+                errors.append(f"Item {index}: invalid date format")
+
+        return errors
+
     @staticmethod
     def create_batch(items: list, reporter_id: int) -> dict:
         """
         Create multiple accident reports
-        
+
         Args:
-            items: list of report dicts
+            items: list of report dicts (date, location, delegation, severity,
+                phone, optional lat/lng and accident_id)
             reporter_id: user ID of reporter
-            
+
         Returns:
             dict with created_count and created_ids
-            
+
         Raises:
             ValidationError if validation fails
             DatabaseError if database operation fails
         """
         if not items:
             raise ValidationError("items list cannot be empty")
-        
-        if len(items) > 100:
-            raise ValidationError("Maximum 100 items per batch")
-        
+
+        if len(items) > MAX_REPORT_ITEMS:
+            raise ValidationError(f"Maximum {MAX_REPORT_ITEMS} items per batch")
+
         # Validate all items first
+        errors = []
         for i, item in enumerate(items):
-            BatchReportCreator.validate_item(item, i)
-        
-        # Create reports
-        created = []
+            errors.extend(BatchReportCreator.validate_item(item, i))
+
+        # Linked accidents are checked with one query, not one per item
+        accident_ids = {item['accident_id'] for item in items if isinstance(item, dict) and item.get('accident_id')}
+        if accident_ids:
+            found = {row_id for (row_id,) in db.session.query(Accident.id).filter(Accident.id.in_(accident_ids))}
+            errors.extend(f"Accident {a} not found" for a in sorted(accident_ids - found, key=str))
+
+        if errors:
+            raise ValidationError("Validation failed", {"errors": errors})
+
+        rows = []
+        for item in items:
+            lat, lng = parse_coordinates(item.get('lat'), item.get('lng'))
+            rows.append({
+                'user_id': reporter_id,
+                'date': datetime.fromisoformat(item['date']),
+                'location': item['location'],
+                'delegation': item['delegation'],
+                'severity': item['severity'],
+                'phone': item['phone'],
+                'lat': lat,
+                'lng': lng,
+                'accident_id': item.get('accident_id'),
+                'status': 'PENDING',
+                'created_at': datetime.utcnow(),
+            })
+
         try:
-            for item in items:
-                # Verify accident exists
-                accident = Accident.query.get(item['accident_id'])
-                if not accident:
-                    raise ValueError(f"Accident {item['accident_id']} not found")
-                
-                report = AccidentReport(
-                    accident_id=item['accident_id'],
-                    reporter_id=reporter_id,
-                    description=item.get('description'),
-                    status=item.get('status', 'pending')
-                )
-                db.session.add(report)
-                created.append(report)
-            
+            created_ids = [row_id for (row_id,) in db.session.execute(
+                insert(AccidentReport).returning(AccidentReport.id), rows
+            )]
             db.session.commit()
-            
-            return {
-                "created_count": len(created),
-                "created_ids": [r.id for r in created]
-            }
-        except ValueError as e:
-            db.session.rollback()
-            raise ValidationError(str(e))
         except Exception as e:
             db.session.rollback()
             raise DatabaseError(f"Batch create failed: {str(e)}")
+
+        return {
+            "created_count": len(created_ids),
+            "created_ids": created_ids,
+        }
@@ -0,0 +1,229 @@
+"""
+Map Point Clustering
+====================
+Hierarchical grid clustering of accident coordinates (supercluster style)
+
+Points are projected to Web Mercator and bucketed into a grid whose cell
+size halves at every zoom level, so each cell at zoom z is exactly the
+union of four cells at zoom z + 1. The hierarchy is built bottom-up once,
+kept in memory, and updated incrementally: new accidents (by id
+high-water mark) are added to every level in O(levels) each; a full
+rebuild only happens when rows were deleted.
+"""
+
+import math
+import threading
+from time import time
+
+from extensions import db
+from models.accident import Accident
+
+# Deepest precomputed zoom; deeper requests are served from this level
+MAX_ZOOM = 16
+
+# Cluster radius in pixels relative to a 512px tile (supercluster defaults)
+RADIUS = 40
+EXTENT = 512
+
+# How often (seconds) the index checks the table for new/deleted rows
+SYNC_INTERVAL = 10
+
+# Cap on clusters returned for a single request
+MAX_CLUSTERS = 5000
+
+_MAX_LAT = 85.05112878
+
+
+def _project(lat, lng):
+    """Project lat/lng to normalized Web Mercator x, y in [0, 1]"""
+    lat = max(-_MAX_LAT, min(_MAX_LAT, lat))
+    sin = math.sin(math.radians(lat))
+    x = lng / 360.0 + 0.5
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+
+
+def _unproject(x, y):
+    """Inverse of _project"""
+    lng = (x - 0.5) * 360.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lng
+
+
+# Cells per side at MAX_ZOOM; shallower levels halve it by shifting
+_MAX_SIDE = int((EXTENT / RADIUS) * (2 ** MAX_ZOOM))
+
+
+def _cell(v, zoom):
+    """Grid index of a normalized coordinate at ``zoom``, as built by _add"""
+    return min(int(v * _MAX_SIDE), _MAX_SIDE - 1) >> (MAX_ZOOM - zoom)
+
+
+class ClusterIndex:
+    """In-memory cluster hierarchy over all accidents with coordinates.
+
+    Each level maps (cx, cy) -> [count, sum_x, sum_y, severities, point_id]
+    where ``point_id`` is only kept while the cell holds a single point.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._levels = None
+        self._max_id = 0
+        self._count = 0
+        self._checked_at = 0.0
+        self._stale = True
+        self._moved = False
+        self.built_at = None
+
+    # ----------------------------------------------------------------
+    # Maintenance
+    # ----------------------------------------------------------------
+
+    def mark_stale(self, moved=False):
+        """Force a sync on the next query (call after imports/deletes).
+
+        ``moved`` forces a full rebuild: existing rows changed coordinates
+        or severity, which the id/count check cannot see.
+        """
+        if moved:
+            self._moved = True
+        self._stale = True
+
+    def _empty_levels(self):
+        return [dict() for _ in range(MAX_ZOOM + 1)]
+
+    def _add(self, levels, point_id, lat, lng, severity):
+        x, y = _project(lat, lng)
+        cx, cy = _cell(x, MAX_ZOOM), _cell(y, MAX_ZOOM)
+        for zoom in range(MAX_ZOOM, -1, -1):
+            cell = levels[zoom].get((cx, cy))
+            if cell is None:
+                levels[zoom][(cx, cy)] = [1, x, y, {severity: 1}, point_id]
+            else:
+                cell[0] += 1
+                cell[1] += x
+                cell[2] += y
+                cell[3][severity] = cell[3].get(severity, 0) + 1
+                cell[4] = None
+            cx >>= 1
+            cy >>= 1
+
+    def _load(self, levels, min_id=0):
+        """Add every accident with coordinates and id > min_id; return max id"""
+        q = db.session.query(
+            Accident.id, Accident.lat, Accident.lng, Accident.severity
+        ).filter(
+            Accident.id > min_id,
+            Accident.lat.isnot(None),
+            Accident.lng.isnot(None),
+            Accident.visible(),
+        ).order_by(Accident.id)
+        max_id = min_id
+        added = 0
+        for point_id, lat, lng, severity in q.yield_per(5000):
+            self._add(levels, point_id, lat, lng, severity or 'unknown')
+            max_id = point_id
+            added += 1
+        return max_id, added
+
+    def rebuild(self):
+        """Rebuild the whole hierarchy from the database"""
+        self._moved = False
+        levels = self._empty_levels()
+        max_id, added = self._load(levels)
+        with self._lock:
+            self._levels = levels
+            self._max_id = max_id
+            self._count = added
+            self._stale = False
+            self._checked_at = time()
+            self.built_at = self._checked_at
+
+    def sync(self, force=False):
+        """Bring the hierarchy up to date with the accidents table.
+
+        New rows are merged incrementally; a shrinking row count (deletes,
+        including soft-deleted import batches) triggers a full rebuild.
+        """
+        if self._levels is None:
+            self.rebuild()
+            return
+        if not (force or self._stale or time() - self._checked_at > SYNC_INTERVAL):
+            return
+
+        with self._lock:
+            max_id, total = db.session.query(
+                db.func.max(Accident.id), db.func.count(Accident.id)
+            ).filter(
+                Accident.lat.isnot(None), Accident.lng.isnot(None), Accident.visible()
+            ).one()
+            max_id = max_id or 0
+            if max_id > self._max_id:
+                new_max, added = self._load(self._levels, self._max_id)
+                self._max_id = new_max
+                self._count += added
+            if total != self._count or self._moved:
+                self.rebuild()
+                return
+            self._stale = False
+            self._checked_at = time()
+
+    # ----------------------------------------------------------------
+    # Queries
+    # ----------------------------------------------------------------
+
+    def get_clusters(self, min_lat, min_lng, max_lat, max_lng, zoom):
+        """Return clusters intersecting the bbox at the given zoom"""
+        self.sync()
+        zoom = max(0, min(int(zoom), MAX_ZOOM))
+
+        x0, y1 = _project(min_lat, min_lng)
+        x1, y0 = _project(max_lat, max_lng)
+        cx0, cx1 = _cell(x0, zoom), _cell(x1, zoom)
+        cy0, cy1 = _cell(y0, zoom), _cell(y1, zoom)
+
+        with self._lock:
+            level = self._levels[zoom]
+            span = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+            if span < len(level):
+                keys = (
+                    (cx, cy)
+                    for cx in range(cx0, cx1 + 1)
+                    for cy in range(cy0, cy1 + 1)
+                    if (cx, cy) in level
+                )
+            else:
+                keys = (
+                    k for k in level
+                    if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1
+                )
+
+            out = []
+            for key in keys:
+                count, sx, sy, severities, point_id = level[key]
+                lat, lng = _unproject(sx / count, sy / count)
+                item = {
+                    'id': f"{zoom}/{key[0]}/{key[1]}",
+                    'lat': round(lat, 6),
+                    'lng': round(lng, 6),
+                    'count': count,
+                    'severity': dict(severities),
+                }
+                if point_id is not None:
+                    item['accident_id'] = point_id
+                out.append(item)
+                if len(out) >= MAX_CLUSTERS:
+                    break
+        return out
+
+    def stats(self):
+        return {
+            'points': self._count,
+            'max_id': self._max_id,
+            'built_at': self.built_at,
+        }
+
+
+# Global index shared by request threads
+cluster_index = ClusterIndex()
@@ -9,7 +9,7 @@ def create_government_user():
         email = "admin@traffic.gov.tn"
         password = secrets.token_urlsafe(12)
         user = User(
-            name="Government Admin",
+            full_name="Government Admin",
             email=email,
             password_hash=generate_password_hash(password),
             role="government",
@@ -0,0 +1,176 @@
+"""
+Timestamp Parsing
+=================
+Fast parsing of the occurred_at column of imported files
+
+The column's format is sniffed once per file from a sample of values
+(sniff_format) and compiled into a single regex-based parser
+(compile_parser). TimestampParser memoizes repeated strings and sends
+only the values the sniffed format rejects through the slow chain
+(parse_occurred: ISO, every known format, then python-dateutil).
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+ISO = 'iso'
+
+# Candidate formats, in the order ties are broken while sniffing
+KNOWN_FORMATS = (
+    ISO,
+    "%Y-%m-%d at %I:%M%p",
+    "%Y-%m-%d %I:%M%p",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y %I:%M%p",
+)
+
+# Values examined when sniffing a column
+SNIFF_SAMPLE = 200
+
+# Memoized strings per parser before the memo is reset
+MEMO_SIZE = 100000
+
+_DIRECTIVES = {
+    'Y': r'(?P<Y>\d{4})',
+    'm': r'(?P<m>\d{1,2})',
+    'd': r'(?P<d>\d{1,2})',
+    'H': r'(?P<H>\d{1,2})',
+    'I': r'(?P<I>\d{1,2})',
+    'M': r'(?P<M>\d{1,2})',
+    'S': r'(?P<S>\d{1,2})',
+    'p': r'(?P<p>[ap]m)',
+}
+
+
+def parse_occurred(s):
+    """Parse an occurred_at cell without knowing its format (slow path).
+
+    Accept ISO first, then common CSV formats, then fall back to
+    python-dateutil if available. This lets imports accept values like
+    '2015-10-22 at 06:07PM' which appear in provided CSVs.
+    """
+    if not s:
+        raise ValueError('Empty occurred_at')
+    try:
+        return datetime.fromisoformat(s)
+    except Exception:
+        pass
+    for f in KNOWN_FORMATS[1:]:
+        try:
+            return datetime.strptime(s, f)
+        except Exception:
+            continue
+    try:
+        from dateutil import parser as _dp
+        return _dp.parse(s)
+    except Exception:
+        raise ValueError(f"Invalid isoformat string: '{s}'")
+
+
+def _parse_iso(s):
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return None
+
+
+def compile_parser(fmt):
+    """Compile a strptime-style format into a function returning datetime or None.
+
+    Supports %Y %m %d %H %I %M %S %p; whitespace in the format matches any
+    run of whitespace and %p is case-insensitive, as with strptime.
+    """
+    if fmt == ISO:
+        return _parse_iso
+
+    pattern = []
+    for literal, directive in re.findall(r'([^%]*)(?:%(.))?', fmt):
+        pattern.append(r'\s+'.join(re.escape(part) for part in literal.split(' ')))
+        if directive:
+            if directive not in _DIRECTIVES:
+                raise ValueError(f"Unsupported directive %{directive} in {fmt!r}")
+            pattern.append(_DIRECTIVES[directive])
+    regex = re.compile(''.join(pattern), re.IGNORECASE)
+    match = regex.fullmatch
+    # Positions of each field in m.groups(); -1 when the format lacks it
+    idx = {name: regex.groupindex.get(name, 0) - 1 for name in _DIRECTIVES}
+    iY, im, id_, iM, iS = idx['Y'], idx['m'], idx['d'], idx['M'], idx['S']
+    twelve_hour = idx['I'] >= 0
+    iH = idx['I'] if twelve_hour else idx['H']
+    ip = idx['p']
+
+    def parse(s):
+        m = match(s)
+        if m is None:
+            return None
+        g = m.groups()
+        hour = int(g[iH]) if iH >= 0 else 0
+        if twelve_hour:
+            hour = hour % 12 + (12 if g[ip][0] in 'pP' else 0)
+        try:
+            return datetime(int(g[iY]), int(g[im]), int(g[id_]), hour,
+                            int(g[iM]) if iM >= 0 else 0, int(g[iS]) if iS >= 0 else 0)
+        except ValueError:
+            return None
+
+    return parse
+
+
+def sniff_format(values, sample=SNIFF_SAMPLE):
+    """Pick the known format parsing the most of the first ``sample`` values.
+
+    Returns None when no format parses any of them.
+    """
+    values = [v.strip() for v in values[:sample] if v and v.strip()]
+    best, best_hits = None, 0
+    for fmt in KNOWN_FORMATS:
+        parse = compile_parser(fmt)
+        hits = sum(1 for v in values if parse(v) is not None)
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+class TimestampParser:
+    """Callable parser for one column: sniffed fast path, memo, slow fallback"""
+
+    def __init__(self, fmt=None):
+        self.format = fmt
+        self._fast = compile_parser(fmt) if fmt else None
+        self._memo = {}
+        # Values the sniffed format rejected
+        self.outliers = 0
+
+    def __call__(self, s):
+        value = self._memo.get(s)
+        if value is None:
+            value = self._parse(s)
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[s] = value
+        if value.__class__ is str:
+            # A fresh error each time: re-raising a cached one would grow its
+            # traceback, and with it every caller frame it holds
+            raise ValueError(value)
+        return value
+
+    def _parse(self, s):
+        text = s.strip()
+        value = self._fast(text) if self._fast else None
+        if value is not None:
+            return value
+        self.outliers += 1
+        try:
+            return parse_occurred(text)
+        except ValueError as e:
+            # Memoized as the message, see __call__
+            return str(e)
+
+
+@lru_cache(maxsize=16)
+def timestamp_parser(fmt=None):
+    """Shared parser per format, so its memo carries across chunks and jobs"""
+    return TimestampParser(fmt)
@@ -0,0 +1,188 @@
+"""
+Import Deduplication
+====================
+Content hashes for imported accidents and a Bloom filter over the stored ones
+
+Every imported row carries ``content_hash`` over (occurred_at, location,
+severity, cause, delegation), with a unique index on the column. Inserts
+skip rows whose hash already exists (ON CONFLICT DO NOTHING), so
+re-uploading an overlapping extract is idempotent.
+
+The in-memory Bloom filter answers "definitely new" for most rows. Only
+rows it flags as possibly present are checked with one bulk
+``content_hash IN (...)`` query per chunk, so hashing 1M fresh rows does
+not cost 1M index probes up front. The unique index remains the source
+of truth: the filter only saves work and never decides on its own.
+"""
+
+import hashlib
+import math
+import threading
+
+from extensions import db
+from models.accident import Accident
+from utils.text import fold
+
+# Target false-positive rate of the filter
+FALSE_POSITIVE_RATE = 0.01
+
+# Minimum capacity; the filter is rebuilt larger when it fills up
+MIN_CAPACITY = 1 << 20
+
+
+def content_hash(occurred_at, location, severity, cause=None, delegation=None):
+    """Stable 128-bit hex digest of an accident's identifying fields"""
+    parts = (
+        occurred_at.isoformat(timespec='seconds') if occurred_at else '',
+        fold(location),
+        (severity or '').lower(),
+        fold(cause),
+        fold(delegation),
+    )
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex digests (double hashing on the digest)"""
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest):
+        h1 = int(digest[:16], 16)
+        h2 = int(digest[16:32], 16) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, digest):
+        bits = self.bits
+        for pos in self._positions(digest):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        bits = self.bits
+        for pos in self._positions(digest):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class ContentIndex:
+    """Process-wide Bloom filter of stored content hashes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+
+    def mark_stale(self):
+        """Reload from the database on next use (after deletes)"""
+        self._bloom = None
+
+    def _load(self):
+        total = db.session.query(db.func.count(Accident.id)).filter(
+            Accident.content_hash.isnot(None)
+        ).scalar() or 0
+        bloom = BloomFilter(max(MIN_CAPACITY, total * 2))
+        query = db.session.query(Accident.content_hash).filter(
+            Accident.content_hash.isnot(None)
+        ).execution_options(yield_per=10000)
+        for (digest,) in query:
+            bloom.add(digest)
+        return bloom
+
+    def _filter(self):
+        bloom = self._bloom
+        if bloom is None or bloom.count >= bloom.capacity:
+            with self._lock:
+                if self._bloom is None or self._bloom.count >= self._bloom.capacity:
+                    self._bloom = self._load()
+                bloom = self._bloom
+        return bloom
+
+    def partition(self, records):
+        """Split records into (to_insert, duplicates).
+
+        Duplicates are rows already stored or repeated earlier in the same
+        list. One IN query checks the rows the filter flags as possible hits.
+        """
+        bloom = self._filter()
+        seen = set()
+        fresh = []
+        maybe = []
+        duplicates = []
+        for rec in records:
+            digest = rec['content_hash']
+            if digest in seen:
+                duplicates.append(rec)
+                continue
+            seen.add(digest)
+            (maybe if digest in bloom else fresh).append(rec)
+
+        if maybe:
+            stored = set()
+            digests = [rec['content_hash'] for rec in maybe]
+            for i in range(0, len(digests), 500):
+                stored.update(h for (h,) in db.session.query(Accident.content_hash).filter(
+                    Accident.content_hash.in_(digests[i:i + 500])
+                ))
+            for rec in maybe:
+                (duplicates if rec['content_hash'] in stored else fresh).append(rec)
+        return fresh, duplicates
+
+    def add(self, digests):
+        """Record hashes of rows just committed"""
+        bloom = self._bloom
+        if bloom is None:
+            return
+        for digest in digests:
+            bloom.add(digest)
+
+
+def backfill_content_hashes(chunk_size=5000):
+    """Hash imported rows stored before content hashes existed.
+
+    Rows whose hash is already taken (earlier duplicates) keep NULL so the
+    unique index holds. Returns (hashed, duplicates).
+    """
+    hashed = duplicates = 0
+    last_id = 0
+    while True:
+        rows = Accident.query.filter(
+            Accident.id > last_id,
+            Accident.content_hash.is_(None),
+            Accident.batch_id.isnot(None),
+        ).order_by(Accident.id).limit(chunk_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        digests = {}
+        for a in rows:
+            digest = content_hash(a.occurred_at, a.location, a.severity, a.cause, a.delegation)
+            if digest in digests:
+                duplicates += 1
+            else:
+                digests[digest] = a
+        stored = set()
+        keys = list(digests)
+        for i in range(0, len(keys), 500):
+            stored.update(h for (h,) in db.session.query(Accident.content_hash).filter(
+                Accident.content_hash.in_(keys[i:i + 500])
+            ))
+        for digest, a in digests.items():
+            if digest in stored:
+                duplicates += 1
+            else:
+                a.content_hash = digest
+                hashed += 1
+        db.session.commit()
+    content_index.mark_stale()
+    return hashed, duplicates
+
+
+# Global filter shared by import threads
+content_index = ContentIndex()
@@ -0,0 +1,157 @@
+"""
+Duplicate Reports
+=================
+Group pending citizen reports that likely describe the same crash
+
+Several witnesses often report one crash with slightly different
+locations and times. When a report is submitted, ``assign_cluster()``
+looks up its candidates:
+
+- pending reports in the same delegation, within DUPLICATE_WINDOW of the
+  report's date and with the same severity
+- visible accidents in the same delegation within DUPLICATE_WINDOW whose
+  severity is equivalent (imports use low/medium/high)
+
+Both lookups are range scans of a (delegation, date) index, so they read
+one bucket (a delegation over an hour) whatever the size of the queue.
+Coordinates only rule a candidate out: when both sides have them they
+must lie within DUPLICATE_RADIUS_KM.
+
+Matching reports share ``duplicate_cluster_id``, the id of the cluster's
+first report; a report matching two clusters merges them. Every cluster
+stays within DUPLICATE_WINDOW of its first report, so matches cannot
+chain across separate crashes. The nearest
+accident in time is stored as ``duplicate_accident_id``, so moderators can
+link the whole cluster to it instead of creating another accident.
+"""
+
+from datetime import timedelta
+
+from extensions import db
+from models.accident import Accident
+from models.accident_report import AccidentReport
+from utils.geo import haversine_km
+
+# Reports this close in time (either way) are candidates
+DUPLICATE_WINDOW = timedelta(minutes=30)
+
+# Candidates with coordinates further apart than this are different crashes
+DUPLICATE_RADIUS_KM = 2.0
+
+# Report severity -> accident severity of imported data
+SEVERITY_EQUIVALENTS = {
+    'minor': 'low',
+    'moderate': 'medium',
+    'severe': 'high',
+    'fatal': 'high',
+}
+
+
+def _severity(value):
+    return (value or '').strip().lower()
+
+
+def severity_matches(report_severity, accident_severity):
+    """Whether a report and an accident severity describe the same thing"""
+    report_severity = _severity(report_severity)
+    accident_severity = _severity(accident_severity)
+    return accident_severity in (report_severity, SEVERITY_EQUIVALENTS.get(report_severity))
+
+
+def _near(report, lat, lng):
+    if None in (report.lat, report.lng, lat, lng):
+        return True
+    return haversine_km(report.lat, report.lng, lat, lng) <= DUPLICATE_RADIUS_KM
+
+
+def find_duplicates(report):
+    """(pending reports, accidents) that likely describe ``report``'s crash"""
+    start, end = report.date - DUPLICATE_WINDOW, report.date + DUPLICATE_WINDOW
+    severity = _severity(report.severity)
+
+    reports = [
+        r for r in AccidentReport.query.filter(
+            AccidentReport.delegation == report.delegation,
+            AccidentReport.date.between(start, end),
+            AccidentReport.status == 'PENDING',
+            AccidentReport.id != report.id,
+        ).all()
+        if _severity(r.severity) == severity and _near(report, r.lat, r.lng)
+    ]
+    accidents = [
+        a for a in Accident.query.filter(
+            Accident.delegation == report.delegation,
+            Accident.occurred_at.between(start, end),
+            Accident.visible(),
+        ).all()
+        if severity_matches(severity, a.severity) and _near(report, a.lat, a.lng)
+    ]
+    return reports, accidents
+
+
+def _anchor_dates(reports):
+    """{cluster key: date of the cluster's first report} of candidate reports.
+
+    The key is the cluster id, or the report's own id when it has none.
+    """
+    anchors = {r.id: r.date for r in reports if not r.duplicate_cluster_id}
+    clusters = {r.duplicate_cluster_id for r in reports if r.duplicate_cluster_id}
+    if clusters:
+        anchors.update(db.session.query(AccidentReport.id, AccidentReport.date).filter(
+            AccidentReport.id.in_(clusters)
+        ).all())
+    return anchors
+
+
+def assign_cluster(report):
+    """Attach a flushed ``report`` to the cluster of its likely duplicates.
+
+    A cluster spans at most DUPLICATE_WINDOW either side of its first
+    report: the report joins (and folds together) only clusters whose
+    first report is that close to it and to each other, so reports
+    minutes apart cannot chain two crashes into one cluster.
+
+    Returns the cluster id, or None when nothing matched. The caller
+    commits.
+    """
+    reports, accidents = find_duplicates(report)
+    if accidents:
+        nearest = min(accidents, key=lambda a: abs(a.occurred_at - report.date))
+        report.duplicate_accident_id = nearest.id
+
+    anchors = _anchor_dates(reports)
+    joinable = sorted(key for key, date in anchors.items() if abs(date - report.date) <= DUPLICATE_WINDOW)
+    if joinable:
+        # The oldest cluster wins; others fold in when the span allows it
+        first = anchors[joinable[0]]
+        joinable = [key for key in joinable if abs(anchors[key] - first) <= DUPLICATE_WINDOW]
+    reports = [r for r in reports if (r.duplicate_cluster_id or r.id) in joinable]
+    if not reports:
+        # A lone report near an accident still forms a cluster of one
+        if accidents:
+            report.duplicate_cluster_id = report.id
+        return report.duplicate_cluster_id
+
+    cluster_id = min(joinable)
+    clusters = {r.duplicate_cluster_id for r in reports if r.duplicate_cluster_id}
+    if clusters - {cluster_id}:
+        # The report bridges clusters: fold them into one
+        AccidentReport.query.filter(
+            AccidentReport.duplicate_cluster_id.in_(clusters - {cluster_id})
+        ).update({'duplicate_cluster_id': cluster_id}, synchronize_session=False)
+    for r in reports:
+        r.duplicate_cluster_id = cluster_id
+        if report.duplicate_accident_id and not r.duplicate_accident_id:
+            r.duplicate_accident_id = report.duplicate_accident_id
+    report.duplicate_cluster_id = cluster_id
+    if not report.duplicate_accident_id:
+        report.duplicate_accident_id = next((r.duplicate_accident_id for r in reports if r.duplicate_accident_id), None)
+    return cluster_id
+
+
+def cluster_members(cluster_id):
+    """Query of a cluster's pending reports, oldest first"""
+    return AccidentReport.query.filter(
+        AccidentReport.duplicate_cluster_id == cluster_id,
+        AccidentReport.status == 'PENDING',
+    ).order_by(AccidentReport.date, AccidentReport.id)
@@ -6,7 +6,7 @@ Send email notifications to users
 
 import os
 from threading import Thread
-from flask import current_app, render_template_string
+from flask import current_app
 
 
 # Email templates
@@ -86,6 +86,24 @@ You can now:
 
 Login here: {{ login_url }}
 
+Best regards,
+Traffic Accident System
+'''
+    },
+    'scheduled_report': {
+        'subject': '{{ report_name }} - {{ date }}',
+        'body': '''
+Hello,
+
+The scheduled report "{{ report_name }}" has been generated.
+
+Records: {{ rows }}
+{% if attached %}
+The report is attached ({{ filename }}).
+{% else %}
+Download it here: {{ download_url }}
+{% endif %}
+
 Best regards,
 Traffic Accident System
 '''
@@ -114,6 +132,7 @@ class EmailService:
     def __init__(self, app=None):
         self.app = app
         self.enabled = False
+        self._compiled = {}
         
         if app:
             self.init_app(app)
@@ -134,23 +153,29 @@ class EmailService:
         if not self.enabled:
             print("Email service disabled: SMTP_USER and SMTP_PASSWORD not configured")
     
-    def send_email(self, to_email, subject, body, html_body=None):
-        """Send an email (async by default)"""
+    def send_email(self, to_email, subject, body, html_body=None, attachments=None):
+        """Send an email (async by default)
+
+        ``attachments`` is a list of (filename, path) pairs.
+        """
         if not self.enabled:
             print(f"[EMAIL DEMO] To: {to_email}, Subject: {subject}")
             print(f"Body: {body[:200]}...")
+            for filename, _ in attachments or []:
+                print(f"Attachment: {filename}")
             return True
         
         # Send in background thread
         thread = Thread(target=self._send_email_sync, 
-                       args=(to_email, subject, body, html_body))
+                       args=(to_email, subject, body, html_body, attachments))
         thread.start()
         return True
     
-    def _send_email_sync(self, to_email, subject, body, html_body=None):
+    def _send_email_sync(self, to_email, subject, body, html_body=None, attachments=None):
         """Synchronous email sending"""
         try:
             import smtplib
+            from email.mime.application import MIMEApplication
             from email.mime.text import MIMEText
             from email.mime.multipart import MIMEMultipart
             
@@ -166,6 +191,19 @@ class EmailService:
             if html_body:
                 msg.attach(MIMEText(html_body, 'html'))
             
+            # Files go next to the text parts in a mixed container
+            if attachments:
+                mixed = MIMEMultipart('mixed')
+                for header in ('Subject', 'From', 'To'):
+                    mixed[header] = msg[header]
+                mixed.attach(msg)
+                for filename, path in attachments:
+                    with open(path, 'rb') as f:
+                        part = MIMEApplication(f.read())
+                    part.add_header('Content-Disposition', 'attachment', filename=filename)
+                    mixed.attach(part)
+                msg = mixed
+            
             # Connect and send
             with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
                 server.starttls()
@@ -179,17 +217,65 @@ class EmailService:
             print(f"Email error: {e}")
             return False
     
-    def send_template(self, to_email, template_name, **context):
+    def send_bulk(self, messages):
+        """Send (to_email, subject, body) messages over one SMTP connection.
+
+        Runs on a single background thread, for notifications produced in
+        bulk where one thread and one connection per message would not do.
+        """
+        messages = list(messages)
+        if not self.enabled:
+            for to_email, subject, _ in messages:
+                print(f"[EMAIL DEMO] To: {to_email}, Subject: {subject}")
+            return True
+        if messages:
+            Thread(target=self._send_bulk_sync, args=(messages,), daemon=True).start()
+        return True
+
+    def _send_bulk_sync(self, messages):
+        try:
+            import smtplib
+            from email.mime.text import MIMEText
+
+            sent = 0
+            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+                server.starttls()
+                server.login(self.smtp_user, self.smtp_password)
+                for to_email, subject, body in messages:
+                    msg = MIMEText(body, 'plain')
+                    msg['Subject'] = subject
+                    msg['From'] = self.from_email
+                    msg['To'] = to_email
+                    try:
+                        server.sendmail(self.from_email, to_email, msg.as_string())
+                        sent += 1
+                    except smtplib.SMTPRecipientsRefused as e:
+                        print(f"Email error for {to_email}: {e}")
+
+            print(f"Bulk email: {sent}/{len(messages)} sent")
+            return sent
+
+        except Exception as e:
+            print(f"Bulk email error: {e}")
+            return 0
+
+    def render_template(self, template_name, **context):
+        """(subject, body) of a template"""
+        compiled = self._compiled.get(template_name)
+        if compiled is None:
+            template = TEMPLATES.get(template_name)
+            if not template:
+                raise ValueError(f"Unknown template: {template_name}")
+            # Compiled once: bulk notifications render the same template many times
+            env = current_app.jinja_env
+            compiled = (env.from_string(template['subject']), env.from_string(template['body']))
+            self._compiled[template_name] = compiled
+        return compiled[0].render(**context), compiled[1].render(**context)
+
+    def send_template(self, to_email, template_name, attachments=None, **context):
         """Send email using a template"""
-        template = TEMPLATES.get(template_name)
-        if not template:
-            raise ValueError(f"Unknown template: {template_name}")
-        
-        # Render subject and body
-        subject = render_template_string(template['subject'], **context)
-        body = render_template_string(template['body'], **context)
-        
-        return self.send_email(to_email, subject, body)
+        subject, body = self.render_template(template_name, **context)
+        return self.send_email(to_email, subject, body, attachments=attachments)
     
     def send_report_status_change(self, to_email, name, report_id, status, message=None, report_url=None):
         """Send report status change notification"""
@@ -1,13 +1,196 @@
 """
 Data Export Service
 ===================
-Export data in various formats (CSV, Excel, PDF)
+Export data in various formats (CSV, Excel, PDF, Parquet, Arrow)
+
+CSV exports stream: rows are fetched STREAM_CHUNK at a time from a
+server-side cursor (``yield_per``) and written to the response as they
+come, optionally gzip-compressed on the fly, so memory stays flat however
+many rows match. XLSX exports are written in openpyxl write-only mode
+to a spooled temporary file, splitting into sheets past Excel's row limit.
+PDFs are laid out one page-sized table at a time in a worker process,
+optionally after a summary of charts and aggregates. Parquet and Arrow
+IPC exports (optional, need pyarrow) keep the column types and are built
+in record batches from the same kind of cursor.
 """
 
 import io
 import csv
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from flask import Response, send_file
+from flask import Response, request, send_file, stream_with_context
+
+from extensions import db
+from models.accident import Accident
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip and written per chunk of a streamed body
+STREAM_CHUNK = 2000
+
+# zlib level for streamed gzip: fast, most of the gain of level 9 on CSV
+GZIP_LEVEL = 6
+
+# Data rows per worksheet: Excel's 1,048,576 rows minus the header
+XLSX_MAX_ROWS = 1048575
+
+# Rows sampled to size the XLSX columns
+WIDTH_SAMPLE = 500
+
+# XLSX exports are spooled in memory up to this size, then to disk
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Detail rows per PDF table: one landscape page at the detail font size
+PDF_ROWS_PER_TABLE = 20
+
+# Detail rows in a PDF (full export) and after a summary (summary mode)
+PDF_MAX_ROWS = 20000
+PDF_SUMMARY_ROWS = 500
+
+# Rows per Arrow record batch (built from Python values, so kept small)
+COLUMNAR_BATCH_ROWS = 16 * 1024
+
+# Rows per Parquet row group, assembled from record batches
+PARQUET_ROW_GROUP_ROWS = 128 * 1024
+
+PARQUET_COMPRESSION = 'zstd'
+
+# Processes rendering PDFs (0 renders in the request thread)
+PDF_WORKERS = min(2, os.cpu_count() or 1)
+
+_pdf_pool = None
+_pdf_workers = PDF_WORKERS
+_pdf_lock = threading.Lock()
+
+
+def _minutes(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+# (header, Accident attribute, cell formatter) of the accident exports
+ACCIDENT_EXPORT_COLUMNS = (
+    ('ID', 'id', None),
+    ('Date', 'occurred_at', _minutes),
+    ('Location', 'location', None),
+    ('Governorate', 'governorate', None),
+    ('Delegation', 'delegation', None),
+    ('Severity', 'severity', None),
+    ('Cause', 'cause', None),
+    ('Source', 'source', None),
+    ('Created At', 'created_at', _minutes),
+)
+
+ACCIDENT_EXPORT_HEADERS = [header for header, _, _ in ACCIDENT_EXPORT_COLUMNS]
+
+# (column, Accident attribute, Arrow type) of the Parquet and Arrow exports:
+# typed columns for dataframes, low-cardinality text dictionary-encoded
+ACCIDENT_COLUMNAR_COLUMNS = (
+    ('id', 'id', 'int64'),
+    ('occurred_at', 'occurred_at', 'timestamp'),
+    ('location', 'location', 'string'),
+    ('governorate', 'governorate', 'category'),
+    ('delegation', 'delegation', 'category'),
+    ('severity', 'severity', 'category'),
+    ('cause', 'cause', 'category'),
+    ('lat', 'lat', 'float64'),
+    ('lng', 'lng', 'float64'),
+    ('source', 'source', 'category'),
+    ('created_at', 'created_at', 'timestamp'),
+)
+
+# Columnar format -> (file suffix, mimetype)
+COLUMNAR_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def iter_csv(rows, headers=None, chunk_rows=STREAM_CHUNK):
+    """Yield CSV text in chunks of ``chunk_rows`` rows (sequences)"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if headers:
+        writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    tail = buf.getvalue()
+    if tail:
+        yield tail
+
+
+def iter_gzip(chunks, level=GZIP_LEVEL):
+    """Encode text chunks as UTF-8 and gzip them incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def gzip_mode():
+    """How the current request wants a streamed export compressed.
+
+    'file' for ``?gzip=1`` (a .csv.gz download), 'encoding' when the
+    client accepts ``Content-Encoding: gzip``, else None.
+    """
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        return 'file'
+    if request.accept_encodings['gzip']:
+        return 'encoding'
+    return None
+
+
+def stream_csv(rows, filename, headers=None, compress=None):
+    """Stream ``rows`` as a CSV attachment.
+
+    ``rows`` is any iterable, typically a generator over a yield_per
+    query; it is consumed while the response is sent, inside the request
+    context. ``compress`` is a gzip_mode() value.
+    """
+    body = iter_csv(rows, headers)
+    mimetype = 'text/csv'
+    extra = {}
+    if compress == 'file':
+        body = iter_gzip(body)
+        filename = filename + '.gz'
+        mimetype = 'application/gzip'
+    elif compress == 'encoding':
+        body = iter_gzip(body)
+        extra = {'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    else:
+        body = (chunk.encode('utf-8') for chunk in body)
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}', **extra},
+    )
+
+
+def iter_accident_rows(query, columns=ACCIDENT_EXPORT_COLUMNS, chunk_rows=STREAM_CHUNK):
+    """Yield export rows of an Accident query through a server-side cursor.
+
+    Only the exported columns are selected, as plain tuples, never ORM
+    objects.
+    """
+    selected = query.with_entities(*[getattr(Accident, attr) for _, attr, _ in columns])
+    formatters = [fmt for _, _, fmt in columns]
+    for values in selected.execution_options(yield_per=chunk_rows):
+        yield [
+            (fmt(value) if fmt else ('' if value is None else value))
+            for fmt, value in zip(formatters, values)
+        ]
 
 
 def export_to_csv(data, filename, headers=None):
@@ -20,45 +203,164 @@ def export_to_csv(data, filename, headers=None):
         headers: Optional list of headers (required if data is list of lists)
     
     Returns:
-        Flask Response with CSV file
+        Flask Response streaming the CSV file
     """
-    # Build CSV text in memory and return as an attachment using send_file
-    output = io.StringIO()
-
-    if data and isinstance(data[0], dict):
+    if data and isinstance(data, list) and isinstance(data[0], dict):
         # Dict data - use keys as headers
         if not headers:
             headers = list(data[0].keys())
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(data)
+        rows = ([row.get(h, '') for h in headers] for row in data)
     else:
-        # List data
-        writer = csv.writer(output)
+        rows = data
+    return stream_csv(rows, filename, headers)
+
+
+def _xlsx_styles(wb):
+    """Register the shared named styles of an export workbook"""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    header = NamedStyle(name='export_header')
+    header.font = Font(bold=True, color='FFFFFF')
+    header.fill = PatternFill(start_color='3B82F6', end_color='3B82F6', fill_type='solid')
+    header.alignment = Alignment(horizontal='center', vertical='center')
+    thin = Side(style='thin')
+    header.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    wb.add_named_style(header)
+
+
+def _sheet_title(name, index):
+    # Excel caps titles at 31 characters; later sheets get a " (n)" suffix
+    if index == 1:
+        return name[:31]
+    suffix = f" ({index})"
+    return name[:31 - len(suffix)].rstrip() + suffix
+
+
+def _append_sheet(wb, rows, headers, sheet_name, max_rows):
+    """Add ``rows`` to a write-only workbook as one or more sheets; returns the row count"""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    rows = iter(rows)
+    sample = []
+    for row in rows:
+        sample.append(row)
+        if len(sample) >= WIDTH_SAMPLE:
+            break
+    widths = [len(str(h)) for h in headers or []]
+    for row in sample:
+        for i, value in enumerate(row):
+            length = len(str(value)) if value is not None else 0
+            if i >= len(widths):
+                widths.append(length)
+            elif length > widths[i]:
+                widths[i] = length
+
+    def new_sheet(index):
+        ws = wb.create_sheet(_sheet_title(sheet_name, index))
+        # Write-only sheets take dimensions before the first row only
+        for i, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min(width + 2, 50)
         if headers:
-            writer.writerow(headers)
-        writer.writerows(data)
+            cells = []
+            for h in headers:
+                cell = WriteOnlyCell(ws, value=h)
+                cell.style = 'export_header'
+                cells.append(cell)
+            ws.append(cells)
+        return ws
+
+    sheets = 1
+    ws = new_sheet(sheets)
+    on_sheet = 0
+    total = 0
+    for row in itertools.chain(sample, rows):
+        if on_sheet >= max_rows:
+            sheets += 1
+            ws = new_sheet(sheets)
+            on_sheet = 0
+        ws.append(row)
+        on_sheet += 1
+        total += 1
+    return total
+
 
-    # Convert text to bytes for send_file
-    output_bytes = io.BytesIO()
-    output_bytes.write(output.getvalue().encode('utf-8'))
-    output_bytes.seek(0)
-    output.close()
+def write_xlsx(rows, fileobj, headers=None, sheet_name='Data', max_rows=XLSX_MAX_ROWS):
+    """Write rows (sequences) to ``fileobj`` as .xlsx in openpyxl write-only mode.
 
+    Column widths come from the header and the first WIDTH_SAMPLE rows.
+    Past ``max_rows`` data rows, output continues on a new sheet with the
+    header repeated. Returns the number of rows written.
+    """
+    return write_xlsx_sheets([(sheet_name, headers, rows)], fileobj, max_rows)
+
+
+def write_xlsx_sheets(sheets, fileobj, max_rows=XLSX_MAX_ROWS):
+    """Write ``(sheet_name, headers, rows)`` triples to ``fileobj`` as one .xlsx.
+
+    Sheet names must be distinct. Returns the total number of rows written.
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    _xlsx_styles(wb)
+    total = 0
+    for sheet_name, headers, rows in sheets:
+        total += _append_sheet(wb, rows, headers, sheet_name, max_rows)
+    wb.save(fileobj)
+    return total
+
+
+def stream_xlsx(rows, filename, headers=None, sheet_name='Data'):
+    """Write rows to a spooled temporary .xlsx file and send it.
+
+    Small workbooks stay in memory; past SPOOL_MAX_SIZE the file moves to
+    disk. The file is closed once the response is sent.
+    """
+    return stream_xlsx_sheets([(sheet_name, headers, rows)], filename)
+
+
+def stream_xlsx_sheets(sheets, filename):
+    """stream_xlsx() for a workbook of several ``(sheet_name, headers, rows)`` sheets"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        write_xlsx_sheets(sheets, spool)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
     return send_file(
-        output_bytes,
+        spool,
         as_attachment=True,
         download_name=filename,
-        mimetype='text/csv'
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
 
+def pivot_table(counts, row_values, column_values, corner=''):
+    """Cross-tab of ``counts`` ({(row, column): count}) with totals.
+
+    Returns (headers, rows) for the given row and column value orders:
+    one row per row value plus a Total column, then a Total row.
+    """
+    headers = [corner] + [str(v) for v in column_values] + ['Total']
+    rows = []
+    column_totals = [0] * len(column_values)
+    for row_value in row_values:
+        cells = [counts.get((row_value, col), 0) for col in column_values]
+        for i, count in enumerate(cells):
+            column_totals[i] += count
+        rows.append([str(row_value)] + cells + [sum(cells)])
+    rows.append(['Total'] + column_totals + [sum(column_totals)])
+    return headers, rows
+
+
 def export_to_excel(data, filename, headers=None, sheet_name='Data'):
     """
     Export data to Excel format.
     
     Args:
-        data: List of dicts or list of lists
+        data: List of dicts, list of lists or an iterable of lists
         filename: Output filename
         headers: Optional list of headers
         sheet_name: Excel sheet name
@@ -67,145 +369,161 @@ def export_to_excel(data, filename, headers=None, sheet_name='Data'):
         Flask Response with Excel file
     """
     try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        import openpyxl  # noqa: F401
     except ImportError:
         # Fallback to CSV if openpyxl not available
         return export_to_csv(data, filename.replace('.xlsx', '.csv'), headers)
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = sheet_name
-    
-    # Styles
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill = PatternFill(start_color='3B82F6', end_color='3B82F6', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center')
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
+
     # Get headers
-    if data and isinstance(data[0], dict):
+    if data and isinstance(data, list) and isinstance(data[0], dict):
         if not headers:
             headers = list(data[0].keys())
-        rows = [[row.get(h, '') for h in headers] for row in data]
+        rows = ([row.get(h, '') for h in headers] for row in data)
     else:
         rows = data
-    
-    # Write headers
-    if headers:
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-    
-    # Write data
-    start_row = 2 if headers else 1
-    for row_idx, row in enumerate(rows, start_row):
-        for col_idx, value in enumerate(row, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.border = thin_border
-    
-    # Auto-size columns
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[col_letter].width = min(max_length + 2, 50)
-    
-    # Save to bytes and return as attachment
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    return stream_xlsx(rows, filename, headers, sheet_name)
+
+
+def columnar_available():
+    """Whether pyarrow, needed by the Parquet and Arrow exports, is installed"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
 
+def _arrow_schema(columns):
+    import pyarrow as pa
 
-def export_to_pdf(data, filename, title='Report', headers=None):
+    types = {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us'),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema([pa.field(name, types[kind]) for name, _, kind in columns])
+
+
+def iter_record_batches(query, columns=ACCIDENT_COLUMNAR_COLUMNS, batch_rows=COLUMNAR_BATCH_ROWS):
+    """Yield Arrow record batches of an Accident query through a server-side cursor.
+
+    Each categorical column keeps one dictionary that only grows from
+    batch to batch, so the Arrow file stores it once plus deltas and
+    readers see a single category set.
     """
-    Export data to PDF format.
-    
-    Args:
-        data: List of dicts or list of lists
-        filename: Output filename
-        title: PDF title
-        headers: Optional list of headers
-    
-    Returns:
-        Flask Response with PDF file
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+    selected = query.with_entities(*[getattr(Accident, attr) for _, attr, _ in columns])
+    results = iter(selected.execution_options(yield_per=STREAM_CHUNK))
+    codes = [{} if kind == 'category' else None for _, _, kind in columns]
+    while True:
+        chunk = list(itertools.islice(results, batch_rows))
+        if not chunk:
+            return
+        arrays = []
+        for field, code, values in zip(schema, codes, zip(*chunk)):
+            if code is None:
+                arrays.append(pa.array(values, type=field.type))
+                continue
+            indices = [None if v is None else code.setdefault(v, len(code)) for v in values]
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(indices, type=pa.int32()), pa.array(list(code), type=pa.string())
+            ))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_columnar(fmt, batches, fileobj, columns=ACCIDENT_COLUMNAR_COLUMNS):
+    """Write record batches to ``fileobj`` as 'parquet' or 'arrow'.
+
+    Parquet is zstd-compressed, batches buffered into row groups of
+    PARQUET_ROW_GROUP_ROWS. The Arrow IPC file gets one record batch per
+    batch, uncompressed so readers can memory-map it. Returns the number
+    of rows written.
     """
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+    total = 0
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(fileobj, schema, compression=PARQUET_COMPRESSION)
+    elif fmt == 'arrow':
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        writer = pa.ipc.new_file(fileobj, schema, options=options)
+    else:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    with writer:
+        if fmt == 'arrow':
+            for batch in batches:
+                writer.write_batch(batch)
+                total += batch.num_rows
+            return total
+        pending = []
+        pending_rows = 0
+        for batch in batches:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= PARQUET_ROW_GROUP_ROWS:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=pending_rows)
+                total += pending_rows
+                pending, pending_rows = [], 0
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=pending_rows)
+            total += pending_rows
+    return total
+
+
+def stream_columnar(fmt, batches, filename, columns=ACCIDENT_COLUMNAR_COLUMNS):
+    """Write record batches to a spooled temporary file and send it"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import letter, landscape
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    except ImportError:
-        # Fallback to CSV if reportlab not available
-        return export_to_csv(data, filename.replace('.pdf', '.csv'), headers)
-    
-    output = io.BytesIO()
-    doc = SimpleDocTemplate(
-        output,
-        pagesize=landscape(letter),
-        rightMargin=30,
-        leftMargin=30,
-        topMargin=30,
-        bottomMargin=30
-    )
-    
-    elements = []
+        write_columnar(fmt, batches, spool, columns)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return send_file(spool, as_attachment=True, download_name=filename, mimetype=COLUMNAR_FORMATS[fmt][1])
+
+
+class _LazyFlowables(list):
+    """Flowable list for doc.build() filled from a generator on demand.
+
+    build() checks len() before taking each flowable, so only a couple of
+    tables exist at a time instead of the whole report.
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = iter(source)
+
+    def __len__(self):
+        while super().__len__() < 2 and self._source is not None:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return super().__len__()
+
+
+def _pdf_flowables(title, headers, rows, summary, note):
+    from reportlab.graphics.charts.barcharts import HorizontalBarChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import KeepTogether, PageBreak, Paragraph, Spacer, Table, TableStyle
+
     styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=20
-    )
-    elements.append(Paragraph(title, title_style))
-    
-    # Subtitle with date
-    subtitle = f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    elements.append(Paragraph(subtitle, styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Get headers and rows
-    if data and isinstance(data[0], dict):
-        if not headers:
-            headers = list(data[0].keys())
-        rows = [[row.get(h, '') for h in headers] for row in data]
-    else:
-        rows = data
-    
-    # Create table data
-    table_data = []
-    if headers:
-        table_data.append(headers)
-    table_data.extend(rows)
-    
-    # Create table
-    table = Table(table_data, repeatRows=1)
-    
-    # Table style
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=20)
+    yield Paragraph(title, title_style)
+    yield Paragraph(f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal'])
+    yield Spacer(1, 20)
+
+    blue = colors.HexColor('#3B82F6')
     style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+        ('BACKGROUND', (0, 0), (-1, 0), blue),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -220,13 +538,174 @@ def export_to_pdf(data, filename, title='Report', headers=None):
         ('TOPPADDING', (0, 1), (-1, -1), 6),
         ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
     ])
+
+    if summary:
+        for section, items in summary:
+            if not items:
+                continue
+            labels = [str(label) for label, _ in items]
+            values = [count for _, count in items]
+            height = 14 * len(items) + 20
+            drawing = Drawing(500, height)
+            chart = HorizontalBarChart()
+            chart.x, chart.y = 120, 10
+            chart.width, chart.height = 360, height - 20
+            # Largest first from the top
+            chart.data = [values[::-1]]
+            chart.categoryAxis.categoryNames = labels[::-1]
+            chart.categoryAxis.labels.fontSize = 7
+            chart.valueAxis.valueMin = 0
+            chart.valueAxis.labels.fontSize = 7
+            chart.bars[0].fillColor = blue
+            drawing.add(chart)
+            yield KeepTogether([
+                Paragraph(section, styles['Heading2']),
+                drawing,
+                Spacer(1, 6),
+                Table([['', 'Count']] + [[label, count] for label, count in items], repeatRows=1, style=style),
+                Spacer(1, 16),
+            ])
+        if rows:
+            yield PageBreak()
+            yield Paragraph('Details', styles['Heading2'])
+
+    if note:
+        yield Paragraph(note, styles['Italic'])
+        yield Spacer(1, 8)
+    # One page-sized table per chunk: each is laid out on its own, so
+    # layout cost grows linearly with the row count
+    for i in range(0, len(rows), PDF_ROWS_PER_TABLE):
+        chunk = rows[i:i + PDF_ROWS_PER_TABLE]
+        yield Table(([headers] if headers else []) + chunk, repeatRows=1 if headers else 0, style=style)
+
+
+def render_pdf(path, title, headers, rows, summary=None, note=None):
+    """Render a report to ``path``; pure function so it can run in a worker process.
+
+    ``summary`` is [(section title, [(label, count), ...]), ...], shown as
+    charts and tables before the detail rows.
+    """
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(
+        path,
+        pagesize=landscape(letter),
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30
+    )
+    doc.build(_LazyFlowables(_pdf_flowables(title, headers, rows, summary, note)))
+    return path
+
+
+def _pdf_executor():
+    global _pdf_pool, _pdf_workers
+    with _pdf_lock:
+        if _pdf_pool is None and _pdf_workers:
+            try:
+                _pdf_pool = ProcessPoolExecutor(max_workers=_pdf_workers)
+            except (OSError, NotImplementedError) as e:
+                # e.g. no /dev/shm in a sandbox: render in the request thread
+                logger.warning(f"PDF process pool unavailable: {e}")
+                _pdf_workers = 0
+        return _pdf_pool
+
+
+def render_pdf_file(title, headers, rows, summary=None, note=None, path=None):
+    """Render a report in the process pool to ``path`` (default: a temporary file).
+
+    Layout is CPU-bound pure Python: in the pool it does not hold the
+    request threads' GIL. Returns the path; the caller removes the file.
+    """
+    global _pdf_pool
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+    args = (path, title, headers, rows, summary, note)
+    try:
+        pool = _pdf_executor()
+        if pool is None:
+            return render_pdf(*args)
+        try:
+            return pool.submit(render_pdf, *args).result()
+        except BrokenProcessPool:
+            with _pdf_lock:
+                _pdf_pool = None
+            logger.warning("PDF worker process died; rendering inline")
+            return render_pdf(*args)
+    except Exception:
+        os.remove(path)
+        raise
+
+
+def accident_summary(query, top=15):
+    """Aggregates of an Accident query for a summary-first PDF.
+
+    Returns [(section title, [(label, count), ...]), ...], using the same
+    grouped queries as the stats endpoints.
+    """
+    count = db.func.count(Accident.id)
+    sections = []
+    for section, column in (('By severity', Accident.severity), ('By governorate', Accident.governorate),
+                            ('By cause', Accident.cause)):
+        rows = query.order_by(None).with_entities(column, count).group_by(column).order_by(count.desc()).limit(top).all()
+        sections.append((section, [((label or 'Unknown'), n) for label, n in rows]))
+    period = db.func.strftime('%Y-%m', Accident.occurred_at).label('period')
+    months = query.order_by(None).with_entities(period, count).group_by(period).order_by(period.desc()).limit(12).all()
+    sections.append(('Last 12 months', [(label, n) for label, n in reversed(months)]))
+    total = query.order_by(None).count()
+    sections.insert(0, ('Total', [('Accidents', total)]))
+    return sections
+
+
+def _pdf_rows(data, max_rows):
+    """First ``max_rows`` rows as lists, plus a note when rows were left out"""
+    if not max_rows:
+        return [], None
+    rows = [list(row) for row in itertools.islice(data or [], max_rows + 1)]
+    if len(rows) <= max_rows:
+        return rows, None
+    rows.pop()
+    return rows, f"Showing the first {max_rows:,} rows; export as CSV for the complete data."
+
+
+def export_to_pdf(data, filename, title='Report', headers=None, summary=None, max_rows=PDF_MAX_ROWS):
+    """
+    Export data to PDF format.
     
-    table.setStyle(style)
-    elements.append(table)
+    Args:
+        data: List of dicts, list of lists or an iterable of lists
+        filename: Output filename
+        title: PDF title
+        headers: Optional list of headers
+        summary: Optional sections from accident_summary(), shown first
+        max_rows: Detail rows kept; the rest are left to CSV exports
     
-    # Build PDF
-    doc.build(elements)
-    output.seek(0)
+    Returns:
+        Flask Response with PDF file
+    """
+    try:
+        import reportlab  # noqa: F401
+    except ImportError:
+        # Fallback to CSV if reportlab not available
+        return export_to_csv(data, filename.replace('.pdf', '.csv'), headers)
+
+    # Get headers and rows
+    if data and isinstance(data, list) and isinstance(data[0], dict):
+        if not headers:
+            headers = list(data[0].keys())
+        data = ([row.get(h, '') for h in headers] for row in data)
+    rows, note = _pdf_rows(data, max_rows)
+
+    path = render_pdf_file(title, headers, rows, summary, note)
+    # The open handle keeps the data readable after the unlink (POSIX)
+    output = open(path, 'rb')
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
     return send_file(
         output,
@@ -236,18 +715,71 @@ def export_to_pdf(data, filename, title='Report', headers=None):
     )
 
 
+def accident_export_query(filters):
+    """Accident query of the accident exports.
+
+    ``filters`` holds governorate, severity and ISO start_date/end_date;
+    unparseable dates are ignored.
+    """
+    query = Accident.query.filter(Accident.visible())
+    if filters.get('governorate'):
+        query = query.filter(Accident.governorate == filters['governorate'])
+    if filters.get('severity'):
+        query = query.filter(Accident.severity == filters['severity'])
+    for key, op in (('start_date', '__ge__'), ('end_date', '__le__')):
+        if filters.get(key):
+            try:
+                query = query.filter(getattr(Accident.occurred_at, op)(datetime.fromisoformat(filters[key])))
+            except ValueError:
+                pass
+    return query.order_by(Accident.occurred_at.desc())
+
+
+def write_accident_export(fmt, query, path, gzip=False, summary=False, details=True):
+    """Write an accident export ('csv', 'excel', 'pdf', 'parquet' or 'arrow') to ``path``.
+
+    The file-based counterpart of the streamed responses, used by the
+    background export jobs. ``summary`` and ``details`` pick the sections
+    of a PDF. Returns the number of rows written (matched, for a PDF
+    without details).
+    """
+    count = 0
+
+    def rows():
+        nonlocal count
+        for row in iter_accident_rows(query):
+            count += 1
+            yield row
+
+    if fmt == 'csv':
+        chunks = iter_csv(rows(), ACCIDENT_EXPORT_HEADERS)
+        body = iter_gzip(chunks) if gzip else (chunk.encode('utf-8') for chunk in chunks)
+        with open(path, 'wb') as out:
+            for data in body:
+                out.write(data)
+    elif fmt == 'excel':
+        with open(path, 'wb') as out:
+            write_xlsx(rows(), out, ACCIDENT_EXPORT_HEADERS, 'Accidents')
+    elif fmt == 'pdf':
+        sections = accident_summary(query) if summary else None
+        limit = (PDF_SUMMARY_ROWS if summary else PDF_MAX_ROWS) if details else 0
+        detail, note = _pdf_rows(rows(), limit)
+        render_pdf_file('Accident Report', ACCIDENT_EXPORT_HEADERS, detail, sections, note, path=path)
+        # A summary-only report covers every matching row
+        count = len(detail) if details else query.order_by(None).count()
+    elif fmt in COLUMNAR_FORMATS:
+        with open(path, 'wb') as out:
+            count = write_columnar(fmt, iter_record_batches(query), out)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return count
+
+
 def format_accident_for_export(accident):
     """Format an accident record for export"""
     return {
-        'ID': accident.id,
-        'Date': accident.occurred_at.strftime('%Y-%m-%d %H:%M') if accident.occurred_at else '',
-        'Location': accident.location or '',
-        'Governorate': accident.governorate or '',
-        'Delegation': accident.delegation or '',
-        'Severity': accident.severity or '',
-        'Cause': accident.cause or '',
-        'Source': accident.source or '',
-        'Created At': accident.created_at.strftime('%Y-%m-%d %H:%M') if accident.created_at else ''
+        header: (fmt(getattr(accident, attr)) if fmt else (getattr(accident, attr) or ''))
+        for header, attr, fmt in ACCIDENT_EXPORT_COLUMNS
     }
 
 
@@ -0,0 +1,294 @@
+"""
+Background Exports
+==================
+Accident exports rendered off the request thread and cached on disk
+
+``export_jobs.request()`` returns a finished ExportJob straight away when
+an identical export is cached, otherwise queues one. The cache key hashes
+the format, the canonical filters and the data version (row count, last
+id, last import batch and last edit), so a repeated request for the same
+report is served from instance/exports until the data changes. Artifacts
+are evicted least recently used first once the directory outgrows
+EXPORT_CACHE_MAX_BYTES, and after EXPORT_CACHE_TTL in any case.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from extensions import db
+from models.accident import Accident
+from models.export_job import ExportJob
+from models.import_batch import ImportBatch
+from utils.export import COLUMNAR_FORMATS, accident_export_query, write_accident_export
+from utils.import_jobs import is_orphaned, worker_id
+
+logger = logging.getLogger(__name__)
+
+# Exports rendered concurrently (PDF layout itself runs in a process pool)
+EXPORT_THREADS = 2
+
+# Total size of cached artifacts before the least recently used go
+EXPORT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Artifacts older than this are regenerated on the next request
+EXPORT_CACHE_TTL = timedelta(days=7)
+
+# Format -> file suffix
+FORMATS = {
+    'csv': '.csv', 'excel': '.xlsx', 'pdf': '.pdf',
+    **{fmt: suffix for fmt, (suffix, _) in COLUMNAR_FORMATS.items()},
+}
+
+FILTER_KEYS = ('governorate', 'severity', 'start_date', 'end_date')
+
+# Format-specific switches, part of the cache key
+OPTION_KEYS = {'csv': ('gzip',), 'pdf': ('summary', 'summary_only')}
+
+_TRUE = ('1', 'true', 'yes')
+
+
+def canonical_filters(fmt, args):
+    """Normalize request arguments into the filters of an export.
+
+    Unknown keys and empty values are dropped and dates are rewritten in
+    ISO form, so equivalent requests share one cache entry.
+    """
+    filters = {}
+    for key in FILTER_KEYS:
+        value = str(args.get(key) or '').strip()
+        if not value:
+            continue
+        if key.endswith('_date'):
+            try:
+                value = datetime.fromisoformat(value).isoformat()
+            except ValueError:
+                # Ignored by the export query as well
+                continue
+        filters[key] = value
+    for key in OPTION_KEYS.get(fmt, ()):
+        if str(args.get(key, '')).lower() in _TRUE:
+            filters[key] = True
+    if filters.get('summary_only'):
+        filters['summary'] = True
+    return filters
+
+
+def data_version():
+    """Token that changes whenever visible accidents are added, removed or edited"""
+    count, last_id, last_edit = db.session.query(
+        db.func.count(Accident.id), db.func.max(Accident.id), db.func.max(Accident.updated_at)
+    ).filter(Accident.visible()).one()
+    # Delta syncs update rows in place but always create a batch
+    last_batch = db.session.query(db.func.max(ImportBatch.id)).scalar()
+    edited = last_edit.isoformat() if last_edit else 0
+    return f"{count}:{last_id or 0}:{last_batch or 0}:{edited}"
+
+
+def cache_key(fmt, filters, version):
+    payload = json.dumps([fmt, filters, version], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ExportJobRunner:
+    """Local worker pool for ExportJob rows and their on-disk cache"""
+
+    def __init__(self):
+        self.app = None
+        self.export_dir = None
+        self.max_bytes = EXPORT_CACHE_MAX_BYTES
+        self.ttl = EXPORT_CACHE_TTL
+        self._lock = threading.Lock()
+        self._threads = None
+
+    def init_app(self, app):
+        self.app = app
+        self.export_dir = app.config.get('EXPORT_DIR') or os.path.join(app.instance_path, 'exports')
+        self.max_bytes = app.config.get('EXPORT_CACHE_MAX_BYTES', EXPORT_CACHE_MAX_BYTES)
+        os.makedirs(self.export_dir, exist_ok=True)
+        if app.config.get('IMPORT_JOBS_AUTORESUME', True):
+            with app.app_context():
+                self.resume_orphaned()
+
+    def _pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=EXPORT_THREADS, thread_name_prefix='export-job')
+            return self._threads
+
+    def submit(self, job_id):
+        """Queue a job id for processing in the background"""
+        if self.app is None:
+            raise RuntimeError("ExportJobRunner.init_app() was not called")
+        return self._pool().submit(self._run, job_id)
+
+    # ----------------------------------------------------------------
+    # Cache
+    # ----------------------------------------------------------------
+
+    def cached(self, fmt, filters):
+        """The finished, still fresh artifact of this export, or None"""
+        key = cache_key(fmt, filters, data_version())
+        return self._cached(key)
+
+    def _cached(self, key):
+        job = ExportJob.query.filter_by(cache_key=key, status='completed').order_by(ExportJob.id.desc()).first()
+        if job is None:
+            return None
+        if not job.path or not os.path.exists(job.path) or job.finished_at < datetime.utcnow() - self.ttl:
+            self._evict(job)
+            db.session.commit()
+            return None
+        return job
+
+    def touch(self, job):
+        """Record a download for LRU eviction"""
+        job.hits = (job.hits or 0) + 1
+        job.last_accessed_at = datetime.utcnow()
+        db.session.commit()
+
+    def request(self, fmt, filters, requested_by=None):
+        """Return (job, cached): a finished cached job, a matching job in
+        progress, or a newly queued one."""
+        key = cache_key(fmt, filters, data_version())
+        job = self._cached(key)
+        if job is not None:
+            return job, True
+        job = ExportJob.query.filter(
+            ExportJob.cache_key == key, ExportJob.status.in_(('queued', 'running'))
+        ).first()
+        if job is not None:
+            return job, False
+        job = ExportJob(
+            cache_key=key,
+            format=fmt,
+            filters=json.dumps(filters, sort_keys=True),
+            requested_by=requested_by,
+            filename=f"accidents_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}{self._suffix(fmt, filters)}",
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.submit(job.id)
+        return job, False
+
+    def _suffix(self, fmt, filters):
+        return FORMATS[fmt] + ('.gz' if filters.get('gzip') else '')
+
+    def _evict(self, job):
+        if job.path:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+        job.status = 'evicted'
+        job.path = None
+
+    def evict(self):
+        """Drop expired artifacts, then the least recently used until the
+        cache fits in max_bytes. Returns the number evicted."""
+        evicted = 0
+        done = ExportJob.query.filter_by(status='completed').order_by(
+            db.func.coalesce(ExportJob.last_accessed_at, ExportJob.finished_at)
+        ).all()
+        expired_before = datetime.utcnow() - self.ttl
+        total = 0
+        live = []
+        for job in done:
+            if job.finished_at < expired_before or not job.path or not os.path.exists(job.path):
+                self._evict(job)
+                evicted += 1
+            else:
+                live.append(job)
+                total += job.size_bytes or 0
+        for job in live:
+            if total <= self.max_bytes:
+                break
+            total -= job.size_bytes or 0
+            self._evict(job)
+            evicted += 1
+        db.session.commit()
+        return evicted
+
+    # ----------------------------------------------------------------
+    # Processing
+    # ----------------------------------------------------------------
+
+    def resume_orphaned(self):
+        """Requeue jobs whose worker died and pick up queued jobs. Returns ids."""
+        resumed = []
+        for job in ExportJob.query.filter(ExportJob.status.in_(('queued', 'running'))).all():
+            if job.status == 'running':
+                if not is_orphaned(job):
+                    continue
+                job.status = 'queued'
+            resumed.append(job.id)
+        db.session.commit()
+        for job_id in resumed:
+            self.submit(job_id)
+        return resumed
+
+    def _claim(self, job_id):
+        claimed = ExportJob.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'worker': worker_id(), 'updated_at': datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                self._process(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Export job {job_id} failed")
+                job = db.session.get(ExportJob, job_id)
+                if job is not None:
+                    job.status = 'failed'
+                    job.message = str(e)
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+            finally:
+                db.session.remove()
+
+    def _process(self, job_id):
+        if not self._claim(job_id):
+            return
+        job = db.session.get(ExportJob, job_id)
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        filters = json.loads(job.filters or '{}')
+        path = os.path.join(self.export_dir, f"{job.cache_key}{self._suffix(job.format, filters)}")
+        partial = path + '.part'
+        try:
+            rows = write_accident_export(
+                job.format, accident_export_query(filters), partial,
+                gzip=bool(filters.get('gzip')), summary=bool(filters.get('summary')),
+                details=not filters.get('summary_only'),
+            )
+            # Readers never see a half-written artifact
+            os.replace(partial, path)
+        except Exception:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            raise
+
+        job.path = path
+        job.size_bytes = os.path.getsize(path)
+        job.row_count = rows
+        job.status = 'completed'
+        job.finished_at = datetime.utcnow()
+        job.updated_at = job.finished_at
+        db.session.commit()
+        self.evict()
+
+
+# Global runner, bound to the app in create_app()
+export_jobs = ExportJobRunner()
@@ -0,0 +1,179 @@
+"""
+Full-Text Search Index
+======================
+FTS5 (SQLite) / tsvector (PostgreSQL) search over accidents and users
+
+SQLite: ``accidents_fts`` and ``users_fts`` are external-content FTS5
+tables kept in sync with their base tables by triggers and ranked with
+bm25(). PostgreSQL: expression GIN indexes over to_tsvector() so the base
+tables stay the single source of truth, ranked with ts_rank().
+
+Every function takes a SQLAlchemy connection so it can be used from the
+app, from maintenance scripts and from benchmarks alike.
+"""
+
+import re
+
+import sqlalchemy as sa
+
+# bm25 is computed over at most this many of the newest matches, so very
+# common prefixes ("ha", "tun") cost the same as rare ones
+RANK_WINDOW = 500
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS accidents_fts USING fts5(
+        location, governorate, delegation, cause,
+        content='accidents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accidents_fts_ai AFTER INSERT ON accidents BEGIN
+        INSERT INTO accidents_fts(rowid, location, governorate, delegation, cause)
+        VALUES (new.id, new.location, new.governorate, new.delegation, new.cause);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accidents_fts_ad AFTER DELETE ON accidents BEGIN
+        INSERT INTO accidents_fts(accidents_fts, rowid, location, governorate, delegation, cause)
+        VALUES ('delete', old.id, old.location, old.governorate, old.delegation, old.cause);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accidents_fts_au
+    AFTER UPDATE OF location, governorate, delegation, cause ON accidents BEGIN
+        INSERT INTO accidents_fts(accidents_fts, rowid, location, governorate, delegation, cause)
+        VALUES ('delete', old.id, old.location, old.governorate, old.delegation, old.cause);
+        INSERT INTO accidents_fts(rowid, location, governorate, delegation, cause)
+        VALUES (new.id, new.location, new.governorate, new.delegation, new.cause);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        full_name, email,
+        content='users', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, full_name, email)
+        VALUES ('delete', old.id, old.full_name, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF full_name, email ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, full_name, email)
+        VALUES ('delete', old.id, old.full_name, old.email);
+        INSERT INTO users_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email);
+    END
+    """,
+]
+
+_ACCIDENT_TSV = (
+    "to_tsvector('simple', coalesce(location, '') || ' ' || coalesce(governorate, '') || ' ' || "
+    "coalesce(delegation, '') || ' ' || coalesce(cause, ''))"
+)
+_USER_TSV = "to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(email, ''))"
+
+_POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_accidents_fts ON accidents USING GIN ({_ACCIDENT_TSV})",
+    f"CREATE INDEX IF NOT EXISTS ix_users_fts ON users USING GIN ({_USER_TSV})",
+]
+
+
+def _dialect(conn):
+    return conn.engine.dialect.name
+
+
+def ensure_fulltext(conn):
+    """Create the full-text index (idempotent). Returns True if available.
+
+    On SQLite the FTS tables are rebuilt from their base tables the first
+    time they are created; afterwards the triggers keep them in sync.
+    """
+    dialect = _dialect(conn)
+    if dialect == 'sqlite':
+        existed = conn.execute(sa.text(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='accidents_fts'"
+        )).first() is not None
+        for ddl in _SQLITE_DDL:
+            conn.execute(sa.text(ddl))
+        if not existed:
+            rebuild_fulltext(conn)
+        return True
+    if dialect == 'postgresql':
+        for ddl in _POSTGRES_DDL:
+            conn.execute(sa.text(ddl))
+        return True
+    return False
+
+
+def rebuild_fulltext(conn):
+    """Repopulate the SQLite FTS tables from their content tables"""
+    if _dialect(conn) != 'sqlite':
+        return
+    conn.execute(sa.text("INSERT INTO accidents_fts(accidents_fts) VALUES ('rebuild')"))
+    conn.execute(sa.text("INSERT INTO users_fts(users_fts) VALUES ('rebuild')"))
+
+
+def query_tokens(query):
+    """Split free text into word tokens (punctuation and quotes dropped)"""
+    return _TOKEN_RE.findall(query or '')
+
+
+def _fts5_match(groups):
+    # Every token is quoted (no FTS syntax injection) and prefix-matched;
+    # tokens within a group are ANDed, groups are ORed
+    return ' OR '.join('(' + ' '.join(f'"{t}"*' for t in tokens) + ')' for tokens in groups)
+
+
+def _tsquery(groups):
+    return ' | '.join('(' + ' & '.join(f"{t}:*" for t in tokens) + ')' for tokens in groups)
+
+
+def search_ids(conn, table, query, limit=10, alternatives=None):
+    """Return ids from ``accidents`` or ``users`` ranked by relevance.
+
+    ``alternatives`` are extra phrasings matched as OR (e.g. the canonical
+    spelling of a place name typed in Arabic).
+
+    Returns None when no full-text index is available for this database,
+    so callers can fall back to a LIKE scan.
+    """
+    if table not in ('accidents', 'users'):
+        raise ValueError(f"Unsupported table: {table}")
+    groups = [t for t in (query_tokens(q) for q in [query] + list(alternatives or [])) if t]
+    if not groups:
+        return []
+
+    dialect = _dialect(conn)
+    if dialect == 'sqlite':
+        fts = f"{table}_fts"
+        try:
+            rows = conn.execute(sa.text(
+                f"SELECT rowid FROM ("
+                f"  SELECT rowid, bm25({fts}) AS score FROM {fts} WHERE {fts} MATCH :q"
+                f"  ORDER BY rowid DESC LIMIT :window"
+                f") ORDER BY score, rowid DESC LIMIT :limit"
+            ), {'q': _fts5_match(groups), 'window': RANK_WINDOW, 'limit': limit})
+        except sa.exc.OperationalError:
+            # SQLite built without FTS5, or the index was never created
+            return None
+        return [r[0] for r in rows]
+    if dialect == 'postgresql':
+        tsv = _ACCIDENT_TSV if table == 'accidents' else _USER_TSV
+        rows = conn.execute(sa.text(
+            f"SELECT id FROM {table} WHERE {tsv} @@ to_tsquery('simple', :q) "
+            f"ORDER BY ts_rank({tsv}, to_tsquery('simple', :q)) DESC LIMIT :limit"
+        ), {'q': _tsquery(groups), 'limit': limit})
+        return [r[0] for r in rows]
+    return None
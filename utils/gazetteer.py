@@ -0,0 +1,65 @@
+"""
+Tunisia Gazetteer
+=================
+Governorates with coordinates, population and delegations
+
+Shared by the real-data import script, import-time place resolution and
+search suggestions, so it must stay free of app/DB imports.
+"""
+
+# Tunisia Governorates with accurate coordinates and delegations
+GOVERNORATES = {
+    'Tunis': {'lat': 36.8065, 'lng': 10.1815, 'population': 1056247, 'delegations': ['La Médina', 'Bab Bhar', 'Bab Souika', 'Omrane', 'Omrane Supérieur', 'El Tahrir', 'El Menzah', 'Cité El Khadra', 'Bardo', 'Le Kram', 'La Goulette', 'Carthage', 'Sidi Bou Said', 'La Marsa', 'Sidi Hassine']},
+    'Ariana': {'lat': 36.8667, 'lng': 10.1647, 'population': 576088, 'delegations': ['Ariana Ville', 'Soukra', 'Raoued', 'Kalâat el-Andalous', 'Sidi Thabet', 'Ettadhamen-Mnihla', 'La Mnihla']},
+    'Ben Arous': {'lat': 36.7533, 'lng': 10.2283, 'population': 631842, 'delegations': ['Ben Arous', 'Hammam Lif', 'Hammam Chott', 'Bou Mhel el-Bassatine', 'El Mourouj', 'Ezzahra', 'Radès', 'Megrine', 'Mohamedia-Fouchana', 'Mornag', 'Khalidia']},
+    'Manouba': {'lat': 36.8078, 'lng': 9.8589, 'population': 379518, 'delegations': ['Manouba', 'Den Den', 'Douar Hicher', 'Oued Ellil', 'Mornaguia', 'Borj El Amri', 'El Battan', 'Tebourba']},
+    'Nabeul': {'lat': 36.4561, 'lng': 10.7376, 'population': 787920, 'delegations': ['Nabeul', 'Dar Chaâbane El Fehri', 'Beni Khiar', 'El Mida', 'Hammamet', 'Menzel Bouzelfa', 'Korba', 'El Haouaria', 'Takelsa', 'Soliman', 'Menzel Temime', 'Béni Khalled', 'Grombalia', 'Bou Argoub', 'Hammam Ghezèze', 'Kelibia']},
+    'Zaghouan': {'lat': 36.4029, 'lng': 10.1433, 'population': 176945, 'delegations': ['Zaghouan', 'Bir Mcherga', 'El Fahs', 'Nadhour', 'Zriba', 'Saouaf']},
+    'Bizerte': {'lat': 37.2744, 'lng': 9.8739, 'population': 568219, 'delegations': ['Bizerte Nord', 'Bizerte Sud', 'Jarzouna', 'Mateur', 'Ghezala', 'Menzel Bourguiba', 'Tinja', 'Ghar El Melh', 'Menzel Jemil', 'El Alia', 'Ras Jebel', 'Sejnane', 'Joumine', 'Utique']},
+    'Béja': {'lat': 36.7333, 'lng': 9.1833, 'population': 303032, 'delegations': ['Béja Nord', 'Béja Sud', 'Amdoun', 'Nefza', 'Téboursouk', 'Tibar', 'Testour', 'Goubellat', 'Mejez el-Bab']},
+    'Jendouba': {'lat': 36.5011, 'lng': 8.7803, 'population': 401477, 'delegations': ['Jendouba', 'Jendouba Nord', 'Bou Salem', 'Tabarka', 'Aïn Draham', 'Fernana', 'Balta-Bou Aouane', 'Ghardimaou', 'Oued Meliz']},
+    'Le Kef': {'lat': 36.1747, 'lng': 8.7047, 'population': 243156, 'delegations': ['Le Kef Est', 'Le Kef Ouest', 'Nebeur', 'Sakiet Sidi Youssef', 'Tajerouine', 'Kalaat Senan', 'Kalâat Khasba', 'Jérissa', 'El Ksour', 'Dahmani', 'Sers']},
+    'Siliana': {'lat': 36.0850, 'lng': 9.3708, 'population': 223087, 'delegations': ['Siliana Nord', 'Siliana Sud', 'Bou Arada', 'Gaâfour', 'El Krib', 'El Aroussa', 'Rouhia', 'Kesra', 'Bargou', 'Makthar', 'Sidi Bou Rouis']},
+    'Sousse': {'lat': 35.8288, 'lng': 10.6405, 'population': 674971, 'delegations': ['Sousse Ville', 'Sousse Riadh', 'Sousse Jawhara', 'Sousse Sidi Abdelhamid', 'Hammam Sousse', 'Akouda', 'Kalâa Kebira', 'Sidi Bou Ali', 'Hergla', 'Enfidha', 'Bouficha', 'Kondar', 'Sidi El Hani', "M'saken", 'Kalâa Seghira', 'Zaouiet Sousse']},
+    'Monastir': {'lat': 35.7643, 'lng': 10.8113, 'population': 548828, 'delegations': ['Monastir', 'Ouerdanine', 'Sahline', 'Zéramdine', 'Beni Hassen', 'Jemmal', 'Bembla-Mnara', 'Moknine', 'Bekalta', 'Téboulba', 'Ksar Hellal', 'Ksibet el-Médiouni', 'Sayada-Lamta-Bou Hajar']},
+    'Mahdia': {'lat': 35.5047, 'lng': 11.0622, 'population': 410812, 'delegations': ['Mahdia', 'Bou Merdes', 'Ouled Chamekh', 'Chorbane', 'Hbira', 'Essouassi', 'El Jem', 'Chebba', 'Melloulèche', 'Sidi Alouane', 'Ksour Essef']},
+    'Sfax': {'lat': 34.7406, 'lng': 10.7603, 'population': 955421, 'delegations': ['Sfax Ville', 'Sfax Ouest', 'Sfax Sud', 'Sakiet Ezzit', 'Sakiet Eddaïer', 'Thyna', 'Agareb', 'Jebiniana', 'El Amra', 'El Hencha', 'Menzel Chaker', 'Ghraïba', 'Bir Ali Ben Khalifa', 'Skhira', 'Mahres', 'Kerkennah']},
+    'Kairouan': {'lat': 35.6781, 'lng': 10.0963, 'population': 570559, 'delegations': ['Kairouan Nord', 'Kairouan Sud', 'Chebika', 'Sbikha', 'Oueslatia', 'Haffouz', 'El Alâa', 'Hajeb El Ayoun', 'Nasrallah', 'Echrarda', 'Bouhajla']},
+    'Kasserine': {'lat': 35.1672, 'lng': 8.8365, 'population': 439243, 'delegations': ['Kasserine Nord', 'Kasserine Sud', 'Ezzouhour', 'Hassi El Frid', 'Sbeitla', 'Sbiba', 'Jedeliane', 'Thala', 'Haïdra', 'Foussana', 'Feriana', 'Mejel Bel Abbès']},
+    'Sidi Bouzid': {'lat': 34.8888, 'lng': 9.4842, 'population': 429912, 'delegations': ['Sidi Bouzid Ouest', 'Sidi Bouzid Est', 'Jilma', 'Cebalet Ouled Asker', 'Bir El Hafey', 'Sidi Ali Ben Aoun', 'Menzel Bouzaiene', 'Meknassy', 'Souk Jedid', 'Mezzouna', 'Regueb', 'Ouled Haffouz']},
+    'Gabès': {'lat': 33.8886, 'lng': 10.0975, 'population': 374300, 'delegations': ['Gabès Ville', 'Gabès Ouest', 'Gabès Sud', 'Ghannouch', 'El Métouia', 'Menzel El Habib', 'El Hamma', 'Matmata', 'Nouvelle Matmata', 'Mareth']},
+    'Médenine': {'lat': 33.3549, 'lng': 10.5055, 'population': 479520, 'delegations': ['Médenine Nord', 'Médenine Sud', 'Beni Khedache', 'Ben Gardane', 'Zarzis', 'Houmt Souk', 'Midoun', 'Ajim', 'Sidi Makhlouf']},
+    'Tataouine': {'lat': 32.9297, 'lng': 10.4518, 'population': 149453, 'delegations': ['Tataouine Nord', 'Tataouine Sud', 'Smar', 'Bir Lahmar', 'Ghomrassen', 'Dhehiba', 'Remada']},
+    'Gafsa': {'lat': 34.4250, 'lng': 8.7842, 'population': 337331, 'delegations': ['Gafsa Nord', 'Gafsa Sud', 'Sidi Aïch', 'El Ksar', 'Oum El Araies', 'Redeyef', 'Métlaoui', 'Mdhilla', 'El Guettar', 'Belkhir', 'Sened']},
+    'Tozeur': {'lat': 33.9197, 'lng': 8.1339, 'population': 107912, 'delegations': ['Tozeur', 'Degache', 'Tameghza', 'Nefta', 'Hazoua']},
+    'Kébili': {'lat': 33.7044, 'lng': 8.9650, 'population': 156961, 'delegations': ['Kébili Sud', 'Kébili Nord', 'Souk Lahad', 'Douz Nord', 'Douz Sud', 'Faouar']},
+}
+
+# Alternative spellings per governorate: Arabic, unaccented and common
+# transliterations seen in partner CSVs (accents/case are folded anyway)
+GOVERNORATE_ALIASES = {
+    'Tunis': ['تونس'],
+    'Ariana': ['أريانة', 'Aryanah'],
+    'Ben Arous': ['بن عروس', 'Ben-Arous', 'Bin Arus'],
+    'Manouba': ['منوبة', 'La Manouba', 'Manubah'],
+    'Nabeul': ['نابل', 'Nabul'],
+    'Zaghouan': ['زغوان', 'Zaghwan'],
+    'Bizerte': ['بنزرت', 'Bizerta', 'Banzart'],
+    'Béja': ['باجة', 'Bajah'],
+    'Jendouba': ['جندوبة', 'Jundubah', 'Jandouba'],
+    'Le Kef': ['الكاف', 'El Kef', 'Kef', 'Al Kaf'],
+    'Siliana': ['سليانة', 'Silyanah'],
+    'Sousse': ['سوسة', 'Susah', 'Soussa'],
+    'Monastir': ['المنستير', 'Al Munastir'],
+    'Mahdia': ['المهدية', 'Al Mahdiyah'],
+    'Sfax': ['صفاقس', 'Safaqis'],
+    'Kairouan': ['القيروان', 'Al Qayrawan', 'Kairwan', 'Qairouan'],
+    'Kasserine': ['القصرين', 'Al Qasrayn', 'Kasserin'],
+    'Sidi Bouzid': ['سيدي بوزيد', 'Sidi Bou Zid'],
+    'Gabès': ['قابس', 'Qabis', 'Gabes'],
+    'Médenine': ['مدنين', 'Madanin', 'Mednine', 'Medenine'],
+    'Tataouine': ['تطاوين', 'Tatawin', 'Tataouin'],
+    'Gafsa': ['قفصة', 'Qafsah'],
+    'Tozeur': ['توزر', 'Tawzar'],
+    'Kébili': ['قبلي', 'Qibili', 'Kebili'],
+}
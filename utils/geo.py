@@ -0,0 +1,188 @@
+"""
+Geospatial Helpers
+==================
+Geohash encoding, bounding-box cell covers and haversine distance.
+
+Accidents store their coordinates together with a geohash (see
+``models/accident.py``). Because every geohash cell is a lexicographic
+prefix range, the indexed ``geohash`` column can prune candidates for a
+bbox/radius query with a handful of ``BETWEEN`` range scans; the exact
+bbox or haversine check is then applied to the much smaller candidate set.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+# Stored precision: 8 chars is ~38m x 19m, plenty for accident positions
+GEOHASH_PRECISION = 8
+
+# Max number of cells used to cover a query area before coarsening
+MAX_COVER_CELLS = 32
+
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def valid_coordinates(lat, lng) -> bool:
+    """Return True if lat/lng are finite numbers within WGS84 bounds"""
+    try:
+        lat = float(lat)
+        lng = float(lng)
+    except (TypeError, ValueError):
+        return False
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        return False
+    return -90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0
+
+
+def parse_coordinates(lat, lng) -> Tuple[Optional[float], Optional[float]]:
+    """Parse raw lat/lng values (strings from CSV/JSON) into floats.
+
+    Returns (None, None) when either value is missing or out of range so
+    callers can store the row without coordinates instead of rejecting it.
+    """
+    if lat in (None, '') or lng in (None, ''):
+        return None, None
+    try:
+        lat = float(str(lat).strip().replace(',', '.'))
+        lng = float(str(lng).strip().replace(',', '.'))
+    except (TypeError, ValueError):
+        return None, None
+    if not valid_coordinates(lat, lng):
+        return None, None
+    return lat, lng
+
+
+def encode_geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a base32 geohash string"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bit = 0
+    ch = 0
+    even = True  # even bits encode longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch = ch << 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch = ch << 1
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_BASE32[ch])
+            bit = 0
+            ch = 0
+    return ''.join(chars)
+
+
+def geohash_for(lat, lng) -> Optional[str]:
+    """Geohash for a stored coordinate, or None when coordinates are missing"""
+    if lat is None or lng is None or not valid_coordinates(lat, lng):
+        return None
+    return encode_geohash(float(lat), float(lng))
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Return (lat_height, lng_width) in degrees of a geohash cell"""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def cover_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+               max_cells: int = MAX_COVER_CELLS) -> List[str]:
+    """Return geohash prefixes whose union covers the bounding box.
+
+    Picks the finest precision (up to the stored precision) for which the
+    cover needs at most ``max_cells`` cells.
+    """
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        h, w = cell_size(precision)
+        row0 = int(math.floor((min_lat + 90.0) / h))
+        row1 = int(math.floor((max_lat + 90.0) / h))
+        col0 = int(math.floor((min_lng + 180.0) / w))
+        col1 = int(math.floor((max_lng + 180.0) / w))
+        if (row1 - row0 + 1) * (col1 - col0 + 1) <= max_cells or precision == 1:
+            break
+
+    cells = set()
+    for row in range(row0, row1 + 1):
+        lat = min((row + 0.5) * h - 90.0, 90.0)
+        for col in range(col0, col1 + 1):
+            lng = min((col + 0.5) * w - 180.0, 180.0)
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """Inclusive string range matching every geohash starting with prefix.
+
+    '~' sorts after every base32 character, so ``BETWEEN prefix AND prefix~``
+    can use a plain b-tree index on any database.
+    """
+    return prefix, prefix + '~'
+
+
+def radius_bbox(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lng, max_lat, max_lng) enclosing a circle"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6:
+        dlng = 180.0
+    else:
+        dlng = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse ``min_lng,min_lat,max_lng,max_lat`` (GeoJSON/Leaflet order).
+
+    Returns (min_lat, min_lng, max_lat, max_lng). Raises ValueError.
+    """
+    parts = [p.strip() for p in (value or '').split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat')
+    min_lng, min_lat, max_lng, max_lat = (float(p) for p in parts)
+    if not (valid_coordinates(min_lat, min_lng) and valid_coordinates(max_lat, max_lng)):
+        raise ValueError('bbox coordinates out of range')
+    if min_lat > max_lat or min_lng > max_lng:
+        raise ValueError('bbox min values must be <= max values')
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """Parse a ``lat,lng`` string. Raises ValueError."""
+    parts = [p.strip() for p in (value or '').split(',')]
+    if len(parts) != 2:
+        raise ValueError('near must be lat,lng')
+    lat, lng = float(parts[0]), float(parts[1])
+    if not valid_coordinates(lat, lng):
+        raise ValueError('near coordinates out of range')
+    return lat, lng
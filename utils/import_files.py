@@ -0,0 +1,176 @@
+"""
+Import File Formats
+===================
+Streaming row readers for the upload formats accepted by the importer
+
+Every reader exposes ``fieldnames`` and yields one ``{header: text}`` dict
+per data row, like csv.DictReader. Nothing reads a whole file, workbook or
+archive into memory, and the position of the underlying upload
+(``raw.tell()``) stays a usable progress estimate:
+
+- ``.csv``: incremental UTF-8 decoding
+- ``.csv.gz``: decompressed on the fly
+- ``.zip``: every CSV member in archive order, read one after the other;
+  members whose headers use other aliases are re-keyed to the first one's
+- ``.xlsx``: first worksheet, openpyxl ``read_only`` row iteration
+
+Row numbers keep counting across zip members, as if the members were
+concatenated under the first header.
+"""
+
+import csv
+import gzip
+import io
+import zipfile
+import zlib
+from datetime import date, datetime, time
+
+# Accepted suffixes; checked longest first so ".csv.gz" beats ".gz"
+FORMATS = ('.csv.gz', '.csv', '.zip', '.xlsx')
+
+
+class UploadError(ValueError):
+    """The upload cannot be read as the format its name announces"""
+
+
+def upload_format(filename):
+    """Return the FORMATS suffix of ``filename``, or None if unsupported"""
+    name = (filename or '').strip().lower()
+    return next((fmt for fmt in FORMATS if name.endswith(fmt)), None)
+
+
+def _dict_reader(binary_stream, encoding='utf-8-sig'):
+    text = io.TextIOWrapper(binary_stream, encoding=encoding, newline='')
+    return csv.DictReader(text)
+
+
+class CsvReader:
+    """Plain or gzip-compressed CSV"""
+
+    def __init__(self, raw, compressed=False):
+        self.raw = raw
+        stream = gzip.GzipFile(fileobj=raw, mode='rb') if compressed else raw
+        self._reader = _dict_reader(stream)
+        try:
+            self.fieldnames = self._reader.fieldnames
+        except (OSError, EOFError, zlib.error) as e:
+            raise UploadError(f"Not a valid gzip file: {e}") from e
+
+    def __iter__(self):
+        try:
+            yield from self._reader
+        except (OSError, EOFError, zlib.error) as e:
+            # Truncated or corrupt gzip stream
+            raise UploadError(str(e)) from e
+
+
+class ZipCsvReader:
+    """Every .csv member of a zip archive, streamed member by member"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        try:
+            self._zip = zipfile.ZipFile(raw)
+        except zipfile.BadZipFile as e:
+            raise UploadError(f"Not a valid zip archive: {e}") from e
+        # Archive order keeps reads of ``raw`` moving forward
+        self.members = sorted(
+            (info for info in self._zip.infolist()
+             if not info.is_dir() and info.filename.lower().endswith('.csv')
+             and not info.filename.startswith('__MACOSX/')),
+            key=lambda info: info.header_offset,
+        )
+        if not self.members:
+            raise UploadError("Zip archive contains no .csv files")
+        with self._zip.open(self.members[0]) as first:
+            self.fieldnames = _dict_reader(first).fieldnames
+
+    def __iter__(self):
+        # Imported here: utils/importer imports this module
+        from utils.importer import map_columns
+
+        first_map, _ = map_columns(self.fieldnames)
+        for info in self.members:
+            try:
+                with self._zip.open(info) as member:
+                    reader = _dict_reader(member)
+                    column_map, _ = map_columns(reader.fieldnames)
+                    rename = {
+                        column_map[key]: first_map[key]
+                        for key in column_map if key in first_map and column_map[key] != first_map[key]
+                    }
+                    for row in reader:
+                        if rename:
+                            row = {rename.get(k, k): v for k, v in row.items()}
+                        yield row
+            except (zipfile.BadZipFile, OSError, EOFError, zlib.error) as e:
+                raise UploadError(f"{info.filename}: {e}") from e
+
+
+def _cell_text(value):
+    """Render an XLSX cell the way it would appear in a CSV export"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class XlsxReader:
+    """First worksheet of an .xlsx workbook, read in openpyxl read-only mode"""
+
+    def __init__(self, raw):
+        try:
+            import openpyxl
+        except ImportError:
+            raise UploadError("Excel imports require openpyxl")
+        self.raw = raw
+        try:
+            self._wb = openpyxl.load_workbook(raw, read_only=True, data_only=True)
+        except Exception as e:
+            raise UploadError(f"Not a valid .xlsx workbook: {e}") from e
+        self._ws = self._wb.worksheets[0]
+        self._rows = self._ws.iter_rows(values_only=True)
+        header = next(self._rows, None) or ()
+        # Trailing empty header cells are formatting, not columns
+        names = [_cell_text(v) or '' for v in header]
+        while names and not names[-1]:
+            names.pop()
+        self.fieldnames = names
+
+    def __iter__(self):
+        names = self.fieldnames
+        width = len(names)
+        try:
+            for values in self._rows:
+                if not any(v is not None and v != '' for v in values[:width]):
+                    continue
+                row = dict.fromkeys(names)
+                for name, value in zip(names, values):
+                    row[name] = _cell_text(value)
+                yield row
+        finally:
+            self._wb.close()
+
+
+def open_upload(raw, filename):
+    """Return a streaming row reader for ``raw`` based on ``filename``'s suffix.
+
+    ``raw`` must be a seekable binary file for .zip and .xlsx uploads.
+    Raises UploadError for unsupported or unreadable files and
+    UnicodeDecodeError when a CSV header is not UTF-8.
+    """
+    fmt = upload_format(filename)
+    if fmt == '.csv':
+        return CsvReader(raw)
+    if fmt == '.csv.gz':
+        return CsvReader(raw, compressed=True)
+    if fmt == '.zip':
+        return ZipCsvReader(raw)
+    if fmt == '.xlsx':
+        return XlsxReader(raw)
+    raise UploadError(f"Unsupported file type; expected one of {', '.join(FORMATS)}")
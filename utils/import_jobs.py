@@ -0,0 +1,492 @@
+"""
+Background Import Jobs
+======================
+Run large CSV imports outside the request thread
+
+Uploads (CSV, .csv.gz, .zip or .xlsx, see utils/import_files) are
+spooled to instance/imports and recorded as ImportJob rows.
+A small thread pool runs the jobs (file and database I/O) while row
+parsing/validation of each chunk goes to a ProcessPoolExecutor, so the
+next chunk is validated while the current one is inserted.
+
+Every chunk is committed together with the job checkpoint (next_line,
+counters, errors): cancellation takes effect between chunks and a job
+left 'running' by a dead worker resumes at the first uncommitted line.
+
+Dry runs (``dry_run``) use the same process pool to validate a whole
+upload without touching the database, writing every row error to a CSV
+report under instance/imports/reports.
+"""
+
+import csv
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from extensions import db
+from models.import_batch import ImportBatch
+from models.import_job import ImportJob
+from utils.clustering import cluster_index
+from utils.import_files import open_upload
+from utils.importer import (
+    CHUNK_SIZE, READ_ERRORS, ImportResult, check_chunk, iter_row_chunks, read_error_message, sniff_chunk,
+    validate_chunk,
+)
+from utils.suggest import suggest_index
+
+logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger("import_audit")
+
+# Jobs processed concurrently by this process
+JOB_THREADS = 2
+
+# Validation processes shared by all jobs (0 validates in the job thread)
+PROCESS_WORKERS = min(2, os.cpu_count() or 1)
+
+# A 'running' job owned by another host is considered dead after this long
+# without a checkpoint
+STALE_AFTER = timedelta(minutes=2)
+
+# Dry-run error reports are deleted after this many seconds
+REPORT_TTL = 24 * 3600
+
+# Columns of a dry-run error report
+REPORT_HEADER = ('row', 'column', 'reason')
+
+# Row errors included in a dry-run response; the report has all of them
+DRY_RUN_SAMPLE = 10
+
+
+def worker_id():
+    # Evaluated per call: gunicorn forks workers after import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def is_orphaned(job):
+    """True when a 'running' job's worker (``job.worker``) is gone.
+
+    A local worker is checked by pid; one on another host is presumed
+    dead after STALE_AFTER without a checkpoint (``job.updated_at``).
+    """
+    host, _, pid = (job.worker or '').rpartition(':')
+    if host == socket.gethostname():
+        try:
+            pid = int(pid)
+        except ValueError:
+            return True
+        if pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+    return job.updated_at is None or job.updated_at < datetime.utcnow() - STALE_AFTER
+
+
+def _peak_memory_kb():
+    """Peak resident set size of this process in KiB (None if unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _done_future(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class ImportJobRunner:
+    """Local worker pool for ImportJob rows"""
+
+    def __init__(self):
+        self.app = None
+        self.upload_dir = None
+        self._lock = threading.Lock()
+        self._threads = None
+        self._processes = None
+        self._process_workers = PROCESS_WORKERS
+        self.report_dir = None
+
+    def init_app(self, app):
+        self.app = app
+        self.upload_dir = app.config.get('IMPORT_JOB_DIR') or os.path.join(app.instance_path, 'imports')
+        self._process_workers = app.config.get('IMPORT_PROCESS_WORKERS', PROCESS_WORKERS)
+        self.report_dir = os.path.join(self.upload_dir, 'reports')
+        os.makedirs(self.report_dir, exist_ok=True)
+        if app.config.get('IMPORT_JOBS_AUTORESUME', True):
+            with app.app_context():
+                self.resume_orphaned()
+
+    # ----------------------------------------------------------------
+    # Pools
+    # ----------------------------------------------------------------
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=JOB_THREADS, thread_name_prefix='import-job')
+            return self._threads
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None and self._process_workers:
+                try:
+                    self._processes = ProcessPoolExecutor(max_workers=self._process_workers)
+                except (OSError, NotImplementedError) as e:
+                    # e.g. no /dev/shm in a sandbox: validate in the job thread
+                    logger.warning(f"Import process pool unavailable: {e}")
+                    self._process_workers = 0
+            return self._processes
+
+    def _validate(self, args, fn=validate_chunk):
+        pool = self._process_pool()
+        if pool is not None:
+            try:
+                return pool.submit(fn, *args)
+            except RuntimeError:
+                # Pool broken or shut down; fall through to inline validation
+                with self._lock:
+                    self._processes = None
+        return _done_future(fn, *args)
+
+    def _validated(self, future, args, fn=validate_chunk):
+        try:
+            return future.result()
+        except Exception as e:
+            # A crashed validation process must not fail the job
+            logger.warning(f"Chunk validation in worker process failed ({e}); retrying inline")
+            with self._lock:
+                self._processes = None
+            return fn(*args)
+
+    # ----------------------------------------------------------------
+    # Scheduling
+    # ----------------------------------------------------------------
+
+    def submit(self, job_id):
+        """Queue a job id for processing in the background"""
+        if self.app is None:
+            raise RuntimeError("ImportJobRunner.init_app() was not called")
+        return self._thread_pool().submit(self._run, job_id)
+
+    def resume_orphaned(self):
+        """Requeue jobs whose worker died and pick up queued jobs. Returns ids."""
+        resumed = []
+        for job in ImportJob.query.filter(ImportJob.status.in_(('queued', 'running'))).all():
+            if job.status == 'running':
+                if not is_orphaned(job):
+                    continue
+                job.status = 'queued'
+                job.message = f"Resumed at line {job.next_line} after worker {job.worker} stopped"
+            resumed.append(job.id)
+        db.session.commit()
+        for job_id in resumed:
+            self.submit(job_id)
+        return resumed
+
+    def resume(self, job):
+        """Requeue a failed or orphaned job from its last checkpoint"""
+        if job.status == 'running' and not is_orphaned(job):
+            return False
+        if job.status not in ('failed', 'running') or not os.path.exists(job.path):
+            return False
+        job.status = 'queued'
+        job.cancel_requested = False
+        job.message = f"Resumed at line {job.next_line}"
+        job.finished_at = None
+        db.session.commit()
+        self.submit(job.id)
+        return True
+
+    def cancel(self, job):
+        """Request cancellation; takes effect before the next chunk"""
+        if job.status not in ('queued', 'running'):
+            return False
+        job.cancel_requested = True
+        db.session.commit()
+        # A queued job that is not claimed yet is finished right away
+        claimed = ImportJob.query.filter_by(id=job.id, status='queued').update(
+            {'status': 'cancelled', 'finished_at': datetime.utcnow(), 'message': 'Cancelled by user'},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            self._discard_upload(job)
+            db.session.refresh(job)
+            self._publish(job)
+        return True
+
+    # ----------------------------------------------------------------
+    # Dry runs
+    # ----------------------------------------------------------------
+
+    def dry_run(self, reader, column_map):
+        """Validate every row of ``reader`` without touching the database.
+
+        Chunks are validated in the process pool, a few in flight at a
+        time, and every row error is written to a CSV report. Returns
+        (summary, report token), the token being None when no row failed.
+        """
+        self.prune_reports()
+        token = uuid.uuid4().hex
+        path = self.report_path(token)
+        result = ImportResult()
+        valid = 0
+        formats = {}
+        window = deque()
+        # Enough chunks in flight to keep every process busy; memory stays bounded
+        depth = (self._process_workers or 0) + 1
+        next_line = 2
+        read_error = None
+
+        with open(path, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(REPORT_HEADER)
+
+            def collect():
+                args, future = window.popleft()
+                count, errors = self._validated(future, args, check_chunk)
+                for line, column, reason in errors:
+                    writer.writerow((line, column or '', reason))
+                    result.add_error(line, reason, column=column)
+                return count
+
+            chunks = iter_row_chunks(reader, CHUNK_SIZE)
+            try:
+                while True:
+                    pending = self._next_chunk(chunks, column_map, None, formats, check_chunk)
+                    if pending is None:
+                        break
+                    window.append(pending)
+                    rows, first_line = pending[0][0], pending[0][3]
+                    next_line = first_line + len(rows)
+                    if len(window) > depth:
+                        valid += collect()
+            except READ_ERRORS as e:
+                read_error = e
+            while window:
+                valid += collect()
+            if read_error is not None:
+                message = read_error_message(read_error)
+                writer.writerow((next_line, '', message))
+                result.add_error(next_line, message, rows=0)
+
+        if not result.error_count:
+            os.remove(path)
+            token = None
+        summary = {
+            'rows': valid + result.skipped,
+            'valid': valid,
+            'invalid': result.skipped,
+            'error_count': result.error_count,
+            'errors': result.errors[:DRY_RUN_SAMPLE],
+            'errors_truncated': result.error_count > DRY_RUN_SAMPLE,
+            'occurred_at_format': formats.get('occurred_at'),
+        }
+        return summary, token
+
+    def report_path(self, token):
+        """Path of a dry-run report, or None for a malformed token"""
+        if not token or len(token) != 32 or any(c not in '0123456789abcdef' for c in token):
+            return None
+        return os.path.join(self.report_dir, f"{token}.csv")
+
+    def prune_reports(self):
+        """Delete dry-run reports older than REPORT_TTL"""
+        cutoff = time.time() - REPORT_TTL
+        try:
+            names = os.listdir(self.report_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.report_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    # ----------------------------------------------------------------
+    # Processing
+    # ----------------------------------------------------------------
+
+    def _claim(self, job_id):
+        now = datetime.utcnow()
+        claimed = ImportJob.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'worker': worker_id(), 'updated_at': now},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                self._process(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Import job {job_id} failed")
+                job = db.session.get(ImportJob, job_id)
+                if job is not None:
+                    job.status = 'failed'
+                    job.message = str(e)
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                    self._publish(job)
+            finally:
+                db.session.remove()
+
+    def _next_chunk(self, chunks, column_map, batch_id, formats, fn=validate_chunk):
+        """Read the next chunk and start validating it (None at end of file).
+
+        ``formats`` caches the occurred_at format sniffed from the first
+        chunk read by this run, so it is sniffed once per file.
+        """
+        try:
+            first_line, rows = next(chunks)
+        except StopIteration:
+            return None
+        if 'occurred_at' not in formats:
+            formats['occurred_at'] = sniff_chunk(rows, column_map)
+        args = (rows, column_map, batch_id, first_line, formats['occurred_at'])
+        return args, self._validate(args, fn)
+
+    def _process(self, job_id):
+        if not self._claim(job_id):
+            return
+        job = db.session.get(ImportJob, job_id)
+        if job.started_at is None:
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+        if job.cancel_requested:
+            self._finish(job, None, 'cancelled', 'Cancelled by user')
+            return
+
+        column_map = json.loads(job.column_map or '{}')
+        batch_id = job.batch_id
+        result = ImportResult(
+            imported=job.imported_count or 0,
+            skipped=job.skipped_count or 0,
+            error_count=job.error_count or 0,
+            errors=json.loads(job.errors or '[]'),
+            id_ranges=json.loads(job.id_ranges or '[]'),
+            duplicates=job.duplicate_count or 0,
+        )
+        self._publish(job)
+
+        read_error = None
+        with open(job.path, 'rb') as raw:
+            # Keep a reference: collecting the text wrapper would close ``raw``
+            reader = open_upload(raw, job.path)
+            chunks = iter_row_chunks(reader, CHUNK_SIZE, start_line=job.next_line)
+            formats = {}
+            try:
+                pending = self._next_chunk(chunks, column_map, batch_id, formats)
+            except READ_ERRORS as e:
+                pending, read_error = None, e
+
+            while pending is not None:
+                args, future = pending
+                rows, first_line = args[0], args[3]
+                pending = None
+                # Read and start validating the next chunk while this one is inserted
+                if read_error is None:
+                    try:
+                        pending = self._next_chunk(chunks, column_map, batch_id, formats)
+                    except READ_ERRORS as e:
+                        read_error = e
+
+                records, errors = self._validated(future, args)
+                tally = result.apply_chunk(first_line, records, errors)
+                # Rows and checkpoint commit together: exactly-once per chunk
+                job.next_line = first_line + len(rows)
+                job.bytes_done = raw.tell()
+                self._checkpoint(job, result)
+                db.session.commit()
+                suggest_index.record_counts(tally)
+                self._publish(job)
+
+                # Attributes were expired by the commit, so this re-reads the flag
+                if job.cancel_requested:
+                    self._finish(job, result, 'cancelled', f"Cancelled at line {job.next_line}")
+                    return
+
+        message = None
+        if read_error is not None:
+            result.add_error(job.next_line, read_error_message(read_error), rows=0)
+            message = 'Stopped at unreadable data'
+        self._finish(job, result, 'completed', message)
+
+    def _checkpoint(self, job, result):
+        job.imported_count = result.imported
+        job.skipped_count = result.skipped
+        job.duplicate_count = result.duplicates
+        job.error_count = result.error_count
+        job.errors = json.dumps(result.errors)
+        job.id_ranges = json.dumps(result.id_ranges)
+        job.peak_memory_kb = _peak_memory_kb()
+        job.updated_at = datetime.utcnow()
+
+    def _finish(self, job, result, status, message=None):
+        if result is not None:
+            self._checkpoint(job, result)
+            batch = db.session.get(ImportBatch, job.batch_id) if job.batch_id else None
+            if batch is not None:
+                batch.imported_count = result.imported
+                batch.skipped_count = result.skipped
+                batch.duplicate_count = result.duplicates
+        job.status = status
+        job.message = message
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        self._discard_upload(job)
+
+        if job.imported_count:
+            cluster_index.mark_stale()
+        try:
+            audit_logger.info(
+                f"{job.uploader_id} | {job.uploader_role} | import_job | job_id={job.id},batch_id={job.batch_id},"
+                f"status={status},imported={job.imported_count},skipped={job.skipped_count},"
+                f"duplicates={job.duplicate_count},"
+                f"created_id_ranges={job.id_ranges}"
+            )
+        except Exception:
+            pass
+        self._publish(job)
+
+    def _discard_upload(self, job):
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+    def _publish(self, job):
+        # Imported lazily: resources/ imports this module
+        from resources.websocket_handler import broadcast_import_progress
+        broadcast_import_progress(job.to_dict())
+
+
+# Global runner, bound to the app in create_app()
+import_jobs = ImportJobRunner()
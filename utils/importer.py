@@ -0,0 +1,347 @@
+"""
+Accident Import Pipeline
+========================
+Streaming import: rows are read incrementally (utils/import_files for
+CSV, gzip, zip and XLSX uploads), validated in chunks and bulk-inserted
+with one executemany and one commit per chunk
+
+Memory is bounded by the chunk size: the upload is never read into a
+single string, created ids are reported as ranges and only the first
+MAX_REPORTED_ERRORS row errors are kept.
+"""
+
+import csv
+import io
+from collections import namedtuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models.accident import Accident
+from utils.dates import SNIFF_SAMPLE, parse_occurred, sniff_format, timestamp_parser
+from utils.dedup import content_hash, content_index
+from utils.geo import parse_coordinates, geohash_for
+from utils.import_files import UploadError
+from utils.places import place_resolver
+
+# Rows validated and inserted per transaction
+CHUNK_SIZE = 5000
+
+# Row-level errors kept for the response; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Flexible column matching: accept common aliases so users can upload varied CSVs
+COLUMN_ALIASES = {
+    'occurred_at': ['occurred_at', 'occurred', 'date', 'datetime', 'timestamp', 'occurred at'],
+    'severity': ['severity', 'sev', 'level'],
+    'location': ['location', 'governorate', 'state', 'region', 'place'],
+    'delegation': ['delegation', 'deleg', 'municipality', 'commune', 'district'],
+    'cause': ['cause', 'reason', 'accident_cause'],
+    'lat': ['lat', 'latitude', 'y'],
+    'lng': ['lng', 'lon', 'long', 'longitude', 'x'],
+}
+
+# Only these canonical columns must be present
+REQUIRED_COLUMNS = ('occurred_at', 'severity', 'location')
+
+VALID_SEVERITIES = ('low', 'medium', 'high')
+
+# Why a row was rejected; ``column`` is the file's header name (None if not column-specific)
+RowError = namedtuple('RowError', 'column reason')
+
+# Errors that stop reading an upload part-way; rows read before are kept
+READ_ERRORS = (UnicodeDecodeError, UploadError)
+
+
+def map_columns(fieldnames):
+    """Map canonical names to actual header names.
+
+    Returns (column_map, missing) where missing lists required canonical
+    columns that have no matching header.
+    """
+    by_lower = {}
+    for original in fieldnames or []:
+        by_lower.setdefault((original or '').strip().lower(), original)
+
+    column_map = {}
+    missing = []
+    for key, aliases in COLUMN_ALIASES.items():
+        found = next((by_lower[a] for a in aliases if a in by_lower), None)
+        if found:
+            column_map[key] = found
+        elif key in REQUIRED_COLUMNS:
+            missing.append(key)
+    return column_map, missing
+
+
+def open_csv(binary_stream, encoding='utf-8-sig'):
+    """Wrap an uploaded binary stream in an incremental text decoder"""
+    text = io.TextIOWrapper(binary_stream, encoding=encoding, newline='')
+    return csv.DictReader(text)
+
+
+def read_error_message(error):
+    """Row error reported when a READ_ERRORS exception stops an import"""
+    if isinstance(error, UnicodeDecodeError):
+        return f"Invalid UTF-8, import stopped: {str(error)}"
+    return f"Unreadable file, import stopped: {str(error)}"
+
+
+def validate_row(row, column_map, batch_id, source='government_import', parse_date=parse_occurred):
+    """Validate one CSV row.
+
+    Returns (record, None) with a dict ready for a Core insert, or
+    (None, RowError) when the row must be skipped.
+    """
+    val_occurred = row.get(column_map.get('occurred_at'))
+    val_severity = row.get(column_map.get('severity'))
+    val_location = row.get(column_map.get('location'))
+    if not val_occurred or not val_severity or not val_location:
+        key = next(k for k, v in (('occurred_at', val_occurred), ('severity', val_severity),
+                                  ('location', val_location)) if not v)
+        return None, RowError(column_map.get(key), "Missing required field(s)")
+
+    try:
+        occurred_at = parse_date(val_occurred)
+    except Exception as e:
+        return None, RowError(column_map['occurred_at'], f"Invalid occurred_at: {str(e)}")
+
+    severity = (val_severity or '').strip().lower()
+    if severity not in VALID_SEVERITIES:
+        return None, RowError(column_map['severity'], f"Invalid severity: {val_severity}")
+
+    # Normalize location to (governorate, delegation): "Bardo" -> (Tunis, Bardo)
+    raw_loc = val_location.strip()
+    mapped, delegation = place_resolver.resolve_cell(raw_loc)
+    location = mapped or raw_loc
+
+    # An explicit delegation column wins; canonical spelling when it is known
+    if column_map.get('delegation'):
+        raw_deleg = (row.get(column_map['delegation']) or '').strip()
+        if raw_deleg:
+            place = place_resolver.resolve_delegation(raw_deleg)
+            delegation = place.name if place else raw_deleg
+            if place and mapped is None:
+                mapped = place.governorate
+
+    cause = None
+    if column_map.get('cause'):
+        cause = row.get(column_map['cause']) or None
+
+    lat = lng = None
+    if column_map.get('lat') and column_map.get('lng'):
+        lat, lng = parse_coordinates(row.get(column_map['lat']), row.get(column_map['lng']))
+
+    return {
+        'occurred_at': occurred_at,
+        'severity': severity,
+        'location': location,
+        'governorate': mapped,
+        'delegation': delegation,
+        'cause': cause,
+        'lat': lat,
+        'lng': lng,
+        'geohash': geohash_for(lat, lng),
+        'source': source,
+        'batch_id': batch_id,
+        'content_hash': content_hash(occurred_at, location, severity, cause, delegation),
+    }, None
+
+
+def iter_row_chunks(reader, chunk_size=CHUNK_SIZE, start_line=2):
+    """Yield (first_line, rows) chunks of raw CSV rows.
+
+    Rows before ``start_line`` are skipped without validation, which is how
+    an interrupted job resumes. A READ_ERRORS exception is raised after the
+    rows read before the bad data have been yielded.
+    """
+    rows = []
+    first_line = start_line
+    try:
+        for line, row in enumerate(reader, start=2):
+            if line < start_line:
+                continue
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield first_line, rows
+                rows = []
+                first_line = line + 1
+    except READ_ERRORS:
+        if rows:
+            yield first_line, rows
+        raise
+    if rows:
+        yield first_line, rows
+
+
+def sniff_chunk(rows, column_map):
+    """Sniff the occurred_at format from the first rows of a file"""
+    column = column_map.get('occurred_at')
+    return sniff_format([row.get(column) for row in rows[:SNIFF_SAMPLE]])
+
+
+def validate_chunk(rows, column_map, batch_id, first_line, date_format=None):
+    """Validate a chunk of raw rows; returns (records, [(line, column, reason), ...]).
+
+    ``date_format`` comes from sniff_chunk() on the file's first chunk.
+    Pure function of its arguments so it can run in a worker process.
+    """
+    parse_date = timestamp_parser(date_format)
+    records = []
+    errors = []
+    for line, row in enumerate(rows, start=first_line):
+        record, error = validate_row(row, column_map, batch_id, parse_date=parse_date)
+        if error:
+            errors.append((line, error.column, error.reason))
+        else:
+            records.append(record)
+    return records, errors
+
+
+def check_chunk(rows, column_map, batch_id, first_line, date_format=None):
+    """validate_chunk() for dry runs: returns (valid_count, errors).
+
+    Only the count crosses the process boundary, not the records.
+    """
+    records, errors = validate_chunk(rows, column_map, batch_id, first_line, date_format)
+    return len(records), errors
+
+
+def _insert_statement():
+    """INSERT that skips rows whose content_hash is already stored"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(Accident).on_conflict_do_nothing(index_elements=['content_hash'])
+    elif dialect == 'postgresql':
+        stmt = postgresql.insert(Accident).on_conflict_do_nothing(index_elements=['content_hash'])
+    else:
+        stmt = insert(Accident)
+    return stmt.returning(Accident.id, Accident.content_hash)
+
+
+def insert_records(records):
+    """Bulk-insert validated records with one executemany.
+
+    Returns [(id, content_hash)] for the rows actually inserted; rows
+    whose hash already exists are skipped by the database. Nothing is
+    committed so callers can persist progress in the same transaction.
+    The caller's transaction must hold nothing but this chunk: on error
+    it is rolled back as a whole (a SAVEPOINT is not used because
+    pysqlite commits on RELEASE when no explicit transaction is open).
+    """
+    try:
+        return [tuple(row) for row in db.session.execute(_insert_statement(), records)]
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def compress_ids(ids, ranges=None):
+    """Append sorted ids to a list of inclusive [start, end] ranges"""
+    ranges = ranges if ranges is not None else []
+    for i in ids:
+        if ranges and ranges[-1][1] == i - 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+def expand_ranges(ranges, limit=None):
+    """Inverse of compress_ids (optionally capped at ``limit`` ids)"""
+    out = []
+    for start, end in ranges or []:
+        for i in range(start, end + 1):
+            if limit is not None and len(out) >= limit:
+                return out
+            out.append(i)
+    return out
+
+
+class ImportResult:
+    """Running counters for one import"""
+
+    def __init__(self, imported=0, skipped=0, error_count=0, errors=None, id_ranges=None, duplicates=0):
+        self.imported = imported
+        self.skipped = skipped
+        # Rows already stored (or repeated in the file); not errors
+        self.duplicates = duplicates
+        self.error_count = error_count
+        self.errors = errors if errors is not None else []
+        self.id_ranges = id_ranges if id_ranges is not None else []
+        # (governorate, delegation, cause) -> rows, for the suggestion index
+        self.tally = {}
+
+    def add_error(self, row, reason, rows=1, column=None):
+        self.skipped += rows
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "column": column, "reason": reason})
+
+    def apply_chunk(self, first_line, records, errors):
+        """Insert a validated chunk and fold it into the counters (no commit).
+
+        Returns the chunk's (governorate, delegation, cause) tally.
+        """
+        for line, column, reason in errors:
+            self.add_error(line, reason, column=column)
+        if not records:
+            return {}
+        fresh, duplicates = content_index.partition(records)
+        self.duplicates += len(duplicates)
+        if not fresh:
+            return {}
+        try:
+            inserted = insert_records(fresh)
+        except SQLAlchemyError as e:
+            self.add_error(first_line, f"DB error: {str(e)}", rows=len(fresh))
+            return {}
+        # Rows the filter missed but the unique index caught
+        self.duplicates += len(fresh) - len(inserted)
+        inserted_hashes = {digest for _, digest in inserted}
+        content_index.add(inserted_hashes)
+        compress_ids(sorted(row_id for row_id, _ in inserted), self.id_ranges)
+        self.imported += len(inserted)
+        tally = {}
+        for rec in fresh:
+            if rec['content_hash'] not in inserted_hashes:
+                continue
+            key = (rec['governorate'], rec['delegation'], rec['cause'])
+            tally[key] = tally.get(key, 0) + 1
+            self.tally[key] = self.tally.get(key, 0) + 1
+        return tally
+
+    def to_dict(self):
+        return {
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "errors_truncated": self.error_count > len(self.errors),
+            "created_id_ranges": self.id_ranges,
+        }
+
+
+def run_import(reader, column_map, batch_id, chunk_size=CHUNK_SIZE):
+    """Validate and insert every row of ``reader``, committing per chunk.
+
+    Row numbers in errors are 1-based file lines (header is line 1).
+    """
+    result = ImportResult()
+    next_line = 2
+    date_format = None
+    try:
+        for first_line, rows in iter_row_chunks(reader, chunk_size):
+            if first_line == 2:
+                date_format = sniff_chunk(rows, column_map)
+            records, errors = validate_chunk(rows, column_map, batch_id, first_line, date_format)
+            result.apply_chunk(first_line, records, errors)
+            db.session.commit()
+            next_line = first_line + len(rows)
+    except READ_ERRORS as e:
+        # Keep what was read before the bad bytes; the rest of the file is dropped
+        result.add_error(next_line, read_error_message(e), rows=0)
+    return result
@@ -0,0 +1,311 @@
+"""
+Bulk JSON Ingestion
+===================
+Streamed ingestion of accident records sent as a JSON array or NDJSON
+
+The request body is decoded incrementally (iter_json_array / iter_ndjson),
+records are validated with the CSV importer's rules and column aliases,
+and bulk-inserted CHUNK_SIZE at a time with one commit per chunk. Failures
+are reported per record index instead of rejecting the whole request.
+
+The request rate is limited by record volume: each chunk spends its size
+from a per-user budget (BULK_INGEST_RATE_LIMIT) before it is inserted,
+so one 50k-record request costs as much as 500 requests of 100 records.
+"""
+
+import io
+import json
+from functools import lru_cache
+
+from flask import current_app
+from limits import parse as parse_limit
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db, limiter
+from utils.dates import timestamp_parser
+from utils.dedup import content_index
+from utils.importer import CHUNK_SIZE, RowError, compress_ids, insert_records, map_columns, validate_row
+from utils.suggest import suggest_index
+
+# Records accepted per request; the rest are reported as not processed
+MAX_BULK_RECORDS = 50000
+
+# Records per user per period, shared by all bulk requests (config override)
+BULK_INGEST_RATE_LIMIT = "200000 per hour"
+
+# Characters decoded from the request body per read
+READ_BLOCK = 1 << 16
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-seq')
+
+# Largest array item, in characters, before the body is rejected
+MAX_ITEM_CHARS = 1 << 20
+
+# A decode error or stray character this close to the end of the buffer
+# may be a block boundary cutting an item (a number, an escape); further
+# back, reading more cannot fix it
+_TAIL = 32
+
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_json_array(stream, block_size=READ_BLOCK):
+    """Yield (index, value) for each element of a JSON array, reading ``stream`` in blocks.
+
+    Raises ValueError when the body is not a well-formed array; elements
+    yielded before the error remain valid.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more():
+        nonlocal buf, pos, eof
+        block = text.read(block_size)
+        if not block:
+            eof = True
+            return False
+        buf = buf[pos:] + block
+        pos = 0
+        return True
+
+    def can_extend(at):
+        """Whether reading on may complete an item failing at ``at``"""
+        if len(buf) - pos >= MAX_ITEM_CHARS:
+            raise ValueError(f"Item {index} exceeds {MAX_ITEM_CHARS} characters")
+        return not eof and at >= len(buf) - _TAIL and more()
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or not more():
+                return
+
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError("Body must be a JSON array (or NDJSON with an NDJSON content type)")
+    pos += 1
+    skip_whitespace()
+    index = 0
+    if pos < len(buf) and buf[pos] == ']':
+        pos += 1
+    else:
+        while True:
+            skip_whitespace()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    # Possibly cut by the block boundary: read on and retry
+                    # (an unterminated string reports where it started)
+                    at = len(buf) if e.msg.startswith('Unterminated string') else e.pos
+                    if can_extend(at):
+                        continue
+                    raise ValueError(f"Malformed JSON in item {index}: {e.msg}") from e
+                # Complete only once its delimiter is buffered: "12" or "1e"
+                # at a block boundary may continue in the next block
+                follow = end
+                while follow < len(buf) and buf[follow] in _WHITESPACE:
+                    follow += 1
+                if (follow == len(buf) or buf[follow] not in ',]') and can_extend(follow):
+                    continue
+                break
+            pos = end
+            yield index, value
+            index += 1
+            skip_whitespace()
+            if pos >= len(buf):
+                raise ValueError("Unterminated JSON array")
+            sep = buf[pos]
+            pos += 1
+            if sep == ']':
+                break
+            if sep != ',':
+                raise ValueError(f"Expected ',' or ']' after item {index - 1}")
+    skip_whitespace()
+    if pos < len(buf):
+        raise ValueError("Unexpected data after the JSON array")
+
+
+def iter_ndjson(stream):
+    """Yield (index, value) for each non-blank line; a bad line yields a RowError"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    index = 0
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            value = RowError(None, f"Invalid JSON: {e.msg}")
+        yield index, value
+        index += 1
+
+
+def iter_records(stream, content_type):
+    """Pick the body reader from the request's content type"""
+    mimetype = (content_type or '').split(';', 1)[0].strip().lower()
+    if mimetype in NDJSON_TYPES:
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+@lru_cache(maxsize=256)
+def _columns(keys):
+    return map_columns(keys)
+
+
+def validate_item(item, batch_id, source='import'):
+    """Validate one decoded record; returns (record, None) or (None, RowError)"""
+    if isinstance(item, RowError):
+        return None, item
+    if not isinstance(item, dict):
+        return None, RowError(None, "Record must be a JSON object")
+    row = {}
+    for key, value in item.items():
+        if isinstance(value, (dict, list)):
+            return None, RowError(key, "Must be a string or number")
+        # Same text the CSV importer would see
+        row[key] = value if value is None or isinstance(value, str) else str(value)
+    column_map, missing = _columns(tuple(row))
+    if missing:
+        return None, RowError(missing[0], f"{missing[0]} is required")
+    return validate_row(row, column_map, batch_id, source=source, parse_date=timestamp_parser(None))
+
+
+def volume_budget(identity):
+    """Return a callable spending ``cost`` records from ``identity``'s budget.
+
+    The callable returns False once the budget is exhausted. Returns None
+    when rate limiting is disabled.
+    """
+    if not (limiter.enabled and limiter.initialized):
+        return None
+    item = parse_limit(current_app.config.get('BULK_INGEST_RATE_LIMIT', BULK_INGEST_RATE_LIMIT))
+
+    def spend(cost):
+        return limiter.limiter.hit(item, 'bulk_ingest', str(identity), cost=cost)
+    return spend
+
+
+class IngestResult:
+    """Per-request outcome: counts plus failures by record index"""
+
+    def __init__(self):
+        self.received = 0
+        self.created = 0
+        self.id_ranges = []
+        self.duplicates = []
+        self.failures = []
+        # None, 'limit', 'rate_limited' or 'malformed'; next_index is the
+        # first record that was not processed
+        self.stopped = None
+        self.next_index = None
+        self.message = None
+
+    def fail(self, index, error):
+        self.failures.append({'index': index, 'field': error.column, 'reason': error.reason})
+
+    def stop(self, reason, next_index, message):
+        self.stopped = reason
+        self.next_index = next_index
+        self.message = message
+
+    def to_dict(self):
+        return {
+            'received': self.received,
+            'created': self.created,
+            'created_id_ranges': self.id_ranges,
+            'duplicates': self.duplicates,
+            'failed': len(self.failures),
+            'failures': self.failures,
+            'stopped': self.stopped,
+            'next_index': self.next_index,
+            'stop_reason': self.message,
+        }
+
+
+def _apply_chunk(result, chunk, batch_id, source, budget):
+    """Validate and insert one chunk of (index, item); False stops the ingestion"""
+    if budget is not None and not budget(len(chunk)):
+        result.stop('rate_limited', chunk[0][0], "Record volume limit reached; retry later from next_index")
+        return False
+    result.received += len(chunk)
+
+    records = []
+    index_of = {}
+    for index, item in chunk:
+        record, error = validate_item(item, batch_id, source)
+        if error:
+            result.fail(index, error)
+        else:
+            records.append(record)
+            index_of[id(record)] = index
+    if not records:
+        return True
+
+    fresh, duplicates = content_index.partition(records)
+    result.duplicates.extend(index_of[id(rec)] for rec in duplicates)
+    if not fresh:
+        return True
+    try:
+        inserted = insert_records(fresh)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        for rec in fresh:
+            result.fail(index_of[id(rec)], RowError(None, f"DB error: {str(e)}"))
+        return True
+
+    inserted_hashes = {digest for _, digest in inserted}
+    content_index.add(inserted_hashes)
+    compress_ids(sorted(row_id for row_id, _ in inserted), result.id_ranges)
+    result.created += len(inserted)
+    tally = {}
+    for rec in fresh:
+        if rec['content_hash'] in inserted_hashes:
+            key = (rec['governorate'], rec['delegation'], rec['cause'])
+            tally[key] = tally.get(key, 0) + 1
+        else:
+            # Stored meanwhile by a concurrent request
+            result.duplicates.append(index_of[id(rec)])
+    suggest_index.record_counts(tally)
+    return True
+
+
+def ingest(items, batch_id=None, source='import', budget=None, max_records=MAX_BULK_RECORDS, chunk_size=CHUNK_SIZE):
+    """Validate and insert (index, item) pairs chunk by chunk.
+
+    ``items`` is typically iter_records(); ``budget`` comes from
+    volume_budget(). Chunks committed before a stop are kept.
+    """
+    result = IngestResult()
+    chunk = []
+    next_index = 0
+    error = None
+    try:
+        for index, item in items:
+            if index >= max_records:
+                result.stop('limit', index, f"Only the first {max_records} records are processed per request")
+                break
+            next_index = index + 1
+            chunk.append((index, item))
+            if len(chunk) >= chunk_size:
+                ok = _apply_chunk(result, chunk, batch_id, source, budget)
+                chunk = []
+                if not ok:
+                    break
+    except ValueError as e:
+        # Malformed body (or invalid UTF-8): keep what was read before it
+        error = e
+    if chunk:
+        _apply_chunk(result, chunk, batch_id, source, budget)
+    if error is not None and result.stopped is None:
+        result.stop('malformed', next_index, str(error))
+    result.duplicates.sort()
+    return result
@@ -0,0 +1,237 @@
+"""
+Place Name Resolver
+===================
+Map free-text place names (French, unaccented, Arabic, typos) to the
+canonical governorate/delegation names of the gazetteer
+
+Resolution order for a value:
+    1. exact lookup in a precomputed table of folded names and aliases
+    2. word n-gram scan of the value ("Route de Sfax km 3" -> Sfax)
+    3. trigram similarity against every name (typos: "Gabs" -> Gabès),
+       kept only when one place clearly wins, so a generic word such as
+       "Sidi" or "Menzel" resolves to nothing rather than to any "Sidi ..."
+
+resolve_cell() returns a (governorate, delegation) pair for free-text
+cells such as "Hammamet, Nabeul" or "Bardo" (delegation -> parent
+governorate).
+
+The tables are built once from utils/gazetteer.py at import time and
+results are memoized, so repeated values resolve in microseconds.
+"""
+
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+from utils.gazetteer import GOVERNORATES, GOVERNORATE_ALIASES
+from utils.text import fold
+
+# kind is 'governorate' or 'delegation'; governorate is the parent for delegations
+Place = namedtuple('Place', ['name', 'kind', 'governorate'])
+
+# Minimum Dice coefficient over trigrams for a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+# Lead of the best fuzzy match over the best match naming another place
+FUZZY_MARGIN = 0.1
+
+# Shortest text, as a fraction of the matched name's length, for a fuzzy match
+FUZZY_MIN_LENGTH = 0.75
+
+
+def _trigrams(folded):
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceResolver:
+    """Precompiled lookup tables over the gazetteer"""
+
+    def __init__(self, governorates=GOVERNORATES, aliases=GOVERNORATE_ALIASES):
+        self._exact = {}
+        # Delegations only, so "Nabeul" in a delegation column is the delegation
+        self._delegations = {}
+        self._trigrams = {}
+        self._postings = defaultdict(set)
+        self._max_words = 1
+
+        # Governorates first so a delegation sharing its name ("Sfax",
+        # "Monastir") resolves to the governorate on exact lookup
+        for gov in governorates:
+            place = Place(gov, 'governorate', gov)
+            self._register(gov, place)
+            for alias in aliases.get(gov, []):
+                self._register(alias, place)
+        for gov, info in governorates.items():
+            for deleg in info.get('delegations', []):
+                place = Place(deleg, 'delegation', gov)
+                self._register(deleg, place)
+                self._delegations.setdefault(fold(deleg), place)
+
+        for key in self._exact:
+            grams = _trigrams(key)
+            self._trigrams[key] = grams
+            for g in grams:
+                self._postings[g].add(key)
+
+        self.resolve = lru_cache(maxsize=65536)(self._resolve)
+        self.resolve_cell = lru_cache(maxsize=65536)(self._resolve_cell)
+        self.resolve_delegation = lru_cache(maxsize=65536)(self._resolve_delegation)
+
+    def _register(self, name, place):
+        key = fold(name)
+        if key and key not in self._exact:
+            self._exact[key] = place
+            self._max_words = max(self._max_words, key.count(' ') + 1)
+
+    # ----------------------------------------------------------------
+    # Lookup
+    # ----------------------------------------------------------------
+
+    def _scan(self, folded):
+        """Longest known name appearing as whole words inside the text"""
+        words = folded.split(' ')
+        best = None
+        best_len = 0
+        for n in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                place = self._exact.get(' '.join(words[i:i + n]))
+                if place is None:
+                    continue
+                # Prefer governorates over delegations of equal length
+                if n > best_len or (best.kind == 'delegation' and place.kind == 'governorate'):
+                    best, best_len = place, n
+            if best is not None:
+                return best
+        return None
+
+    def _spans(self, folded):
+        """Known names appearing as whole words, longest first, non-overlapping"""
+        words = folded.split(' ')
+        taken = [False] * len(words)
+        found = []
+        for n in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                if any(taken[i:i + n]):
+                    continue
+                key = ' '.join(words[i:i + n])
+                if key in self._exact:
+                    found.append(key)
+                    taken[i:i + n] = [True] * n
+        return found
+
+    def _fuzzy(self, folded):
+        """Place of the most similar name, or None unless it clearly wins"""
+        grams = _trigrams(folded)
+        shared = defaultdict(int)
+        for g in grams:
+            for key in self._postings.get(g, ()):
+                shared[key] += 1
+        # Best (score, key) per place: aliases of one place do not compete
+        best_by_place = {}
+        for key, count in shared.items():
+            score = 2.0 * count / (len(grams) + len(self._trigrams[key]))
+            place = self._exact[key]
+            if score > best_by_place.get(place, (0.0,))[0]:
+                best_by_place[place] = (score, key)
+        ranked = sorted(best_by_place.values(), reverse=True)
+        if not ranked:
+            return None
+        best_score, best = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+        if best_score <= FUZZY_THRESHOLD or best_score - runner_up < FUZZY_MARGIN:
+            return None
+        if len(folded) < FUZZY_MIN_LENGTH * len(best):
+            return None
+        return self._exact[best]
+
+    def _resolve(self, text):
+        folded = fold(text)
+        if not folded:
+            return None
+        place = self._exact.get(folded)
+        if place is None:
+            place = self._scan(folded)
+        if place is None and len(folded) >= 3:
+            place = self._fuzzy(folded)
+        return place
+
+    def _resolve_cell(self, text):
+        folded = fold(text)
+        if not folded:
+            return None, None
+        place = self._exact.get(folded)
+        if place is None:
+            governorate = delegation = None
+            for key in self._spans(folded):
+                found = self._exact[key]
+                if found.kind == 'governorate':
+                    governorate = governorate or found.name
+                elif delegation is None:
+                    delegation = found
+            if delegation is not None:
+                if governorate is None:
+                    governorate = delegation.governorate
+                elif delegation.governorate != governorate:
+                    # "Hammamet, Sfax": trust the governorate, drop the mismatch
+                    delegation = None
+            if governorate is not None:
+                return governorate, delegation.name if delegation else None
+            if len(folded) >= 3:
+                place = self._fuzzy(folded)
+        if place is None:
+            return None, None
+        if place.kind == 'delegation':
+            return place.governorate, place.name
+        return place.governorate, None
+
+    def _resolve_delegation(self, text):
+        folded = fold(text)
+        if not folded:
+            return None
+        place = self._delegations.get(folded)
+        if place is None:
+            place = next((self._delegations[k] for k in self._spans(folded) if k in self._delegations), None)
+        if place is None and len(folded) >= 3:
+            # A fuzzy hit on a governorate also counts when a delegation shares its name
+            fuzzy = self._fuzzy(folded)
+            place = self._delegations.get(fold(fuzzy.name)) if fuzzy else None
+        return place
+
+    def lookup(self, text):
+        """Place whose name or alias is exactly ``text`` (folded), or None"""
+        return self._exact.get(fold(text))
+
+    def canonical_query(self, text):
+        """``text`` with the words naming a place spelled canonically.
+
+        Only exact names and aliases are rewritten, never fuzzy or partial
+        hits, and the other words are kept, so a search for the result is
+        as narrow as one for ``text``. None when nothing changed.
+        """
+        folded = fold(text)
+        if not folded:
+            return None
+        words = folded.split(' ')
+        out = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self._max_words, len(words) - i), 0, -1):
+                place = self._exact.get(' '.join(words[i:i + n]))
+                if place is not None:
+                    out.append(place.name)
+                    i += n
+                    break
+            else:
+                out.append(words[i])
+                i += 1
+        rewritten = ' '.join(out)
+        return rewritten if fold(rewritten) != folded else None
+
+    def resolve_governorate(self, text):
+        """Canonical governorate for a place name, or None"""
+        place = self.resolve(text)
+        return place.governorate if place else None
+
+
+# Global resolver (pure data, safe to share across threads)
+place_resolver = PlaceResolver()
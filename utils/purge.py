@@ -0,0 +1,220 @@
+"""
+Import Purges
+=============
+Delete imported accidents in the background without long write locks
+
+``purge_jobs.start()`` soft-deletes the batches (ImportBatch.deleted_at),
+which hides their rows from stats and the map at once through
+Accident.visible(), clears the rows' content hash and external id so a
+re-upload is not taken for a duplicate of them, and queues one DeleteJob
+per batch. A single purge thread then deletes the rows in id ranges of
+PURGE_CHUNK, each in its own short transaction together with the job's
+``next_id`` checkpoint, and pauses between chunks so report submissions
+and imports get the SQLite write lock. Suggestion weights and map clusters are updated per chunk.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from extensions import db
+from models.accident import Accident
+from models.delete_job import DeleteJob
+from models.import_batch import ImportBatch
+from utils.clustering import cluster_index
+from utils.dedup import content_index
+from utils.import_jobs import is_orphaned, worker_id
+from utils.suggest import suggest_index
+from utils.sync import rewind_high_water
+
+logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger("import_audit")
+
+# Rows deleted per transaction
+PURGE_CHUNK = 2000
+
+# Seconds between chunks, leaving the write lock to other writers
+PURGE_PAUSE = 0.05
+
+
+def _rows_of(batch_id):
+    """Filter for the rows a DeleteJob on ``batch_id`` removes"""
+    if batch_id is None:
+        return db.and_(Accident.batch_id.is_(None), Accident.source == 'government_import')
+    return Accident.batch_id == batch_id
+
+
+class PurgeRunner:
+    """Single background thread working through DeleteJob rows"""
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('IMPORT_JOBS_AUTORESUME', True):
+            with app.app_context():
+                self.resume_orphaned()
+
+    def _pool(self):
+        # One thread: concurrent purges would only contend for the lock
+        with self._lock:
+            if self._thread is None:
+                self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge')
+            return self._thread
+
+    def submit(self, job_id):
+        """Queue a job id for processing in the background"""
+        if self.app is None:
+            raise RuntimeError("PurgeRunner.init_app() was not called")
+        return self._pool().submit(self._run, job_id)
+
+    def start(self, batch_ids, unbatched=False, requested_by=None, role=None):
+        """Soft-delete ``batch_ids`` and queue their purge; returns the jobs.
+
+        ``unbatched`` also purges government_import rows that belong to no
+        batch (imported before batches existed). Already deleted batches
+        are skipped.
+        """
+        now = datetime.utcnow()
+        max_id = db.session.query(db.func.max(Accident.id)).scalar() or 0
+        jobs = []
+        for batch in ImportBatch.query.filter(
+            ImportBatch.id.in_(batch_ids), ImportBatch.deleted_at.is_(None)
+        ).all():
+            batch.deleted_at = now
+            rewind_high_water(batch)
+            jobs.append(DeleteJob(batch_id=batch.id))
+        if unbatched and db.session.query(Accident.id).filter(_rows_of(None)).first() is not None:
+            jobs.append(DeleteJob(batch_id=None))
+        for job in jobs:
+            job.total = db.session.query(db.func.count(Accident.id)).filter(_rows_of(job.batch_id)).scalar() or 0
+            job.max_id = max_id
+            job.requested_by = requested_by
+            job.requester_role = role
+            db.session.add(job)
+            # Hidden rows give up their identities at once: a re-upload or
+            # re-sync before the purge ends must not match rows it deletes
+            Accident.query.filter(_rows_of(job.batch_id)).update(
+                {'content_hash': None, 'external_id': None, 'sync_hash': None},
+                synchronize_session=False,
+            )
+        db.session.commit()
+        # Soft-deleted rows stop counting right away
+        cluster_index.mark_stale()
+        for job in jobs:
+            self.submit(job.id)
+        return jobs
+
+    def resume_orphaned(self):
+        """Requeue jobs whose worker died and pick up queued jobs. Returns ids."""
+        resumed = []
+        for job in DeleteJob.query.filter(DeleteJob.status.in_(('queued', 'running'))).all():
+            if job.status == 'running':
+                if not is_orphaned(job):
+                    continue
+                job.status = 'queued'
+                job.message = f"Resumed at id {job.next_id} after worker {job.worker} stopped"
+            resumed.append(job.id)
+        db.session.commit()
+        for job_id in resumed:
+            self.submit(job_id)
+        return resumed
+
+    # ----------------------------------------------------------------
+    # Processing
+    # ----------------------------------------------------------------
+
+    def _claim(self, job_id):
+        claimed = DeleteJob.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'worker': worker_id(), 'updated_at': datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                self._process(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Delete job {job_id} failed")
+                job = db.session.get(DeleteJob, job_id)
+                if job is not None:
+                    job.status = 'failed'
+                    job.message = str(e)
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                    self._publish(job)
+            finally:
+                db.session.remove()
+
+    def _process(self, job_id):
+        if not self._claim(job_id):
+            return
+        job = db.session.get(DeleteJob, job_id)
+        if job.started_at is None:
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+        self._publish(job)
+
+        rows_of = _rows_of(job.batch_id)
+        while True:
+            rows = db.session.query(
+                Accident.id, Accident.governorate, Accident.delegation, Accident.cause
+            ).filter(
+                rows_of, Accident.id >= job.next_id, Accident.id <= job.max_id
+            ).order_by(Accident.id).limit(PURGE_CHUNK).all()
+            if not rows:
+                break
+            first, last = rows[0].id, rows[-1].id
+            deleted = Accident.query.filter(
+                rows_of, Accident.id.between(first, last)
+            ).delete(synchronize_session=False)
+            # Rows and checkpoint commit together
+            job.deleted_count = (job.deleted_count or 0) + deleted
+            job.next_id = last + 1
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+
+            tally = {}
+            for row in rows:
+                key = (row.governorate, row.delegation, row.cause)
+                tally[key] = tally.get(key, 0) - 1
+            suggest_index.record_counts(tally)
+            cluster_index.mark_stale()
+            self._publish(job)
+            time.sleep(PURGE_PAUSE)
+
+        self._finish(job)
+
+    def _finish(self, job):
+        if job.batch_id is not None:
+            ImportBatch.query.filter_by(id=job.batch_id).delete(synchronize_session=False)
+        job.status = 'completed'
+        job.finished_at = datetime.utcnow()
+        job.updated_at = job.finished_at
+        db.session.commit()
+        content_index.mark_stale()
+        try:
+            audit_logger.info(
+                f"{job.requested_by} | {job.requester_role} | delete_imports | job_id={job.id},"
+                f"batch_id={job.batch_id},deleted={job.deleted_count}"
+            )
+        except Exception:
+            pass
+        self._publish(job)
+
+    def _publish(self, job):
+        # Imported lazily: resources/ imports this module
+        from resources.websocket_handler import broadcast_delete_progress
+        broadcast_delete_progress(job.to_dict())
+
+
+# Global runner, bound to the app in create_app()
+purge_jobs = PurgeRunner()
@@ -0,0 +1,274 @@
+"""
+Report Scheduler
+================
+Pre-render saved reports on a schedule and after data changes
+
+Each SavedReport is rendered through the export job queue, so its latest
+artifact sits under instance/exports and downloading it is a static file
+transfer. A local thread ticks every REPORT_TICK seconds and:
+
+- renders reports whose cron schedule is due (claimed with a conditional
+  UPDATE, so several processes never render the same run twice)
+- re-renders ``refresh_on_change`` reports once the data version moved
+  and then stayed put for REPORT_SETTLE, so a long import triggers one
+  render instead of one per tick
+- emails finished renders to the report's recipients through
+  utils.email_service, attaching files up to EMAIL_ATTACHMENT_MAX bytes
+  and linking larger ones; every scheduled run is emailed, even when the
+  data did not change and the previous artifact was reused
+
+Emailed links carry a signed token (download_token()) that expires after
+REPORT_LINK_MAX_AGE, so recipients download without logging in; they
+need PUBLIC_BASE_URL to be absolute. The thread only runs where
+REPORT_SCHEDULER is set (see app.py).
+
+Schedules use the five cron fields (minute hour day month weekday) in UTC,
+or one of the PRESETS.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from extensions import db
+from models.export_job import ExportJob
+from models.saved_report import SavedReport
+from utils.email_service import email_service
+from utils.export_jobs import data_version, export_jobs
+
+logger = logging.getLogger(__name__)
+
+# Seconds between scheduler passes
+REPORT_TICK = 60
+
+# Quiet period after a data change before on-change reports re-render
+REPORT_SETTLE = timedelta(minutes=5)
+
+# Larger artifacts are emailed as a download link
+EMAIL_ATTACHMENT_MAX = 10 * 1024 * 1024
+
+# Lifetime of an emailed download link
+REPORT_LINK_MAX_AGE = timedelta(days=7)
+
+# Scheduled runs land before the start of the working day (07:00 in Tunis)
+PRESETS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 6 * * *',
+    '@weekly': '0 6 * * 1',
+    '@monthly': '0 6 1 * *',
+}
+
+# (low, high) of minute, hour, day of month, month, weekday (0 and 7 = Sunday)
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# How far ahead next_after() looks before declaring a schedule impossible
+_SEARCH_DAYS = 366 * 5
+
+
+def _cron_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+            if step < 1:
+                raise ValueError(f"Invalid step in {text!r}")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"{text!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A parsed cron expression; raises ValueError when invalid"""
+
+    def __init__(self, expr):
+        self.expr = (expr or '').strip()
+        fields = PRESETS.get(self.expr.lower(), self.expr).split()
+        if len(fields) != 5:
+            raise ValueError("A schedule is five fields (minute hour day month weekday) or one of "
+                             + ', '.join(PRESETS))
+        try:
+            parsed = [_cron_field(f, low, high) for f, (low, high) in zip(fields, _CRON_RANGES)]
+        except ValueError as e:
+            raise ValueError(f"Invalid schedule: {e}") from None
+        self.minutes, self.hours, self.days, self.months, weekdays = (sorted(v) for v in parsed)
+        self.weekdays = {d % 7 for d in weekdays}
+        # As in cron: with both day fields restricted, either one matches
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+        self.next_after(datetime(2000, 1, 1))
+
+    def _day_matches(self, day):
+        by_date = day.day in self.days
+        by_weekday = day.isoweekday() % 7 in self.weekdays
+        if not self._any_day and not self._any_weekday:
+            return by_date or by_weekday
+        return by_date and by_weekday
+
+    def next_after(self, after):
+        """First run time strictly after ``after``"""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(_SEARCH_DAYS):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, time(hour, minute))
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Schedule {self.expr!r} never runs")
+
+
+class ReportScheduler:
+    """Background thread rendering and delivering SavedReport rows"""
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._version = None
+        self._changed_at = None
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('REPORT_SCHEDULER', False):
+            self.start()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='report-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(REPORT_TICK):
+            with self.app.app_context():
+                try:
+                    self.tick()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Report scheduler pass failed")
+                finally:
+                    db.session.remove()
+
+    def tick(self, now=None):
+        """One pass: due schedules, settled data changes, deliveries"""
+        now = now or datetime.utcnow()
+        for report in SavedReport.query.filter(SavedReport.next_run_at <= now).all():
+            # Only the process that moves next_run_at renders this run
+            claimed = SavedReport.query.filter_by(id=report.id, next_run_at=report.next_run_at).update(
+                {'next_run_at': CronSchedule(report.schedule).next_after(now)}, synchronize_session=False,
+            )
+            db.session.commit()
+            if claimed:
+                self.render(report, deliver=True)
+
+        version = data_version()
+        if version != self._version:
+            self._version, self._changed_at = version, now
+        elif now - self._changed_at >= REPORT_SETTLE:
+            for report in SavedReport.query.filter(
+                SavedReport.refresh_on_change.is_(True),
+                db.or_(SavedReport.data_version.is_(None), SavedReport.data_version != version),
+            ).all():
+                self.render(report)
+
+        self.deliver()
+
+    def render(self, report, deliver=False):
+        """Queue (or reuse from the cache) the report's artifact; returns the job.
+
+        ``deliver`` marks the run for emailing even when the cache hands
+        back a job that was already delivered.
+        """
+        job, _ = export_jobs.request(report.format, json.loads(report.filters or '{}'),
+                                     requested_by=f"report:{report.id}")
+        report.job_id = job.id
+        if deliver:
+            report.delivered_job_id = None
+        report.last_run_at = datetime.utcnow()
+        report.data_version = data_version()
+        db.session.commit()
+        return job
+
+    def deliver(self):
+        """Email finished renders not yet sent to the report's recipients
+
+        ``delivered_job_id`` is None for a run pending delivery.
+        """
+        pending = SavedReport.query.join(ExportJob, SavedReport.job_id == ExportJob.id).filter(
+            SavedReport.recipients.isnot(None),
+            ExportJob.status.in_(('completed', 'failed', 'evicted')),
+            db.or_(SavedReport.delivered_job_id.is_(None), SavedReport.delivered_job_id != SavedReport.job_id),
+        ).all()
+        for report in pending:
+            claimed = SavedReport.query.filter_by(
+                id=report.id, delivered_job_id=report.delivered_job_id
+            ).update({'delivered_job_id': report.job_id}, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                continue
+            job = report.job
+            if job.status != 'completed':
+                logger.warning(f"Saved report {report.id}: job {job.id} {job.status}, nothing emailed")
+                continue
+            self._email(report, job)
+
+    def _serializer(self):
+        return URLSafeTimedSerializer(self.app.config['SECRET_KEY'], salt='saved-report-download')
+
+    def download_token(self, report, job):
+        """Signed token granting the download of one render of ``report``"""
+        return self._serializer().dumps({'report': report.id, 'job': job.id})
+
+    def read_download_token(self, token):
+        """(report id, job id) of a valid token; raises ValueError otherwise"""
+        try:
+            data = self._serializer().loads(token, max_age=int(REPORT_LINK_MAX_AGE.total_seconds()))
+        except SignatureExpired:
+            raise ValueError("This download link has expired") from None
+        except BadSignature:
+            raise ValueError("Invalid download link") from None
+        return data['report'], data['job']
+
+    def _email(self, report, job):
+        attached = report.attach and (job.size_bytes or 0) <= EMAIL_ATTACHMENT_MAX
+        base_url = (self.app.config.get('PUBLIC_BASE_URL') or '').rstrip('/')
+        download_url = None
+        if not attached:
+            if not base_url.startswith(('http://', 'https://')):
+                logger.error(f"Saved report {report.id}: PUBLIC_BASE_URL is not an absolute URL, "
+                             f"job {job.id} not emailed")
+                return
+            download_url = f"{base_url}/api/export/reports/shared/{self.download_token(report, job)}"
+        for recipient in report.recipient_list():
+            email_service.send_template(
+                recipient,
+                'scheduled_report',
+                attachments=[(job.filename, job.path)] if attached else None,
+                report_name=report.name,
+                date=job.finished_at.strftime('%Y-%m-%d'),
+                rows=job.row_count,
+                attached=attached,
+                filename=job.filename,
+                download_url=download_url,
+            )
+
+
+# Global scheduler, bound to the app in create_app()
+report_scheduler = ReportScheduler()
@@ -0,0 +1,169 @@
+"""
+Search Suggestions
+==================
+In-memory as-you-type autocomplete for governorates, delegations and causes
+
+Terms come from the gazetteer (utils/gazetteer.py) plus the distinct
+values stored on accidents, ranked by how many accidents reference them.
+Every term is indexed under its folded full name and each of its word
+suffixes ('menzel bourguiba', 'bourguiba'), kept in a sorted array and
+searched with bisect; a lookup touches only the matching key range.
+
+Writes (imports, confirmed reports) call ``record()`` to bump weights
+and add new terms without a rebuild; deletes mark the index stale.
+"""
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+from extensions import db
+from models.accident import Accident
+from utils.gazetteer import GOVERNORATES
+from utils.text import fold
+
+KINDS = ('governorate', 'delegation', 'cause')
+
+_HIGH = '\uffff'
+
+
+class SuggestIndex:
+    """Sorted-array prefix index over (kind, term) pairs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []       # sorted list of (folded_key, term_id)
+        self._terms = []      # term_id -> (kind, display, parent, folded)
+        self._ids = {}        # (kind, folded display) -> term_id
+        self._weights = []    # term_id -> accident count
+        # (keys, terms, weights) read together by lookups; terms and weights
+        # are append-only between rebuilds so an older keys list stays valid
+        self._snapshot = ([], [], [])
+        self._built = False
+        self._stale = False
+
+    # ----------------------------------------------------------------
+    # Building / maintenance
+    # ----------------------------------------------------------------
+
+    def _add_term(self, keys, kind, display, parent=None):
+        """Register a term (caller holds the lock); returns its id"""
+        folded = fold(display)
+        if not folded:
+            return None
+        term_id = self._ids.get((kind, folded))
+        if term_id is not None:
+            return term_id
+        term_id = len(self._terms)
+        self._terms.append((kind, display, parent, folded))
+        self._weights.append(0)
+        self._ids[(kind, folded)] = term_id
+        words = folded.split(' ')
+        for i in range(len(words)):
+            insort(keys, (' '.join(words[i:]), term_id))
+        return term_id
+
+    def rebuild(self):
+        """Rebuild from the gazetteer and current accident counts"""
+        counts = {}
+        for kind in KINDS:
+            column = getattr(Accident, kind)
+            rows = db.session.query(column, db.func.count(Accident.id)).filter(
+                column.isnot(None)
+            ).group_by(column).all()
+            counts[kind] = rows
+
+        # Build into a fresh index and swap, so lookups never see partial state
+        fresh = SuggestIndex()
+        keys = []
+        for gov, info in GOVERNORATES.items():
+            fresh._add_term(keys, 'governorate', gov)
+            for deleg in info.get('delegations', []):
+                fresh._add_term(keys, 'delegation', deleg, parent=gov)
+        for kind, rows in counts.items():
+            for value, count in rows:
+                term_id = fresh._add_term(keys, kind, value)
+                if term_id is not None:
+                    fresh._weights[term_id] += count
+
+        with self._lock:
+            self._terms = fresh._terms
+            self._ids = fresh._ids
+            self._weights = fresh._weights
+            self._keys = keys
+            self._snapshot = (keys, fresh._terms, fresh._weights)
+            self._built = True
+            self._stale = False
+
+    def mark_stale(self):
+        """Force a rebuild on the next lookup (after deletes)"""
+        self._stale = True
+
+    def record(self, governorate=None, delegation=None, cause=None, count=1):
+        """Account for newly written accidents without rebuilding"""
+        if not self._built:
+            return
+        with self._lock:
+            keys = None
+            for kind, value in (('governorate', governorate), ('delegation', delegation), ('cause', cause)):
+                if not value:
+                    continue
+                term_id = self._ids.get((kind, fold(value)))
+                if term_id is None:
+                    # Copy-on-write so concurrent lookups never see a half-updated array
+                    if keys is None:
+                        keys = list(self._keys)
+                    term_id = self._add_term(keys, kind, value)
+                if term_id is not None:
+                    self._weights[term_id] += count
+            if keys is not None:
+                self._keys = keys
+                self._snapshot = (keys, self._terms, self._weights)
+
+    def record_counts(self, tally):
+        """Bulk variant of record(): {(governorate, delegation, cause): count}"""
+        for (gov, deleg, cause), count in tally.items():
+            self.record(gov, deleg, cause, count)
+
+    # ----------------------------------------------------------------
+    # Lookup
+    # ----------------------------------------------------------------
+
+    def suggest(self, query, limit=10, kind=None):
+        """Return up to ``limit`` terms whose name or a word in it starts with query"""
+        if not self._built or self._stale:
+            self.rebuild()
+        prefix = fold(query)
+        if not prefix:
+            return []
+
+        keys, terms, weights = self._snapshot
+        lo = bisect_left(keys, (prefix,))
+        hi = bisect_left(keys, (prefix + _HIGH,), lo)
+        seen = set()
+        candidates = []
+        for _, term_id in keys[lo:hi]:
+            if term_id in seen:
+                continue
+            seen.add(term_id)
+            if kind and terms[term_id][0] != kind:
+                continue
+            candidates.append(term_id)
+
+        best = heapq.nsmallest(
+            limit, candidates,
+            # heaviest first; exact/leading matches before inner-word matches
+            key=lambda t: (-weights[t], not terms[t][3].startswith(prefix), terms[t][1])
+        )
+        out = []
+        for term_id in best:
+            term_kind, display, parent, _ = terms[term_id]
+            item = {'type': term_kind, 'value': display, 'count': weights[term_id]}
+            if parent:
+                item['governorate'] = parent
+            out.append(item)
+        return out
+
+
+# Global index shared by request threads
+suggest_index = SuggestIndex()
@@ -0,0 +1,308 @@
+"""
+Partner Delta Sync
+==================
+Incremental imports of partner feeds keyed on the partner's own record id
+
+A feed names its source (``?source=``) and carries an id column
+(SYNC_ALIASES['external_id']). Rows are upserted on (external_source,
+external_id) with INSERT ... ON CONFLICT DO UPDATE, so re-sending a
+record updates it instead of adding a copy. Per chunk, one IN query
+fetches the stored ``sync_hash`` (a digest of the row as sent) of the
+chunk's ids, and only new or changed rows are validated and written: a
+300k-row daily extract that changed 2k rows writes 2k rows.
+
+When the feed has a modification time column, each completed sync stores
+the newest one on its ImportBatch (``high_water``); the next sync of the
+source skips rows modified at or before it without validating them.
+Deleting a synced batch rewinds the mark to the syncs before it.
+
+Synced rows carry no content_hash: their identity is the external id, and
+an edited record must not collide with the hash of another row.
+"""
+
+import hashlib
+import re
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models.accident import Accident
+from models.import_batch import ImportBatch
+from utils.dates import parse_occurred, timestamp_parser
+from utils.importer import (
+    CHUNK_SIZE, READ_ERRORS, ImportResult, compress_ids, iter_row_chunks,
+    read_error_message, sniff_chunk, validate_row,
+)
+
+# Header aliases of the sync-only columns; external_id is required
+SYNC_ALIASES = {
+    'external_id': ['external_id', 'external id', 'record_id', 'id', 'ref', 'reference'],
+    'modified_at': ['modified_at', 'updated_at', 'last_modified', 'modified', 'updated'],
+}
+
+# Source names: short, URL- and log-safe
+SOURCE_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+MAX_EXTERNAL_ID = 128
+
+# Columns a changed record overwrites. batch_id moves to the sync that
+# wrote the row last, so deleting an older batch never purges rows a later
+# sync updated; created_at stays that of the first insert
+UPDATED_COLUMNS = (
+    'occurred_at', 'severity', 'location', 'governorate', 'delegation',
+    'cause', 'lat', 'lng', 'geohash', 'sync_hash', 'batch_id',
+)
+
+
+def map_sync_columns(fieldnames):
+    """Map the sync columns to header names; returns (sync_map, missing)"""
+    by_lower = {}
+    for original in fieldnames or []:
+        by_lower.setdefault((original or '').strip().lower(), original)
+    sync_map = {}
+    for key, aliases in SYNC_ALIASES.items():
+        found = next((by_lower[a] for a in aliases if a in by_lower), None)
+        if found:
+            sync_map[key] = found
+    missing = [] if 'external_id' in sync_map else ['external_id']
+    return sync_map, missing
+
+
+def high_water_mark(source):
+    """Newest modification time applied by earlier syncs of ``source``"""
+    return db.session.query(db.func.max(ImportBatch.high_water)).filter(
+        ImportBatch.sync_source == source,
+        ImportBatch.deleted_at.is_(None),
+    ).scalar()
+
+
+def rewind_high_water(batch):
+    """Drop the marks of syncs after a deleted ``batch`` of the same source.
+
+    Their marks cover the deleted batch's rows too: left in place, the next
+    full re-send would skip those rows as below the watermark. The mark
+    falls back to the syncs before ``batch``; unchanged rows are still
+    skipped by their sync_hash. No commit.
+    """
+    if batch.sync_source is None:
+        return
+    ImportBatch.query.filter(
+        ImportBatch.sync_source == batch.sync_source,
+        ImportBatch.id > batch.id,
+        ImportBatch.deleted_at.is_(None),
+    ).update({'high_water': None}, synchronize_session=False)
+
+
+def sync_hash(row, column_map):
+    """Digest of a feed row's mapped cells, as sent by the partner.
+
+    Computed before validation so unchanged rows are never validated.
+    """
+    parts = [(row.get(column_map[key]) or '').strip() for key in sorted(column_map)]
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT DO UPDATE on the external id; None elsewhere"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(Accident)
+    elif dialect == 'postgresql':
+        stmt = postgresql.insert(Accident)
+    else:
+        return None
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['external_source', 'external_id'],
+        set_={col: stmt.excluded[col] for col in UPDATED_COLUMNS},
+        # A concurrent sync may have applied the same change already
+        where=Accident.sync_hash.is_distinct_from(stmt.excluded.sync_hash),
+    )
+    return stmt.returning(Accident.id, Accident.external_id)
+
+
+def upsert_records(records, stored):
+    """Write new and changed records; returns [(id, external_id)] written.
+
+    ``stored`` maps the external ids already present to their row id. No
+    commit, and a failure rolls the session back (see insert_records).
+    """
+    try:
+        stmt = _upsert_statement()
+        if stmt is not None:
+            return [tuple(row) for row in db.session.execute(stmt, records)]
+        new = [rec for rec in records if rec['external_id'] not in stored]
+        changed = [rec for rec in records if rec['external_id'] in stored]
+        written = []
+        if new:
+            written.extend(tuple(row) for row in db.session.execute(
+                insert(Accident).returning(Accident.id, Accident.external_id), new
+            ))
+        if changed:
+            db.session.execute(update(Accident), [
+                {'id': stored[rec['external_id']], **{col: rec[col] for col in UPDATED_COLUMNS}}
+                for rec in changed
+            ])
+            written.extend((stored[rec['external_id']], rec['external_id']) for rec in changed)
+        return written
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+class SyncResult(ImportResult):
+    """ImportResult plus the delta counters; ``imported`` counts inserts"""
+
+    def __init__(self, since=None):
+        super().__init__()
+        self.received = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.below_watermark = 0
+        self.updated_ranges = []
+        self.previous_high_water = since
+        self.high_water = since
+        # False once a chunk failed to write: its rows must not be skipped
+        # by the next sync, so the mark is not advanced
+        self.complete = True
+
+    def to_dict(self):
+        return {
+            "received": self.received,
+            "inserted": self.imported,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "below_watermark": self.below_watermark,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "errors_truncated": self.error_count > len(self.errors),
+            "inserted_id_ranges": self.id_ranges,
+            "updated_id_ranges": self.updated_ranges,
+            "previous_high_water": self.previous_high_water.isoformat() if self.previous_high_water else None,
+            "high_water": self.high_water.isoformat() if self.high_water else None,
+        }
+
+
+def _stored(external_ids, source):
+    """{external_id: (id, sync_hash, governorate, delegation, cause)} for stored rows"""
+    stored = {}
+    for i in range(0, len(external_ids), 500):
+        for row in db.session.query(
+            Accident.external_id, Accident.id, Accident.sync_hash,
+            Accident.governorate, Accident.delegation, Accident.cause,
+        ).filter(
+            Accident.external_source == source,
+            Accident.external_id.in_(external_ids[i:i + 500]),
+            Accident.visible(),
+        ):
+            stored[row[0]] = tuple(row[1:])
+    return stored
+
+
+def _sync_chunk(result, first_line, rows, column_map, sync_map, source, batch_id, parse_date):
+    """Diff, validate and upsert one chunk (no commit); returns its tally"""
+    since = result.previous_high_water
+    modified_column = sync_map.get('modified_at')
+    candidates = {}
+    for line, row in enumerate(rows, start=first_line):
+        result.received += 1
+        external_id = (row.get(sync_map['external_id']) or '').strip()
+        if not external_id:
+            result.add_error(line, "Missing external id", column=sync_map['external_id'])
+            continue
+        if len(external_id) > MAX_EXTERNAL_ID:
+            result.add_error(line, f"External id longer than {MAX_EXTERNAL_ID} characters",
+                             column=sync_map['external_id'])
+            continue
+        if modified_column and (row.get(modified_column) or '').strip():
+            try:
+                modified = parse_occurred(row[modified_column])
+            except Exception as e:
+                result.add_error(line, f"Invalid modification time: {str(e)}", column=modified_column)
+                continue
+            if since is not None and modified <= since:
+                result.below_watermark += 1
+                continue
+            if result.high_water is None or modified > result.high_water:
+                result.high_water = modified
+        if external_id in candidates:
+            # Repeated in the feed: the last occurrence wins
+            result.duplicates += 1
+        candidates[external_id] = (line, row)
+    if not candidates:
+        return {}
+
+    stored = _stored(list(candidates), source)
+    changes = []
+    for external_id, (line, row) in candidates.items():
+        digest = sync_hash(row, column_map)
+        previous = stored.get(external_id)
+        if previous is not None and previous[1] == digest:
+            result.unchanged += 1
+            continue
+        record, error = validate_row(row, column_map, batch_id, parse_date=parse_date)
+        if error:
+            result.add_error(line, error.reason, column=error.column)
+            continue
+        record['content_hash'] = None
+        record['external_source'] = source
+        record['external_id'] = external_id
+        record['sync_hash'] = digest
+        changes.append(record)
+    if not changes:
+        return {}
+
+    try:
+        written = upsert_records(changes, {k: v[0] for k, v in stored.items()})
+    except SQLAlchemyError as e:
+        result.complete = False
+        result.add_error(first_line, f"DB error: {str(e)}", rows=len(changes))
+        return {}
+
+    inserted = sorted(row_id for row_id, external_id in written if external_id not in stored)
+    updated = sorted(row_id for row_id, external_id in written if external_id in stored)
+    compress_ids(inserted, result.id_ranges)
+    compress_ids(updated, result.updated_ranges)
+    result.imported += len(inserted)
+    result.updated += len(updated)
+    # Rows a concurrent sync changed first
+    result.unchanged += len(changes) - len(written)
+
+    by_id = {rec['external_id']: rec for rec in changes}
+    tally = {}
+    for _, external_id in written:
+        rec = by_id[external_id]
+        key = (rec['governorate'], rec['delegation'], rec['cause'])
+        tally[key] = tally.get(key, 0) + 1
+        previous = stored.get(external_id)
+        if previous is not None:
+            old = previous[2:]
+            tally[old] = tally.get(old, 0) - 1
+    for key, count in tally.items():
+        result.tally[key] = result.tally.get(key, 0) + count
+    return tally
+
+
+def run_sync(reader, column_map, sync_map, source, batch_id, chunk_size=CHUNK_SIZE):
+    """Apply a partner feed chunk by chunk, committing per chunk.
+
+    Returns a SyncResult; the caller stores ``result.high_water`` on the
+    batch when ``result.complete``.
+    """
+    result = SyncResult(since=high_water_mark(source))
+    next_line = 2
+    parse_date = None
+    try:
+        for first_line, rows in iter_row_chunks(reader, chunk_size):
+            if parse_date is None:
+                parse_date = timestamp_parser(sniff_chunk(rows, column_map))
+            _sync_chunk(result, first_line, rows, column_map, sync_map, source, batch_id, parse_date)
+            db.session.commit()
+            next_line = first_line + len(rows)
+    except READ_ERRORS as e:
+        result.complete = False
+        result.add_error(next_line, read_error_message(e), rows=0)
+    return result
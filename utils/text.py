@@ -0,0 +1,33 @@
+"""
+Text Normalization
+==================
+Accent- and case-folding shared by search, suggestions and imports
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# Arabic letter variants folded to one form (hamza/madda carriers are
+# handled by NFKD + combining-mark removal below)
+_ARABIC_MAP = str.maketrans({
+    'ة': 'ه',  # ta marbuta -> ha
+    'ى': 'ي',  # alif maqsura -> ya
+    'ـ': None,  # tatweel
+})
+
+
+@lru_cache(maxsize=65536)
+def fold(text):
+    """Fold text for matching: strip diacritics, casefold, collapse punctuation.
+
+    'Kalâat el-Andalous' -> 'kalaat el andalous', "M'saken" -> 'm saken',
+    'أريانة' -> 'اريانه'
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD_RE.sub(' ', stripped.casefold().translate(_ARABIC_MAP)).strip()